@@ -27,14 +27,19 @@ DDNTool is still needed for the S2A hardware.)
 
 import ConfigParser
 import argparse
+import errno
 import multiprocessing
 import logging
 import logging.handlers # Don't delete this line! It's needed for logging to syslog!
 import os
+import select
 import signal
+import threading
 import time
 
-from SFAClientUtils import SFAClient, SFAMySqlDb, SFAInfluxDb
+from SFAClientUtils import SFAClient, SFAWriter, SFAProfiler, SFAClock
+from SFAClientUtils.SFAClock import REAL_CLOCK
+from SFAClientUtils.SFAScheduler import SFAScheduler
 
 from bracket_expand import bracket_expand, bracket_aware_split
 
@@ -52,47 +57,120 @@ from bracket_expand import bracket_expand, bracket_aware_split
 
 DEFAULT_CONF_FILE="./ddntool.conf"  # config file to use if not specified on the command line 
 
+# How often (in ticks) to log the per-host lateness counters, if any of
+# them are non-zero
+STRAGGLER_REPORT_TICKS = 300
+
+# Number of polls' worth of batches (per controller) that can be waiting on
+# the central writer's queue before the controller processes start dropping
+# them.  (Only used when the writer mode is 'central'.)
+CENTRAL_QUEUE_POLLS = 4
+
 logger = None   # logging object at global (module) scope so everyone can use it
                 # Initialized down in main_func()
 
+def _shared_counter( index):
+    '''
+    Returns a property for one of a WorkerData's shared counters
+    '''
+    return property( lambda self: self.counters[index],
+                     lambda self, value: self.counters.__setitem__( index, value))
+
+
+class WorkerData(object):
+    '''
+    Holds what we need to keep track of for each controller: the Event that
+    its SFAClient waits on, whether it's busy and its lateness counters.
+    The counters are in shared memory so that the SFAClient can publish
+    them along with its other metrics.
+    '''
+    def __init__(self, host):
+        self.host=host
+        self.counters = multiprocessing.Array( 'L', 3, lock = False)
+        self.max_duration = 0.0
+        self.reset()
+
+    def reset( self):
+        '''Called whenever the controller's process is (re)started'''
+        self.e = multiprocessing.Event()
+        self.e.clear()
+        self.last_duration = None   # how long the last iteration took
+        self.busy = False           # True from wakeup until the controller reports back
+        self.deadline_passed = False  # True if busy past the tick it was woken for
+
+    # Lateness counters (see main_loop())
+    ticks_run = _shared_counter( SFAClient.TICKS_RUN)
+    ticks_late = _shared_counter( SFAClient.TICKS_LATE)
+    ticks_skipped = _shared_counter( SFAClient.TICKS_SKIPPED)
+
+
 class ProcessData:
     '''
     Holds a few things we need to keep track of for each process: the process
-    object itself and an Event that the process will wait on
+    object itself, a WorkerData object for each controller it polls and the
+    receiving end of the pipe that the process uses to tell us when each
+    controller has finished an iteration
     '''
-    def __init__(self, host, conf_file, update_time):
+    def __init__(self, host, conf_file, update_time, write_queue = None,
+                 clock = REAL_CLOCK):
         '''
-        Create an event and a process, then start the process.
+        Create the WorkerData and a process, then start the process.
         
         
         host is a string with the hostname
         conf_file is a string with the name of the config file
         update_time is a shared memory value (Multiprocessing.Value) object
         that the processes will use to get their update time values.
+        write_queue is the multiprocessing.Queue for the central writer
+        process (or None if the processes write to the databases themselves)
+        clock is the SFAClock object for the process (see SFAClock.py)
         '''
         
         self.host=host
         self.conf_file=conf_file
         self.update_time=update_time
+        self.write_queue=write_queue
+        self.clock=clock
+        self.workers = [ WorkerData( worker_host) for worker_host in self._worker_hosts() ]
+        self.workers_by_host = dict( [ (w.host, w) for w in self.workers ])
         
         self.restart()
         
     def restart( self):
         '''Restart the process'''
                 
-        self.e = multiprocessing.Event()
-        self.e.clear()
+        for w in self.workers:
+            w.reset()
+        (self.conn, child_conn) = multiprocessing.Pipe( False)
         
         proc_name = 'DDNTool_' + self.host
         logger.debug( "Creating process for host '%s'"%self.host)
         self.p = multiprocessing.Process(name=proc_name,
-                                         target=one_controller,
-                                         args=(self.host, self.conf_file, 
-                                               self.e, self.update_time))
+                                         target=self._target(),
+                                         args=self._target_args( child_conn))
         self.p.daemon = False
         logger.info("Starting background process for %s", self.host)
         print "Starting background process for", self.host
         self.p.start()
+        child_conn.close()  # only the child process uses the sending end
+
+    def _worker_hosts(self):
+        return [ self.host ]
+
+    def _target(self):
+        return one_controller
+
+    def _target_args(self, child_conn):
+        w = self.workers[0]
+        return (self.host, self.conf_file, w.e, self.update_time,
+                self.write_queue, child_conn, self.clock, w.counters)
+
+    def busy(self):
+        '''True if any of the process's controllers is busy'''
+        for w in self.workers:
+            if w.busy:
+                return True
+        return False
     
     def is_alive(self):
         '''
@@ -116,19 +194,81 @@ class ProcessData:
             process_dead = True
             
         if process_dead:
-            # Do some cleanup work: If the process has exited, then the event
-            # is going to be buggered as well.  Best thing to do is create a
-            # new one.  Even if we don't start a replacement process, at least
+            # Do some cleanup work: If the process has exited, then the events
+            # are going to be buggered as well.  Best thing to do is create
+            # new ones.  Even if we don't start a replacement process, at least
             # calls to e.set() will continue to work.
-            self.e = multiprocessing.Event()
-            self.e.clear()
+            for w in self.workers:
+                w.e = multiprocessing.Event()
+                w.e.clear()
             
         return not process_dead
+
+
+class PoolProcessData( ProcessData):
+    '''
+    ProcessData for a worker process that polls several controllers (each
+    from its own thread).  name is just used for logging.
+    '''
+    def __init__(self, name, hosts, conf_file, update_time, write_queue = None,
+                 clock = REAL_CLOCK):
+        self.hosts=hosts
+        ProcessData.__init__(self, name, conf_file, update_time, write_queue, clock)
+
+    def _worker_hosts(self):
+        return self.hosts
+
+    def _target(self):
+        return controller_pool
+
+    def _target_args(self, child_conn):
+        return ([ w.host for w in self.workers ], self.conf_file,
+                [ w.e for w in self.workers ], self.update_time,
+                self.write_queue, child_conn, self.clock,
+                [ w.counters for w in self.workers ])
+
+
+class WriterProcessData:
+    '''
+    Same idea as ProcessData, but for the central DB writer process
+    '''
+    def __init__(self, conf_file, write_queue, num_hosts):
+        self.conf_file=conf_file
+        self.write_queue=write_queue
+        self.num_hosts=num_hosts
+        
+        self.restart()
+        
+    def restart( self):
+        '''Restart the process'''
+        logger.debug( "Creating central DB writer process")
+        self.p = multiprocessing.Process(name='DDNTool_db_writer',
+                                         target=db_writer,
+                                         args=(self.conf_file, self.write_queue,
+                                               self.num_hosts))
+        self.p.daemon = False
+        logger.info("Starting central DB writer process")
+        print "Starting central DB writer process"
+        self.p.start()
+
+    def is_alive(self):
+        '''
+        See ProcessData.is_alive()
+        '''
+        try:
+            return os.waitpid( self.p.pid, os.WNOHANG) == (0, 0)
+        except OSError:
+            return False
     
        
 # event is a multiprocessing.Event object.
 # update_time is a multiprocessing.Value object
-def one_controller(host, conf_file, event, update_time):
+# write_queue is a multiprocessing.Queue object (or None)
+# done_conn is the sending end of a multiprocessing.Pipe
+# clock is an SFAClock object
+# counters is the multiprocessing.Array of the controller's lateness counters
+def one_controller(host, conf_file, event, update_time, write_queue, done_conn,
+                   clock = REAL_CLOCK, counters = None):
     '''
     This is the function that gets called in a separate process.  It handles
     the polling and database updating for a single controller.
@@ -140,59 +280,349 @@ def one_controller(host, conf_file, event, update_time):
     # trap it and shut down cleanly).
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
+    # SIGUSR1 toggles profiling (if it's configured).  See SFAProfiler.py.
+    SFAProfiler.install_signal_handler()
+
+    done_conn = _HostConnection( host, done_conn, threading.Lock())
     try:
-        client = SFAClient.SFAClient( host, conf_file, event, update_time)
+        client = SFAClient.SFAClient( host, conf_file, event, update_time,
+                                      write_queue, done_conn, clock = clock,
+                                      counters = counters)
         client.run()
         # run() loops until the main process sets update_time to 0
     except Exception, e:
         logger.exception( "Process %s caught %s exception."%(host,
                                                          type(e).__name__))
+        # Let the main process know we're not going to finish this iteration
+        done_conn.send( ('error', update_time.value, type(e).__name__))
 
     logger.info( "Process %s is exiting.", host)
     print "Process ", host, " is exiting."
 
 
+class _HostConnection:
+    '''
+    Looks enough like the sending end of a multiprocessing Pipe for an
+    SFAClient object.  Messages are tagged with the host name before they're
+    sent on the real pipe.  (In pool mode, all the threads share the pipe,
+    hence the lock.)
+    '''
+    def __init__(self, host, conn, lock):
+        self.host=host
+        self.conn=conn
+        self.lock=lock
+
+    def send(self, msg):
+        with self.lock:
+            self.conn.send( (self.host,) + msg)
+
+
+def pool_client(host, conf_file, event, update_time, write_queue, done_conn,
+                clock, counters):
+    '''
+    Thread function for one controller in a pool process
+    '''
+    logger = logging.getLogger( "DDNTool")
+    try:
+        client = SFAClient.SFAClient( host, conf_file, event, update_time,
+                                      write_queue, done_conn, shared_process = True,
+                                      clock = clock, counters = counters)
+        client.run()
+    except Exception, e:
+        logger.exception( "Thread for %s caught %s exception."%(host,
+                                                            type(e).__name__))
+        event.clear()   # so the replacement thread doesn't start straight away
+        done_conn.send( ('error', update_time.value, type(e).__name__))
+
+
+# hosts is a list of the controllers this process handles.  events and
+# counters are lists of each one's multiprocessing.Event and lateness
+# counters.  The rest of the parameters are the same as for one_controller().
+def controller_pool(hosts, conf_file, events, update_time, write_queue, done_conn,
+                    clock = REAL_CLOCK, counters = None):
+    '''
+    This is the function that gets called in each process in pool mode.  It
+    runs an SFAClient object for each controller in hosts (each in its own
+    thread).  The main process wakes each controller's thread itself and
+    each thread reports back on done_conn as soon as it's done, so a slow
+    controller doesn't hold up the others in the pool.  All this function
+    has to do is restart any threads that crash.
+    '''
+    logger = logging.getLogger( "DDNTool")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # see one_controller()
+    SFAProfiler.install_signal_handler()  # requests profiles from all the threads
+
+    conn_lock = threading.Lock()
+    threads = { }   # maps the host name to its thread
+
+    def start_thread( i):
+        host = hosts[i]
+        thread = threading.Thread( name='DDNTool_' + host, target=pool_client,
+                                   args=(host, conf_file, events[i], update_time,
+                                         write_queue,
+                                         _HostConnection( host, done_conn, conn_lock),
+                                         clock, counters[i]))
+        thread.daemon = True
+        thread.start()
+        threads[host] = thread
+
+    for i in range( len(hosts)):
+        start_thread( i)
+
+    # The threads exit when the main process sets update_time to 0 (and
+    # then sets their events)
+    while True:
+        alive = False
+        for i in range( len(hosts)):
+            if threads[hosts[i]].is_alive():
+                alive = True
+            elif update_time.value != 0:
+                logger.error( "Thread for %s has crashed!  Restarting!"%hosts[i])
+                start_thread( i)
+                alive = True
+        if not alive:
+            break
+        time.sleep( 1.0)
+
+    logger.info( "Pool process for %s is exiting.", ", ".join( hosts))
+
+
+# write_queue is the multiprocessing.Queue that all the controller processes
+# put their batches of writes on.
+# num_hosts is the number of controller processes
+def db_writer(conf_file, write_queue, num_hosts):
+    '''
+    This is the function that gets called in the central DB writer process.
+    It's the only process that has connections to the database(s).
+    '''
+    logger = logging.getLogger( "DDNTool")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # see one_controller()
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)  # nothing to profile here
+
+    try:
+        config = ConfigParser.ConfigParser()
+        config.read(conf_file)
+        sinks = SFAWriter.open_sinks( config, spool_name = 'central_writer')
+        # If we haven't heard from anyone for a full poll interval, go ahead
+        # and write whatever we've got
+        max_wait = config.getfloat('polling', 'fast_poll_interval')
+        (metrics, metrics_multiple) = SFAWriter.open_metrics( config)
+        writer = SFAWriter.SFACentralWriter( sinks, write_queue, num_hosts, max_wait,
+                                             metrics, metrics_multiple)
+        writer.run()
+        # run() loops until the main process puts None on the queue
+    except Exception, e:
+        logger.exception( "DB writer process caught %s exception."% \
+                          type(e).__name__)
+
+    logger.info( "DB writer process is exiting.")
+    print "DB writer process is exiting."
+
+
+# proc_list is a list of ProcessData objects
+# timeout is the longest we'll wait (in seconds, or None for no limit)
+def wait_for_iterations( proc_list, timeout):
+    '''
+    Blocks until every busy controller in proc_list has reported that it's
+    finished its current iteration (or its process has died), or the timeout
+    expires.  Controllers that report back are marked as not busy.
+
+    Note: Python 2 doesn't have multiprocessing.connection.wait(), so we
+    select() on the pipes' file descriptors instead.  select() isn't
+    restarted after a signal (SIGUSR1, for example), so we have to retry it
+    ourselves.
+    '''
+    logger = logging.getLogger( "DDNTool")
+    end_time = None
+    if timeout is not None:
+        end_time = time.time() + timeout
+    waiting = dict( [ (p.conn.fileno(), p) for p in proc_list if p.busy() ])
+    while waiting:
+        # The select timeout is capped so we notice processes that die
+        # without closing their pipe
+        remaining = 1.0
+        if end_time is not None:
+            remaining = end_time - time.time()
+        try:
+            (readable, unused_w, unused_x) = select.select( waiting.keys(), [], [],
+                                                            max( 0, min( remaining, 1.0)))
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise
+            continue  # interrupted by a signal
+        for fd in readable:
+            p = waiting[fd]
+            try:
+                (host, status, unused_update_time, detail) = p.conn.recv()
+            except EOFError:
+                # The process exited (the next liveness check will restart it)
+                for w in p.workers:
+                    w.busy = False
+                del waiting[fd]
+                continue
+
+            w = p.workers_by_host[host]
+            w.busy = False
+            if status == 'done':
+                w.last_duration = detail
+                w.max_duration = max( w.max_duration, detail)
+                logger.debug( "%s finished its iteration in %.3f seconds"% \
+                              (host, detail))
+            else:
+                logger.error( "%s failed its iteration with %s"%(host, detail))
+            if not p.busy():
+                del waiting[fd]
+
+        if not readable:
+            for fd in waiting.keys():
+                if not waiting[fd].is_alive():
+                    for w in waiting.pop( fd).workers:
+                        w.busy = False
+            if remaining <= 0:
+                break
+
+
+class _DeferredInterrupt:
+    '''
+    Holds off Ctrl-C (SIGINT) until the end of a 'with' block.  A
+    KeyboardInterrupt in the middle of a multiprocessing.Event's set() leaves
+    the event's semaphores out of step, and the controller waiting on it
+    never wakes up again (not even to shut down).
+    '''
+    def __enter__(self):
+        self.interrupted = False
+        self.old_handler = signal.signal( signal.SIGINT, self._handler)
+        return self
+
+    def _handler(self, signum, frame):
+        self.interrupted = True
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        signal.signal( signal.SIGINT, self.old_handler)
+        if self.interrupted and exc_type is None:
+            raise KeyboardInterrupt
+        return False
+
+
+def log_lateness( proc_list):
+    '''
+    Logs the lateness counters for any controllers that have been late.
+    (The controllers publish them in their metrics too - see
+    SFAClient.run().)
+    '''
+    logger = logging.getLogger( "DDNTool")
+    for p in proc_list:
+        for w in p.workers:
+            if w.ticks_late or w.ticks_skipped:
+                logger.info( "%s: %d ticks run, %d late, %d skipped, longest "
+                             "iteration %.3f seconds"% \
+                             (w.host, w.ticks_run, w.ticks_late, w.ticks_skipped,
+                              w.max_duration))
+
+
 # proc_list is a list of ProcessData objects
 # wake_time is how often the sub-processes should wake (in seconds)
 # update_time is shared_mem object (multiprocessing.Value) that all the 
 # sub-processes will use for their LastUpdate fields
-def main_loop( proc_list, wake_time, update_time):
+# writer_proc is the WriterProcessData object for the central DB writer (or
+# None if there isn't one)
+# stagger is True if the processes' wakeups should be spread across the
+# interval instead of all happening at the start of it
+# profiler is an optional SFAProfiler for the main loop itself
+# clock is the SFAClock object that sets the pace
+# end_time (a clock time) is when to stop, or None to run until Ctrl-C
+def main_loop( proc_list, wake_time, update_time, writer_proc = None,
+               stagger = False, profiler = None, clock = REAL_CLOCK,
+               end_time = None):
     '''
     Called by main_func() after the initialization has been completed.  Its
     job is to wake up all the processes at set intervals.
+
+    In staggered mode, each process is given a fixed phase within the
+    interval (process i is woken i/N of the way through it), so the
+    controllers aren't all polled - and the databases aren't all written
+    to - at the same instant.  Every process still gets the update time
+    for the start of the tick, so their rows line up in the database.
+
+    With a virtual clock, the processes run in lock step: each tick starts
+    as soon as every process has finished the last one, so no ticks are
+    ever late or skipped.
     
-    Note: this function loops forever.  Ctrl-C is how we expect the user to
-    break out of it.
+    Note: unless end_time is set, this function loops forever.  Ctrl-C is
+    how we expect the user to break out of it.
     '''
 
     logger = logging.getLogger( "DDNTool")
     
+    tick = 0
+    start_time = clock.time()
+    real_start_time = time.time()
     try:
-        last_wake = time.time()
+        # The wakeups are at exact multiples of wake_time (so the time series
+        # data is evenly spaced).  Late and skipped ticks are logged by the
+        # scheduler.
+        scheduler = SFAScheduler( wake_time, clock.monotonic, clock.sleep)
+        scheduler.start()
+        if stagger and len(proc_list) > 1:
+            phase = wake_time / len(proc_list)
+            logger.info( "Staggering process wakeups by %.3f seconds"%phase)
+        else:
+            phase = 0.0
 
-        while True:
-            while (time.time() < last_wake + wake_time):
-                time.sleep( 0.01)  # 10 millisec sleep
+        while end_time is None or clock.time() < end_time:
+            scheduler.wait()
+            tick += 1
+            if profiler:
+                profiler.begin_tick()
         
             # Make sure all the sub processes are still alive
             for p in proc_list:
                 if not p.is_alive():
                     logger.error( "Process %s has crashed!  Restarting!"%p.p.name)
                     p.restart()
+            if writer_proc and not writer_proc.is_alive():
+                logger.error( "DB writer process has crashed!  Restarting!")
+                writer_proc.restart()
                     
-            # Wake up all the sub processes
-            last_wake = time.time()
-            update_time.value = int(last_wake)
+            # Pick up any reports from processes that overran the last tick
+            wait_for_iterations( proc_list, 0)
+
+            # Wake up all the controllers (except any that are still busy
+            # with an earlier tick - they skip this one so that one slow
+            # controller doesn't hold up everyone else, even in its own pool)
+            update_time.value = int(clock.time())
             logger.debug( "Waking all sub-processes")
-            for p in proc_list:
-                p.e.set()  # set the event that each process is waiting on
+            for (i, p) in enumerate( proc_list):
+                if phase:
+                    scheduler.wait_for_offset( i * phase)
+                    wait_for_iterations( [p], 0)  # in case it's just finished
+                with _DeferredInterrupt():
+                    for w in p.workers:
+                        if w.busy:
+                            if not w.deadline_passed:
+                                w.deadline_passed = True
+                                w.ticks_late += 1
+                            w.ticks_skipped += 1
+                            logger.warning( "%s is still busy.  Skipping its tick."%w.host)
+                            continue
+                        w.busy = True
+                        w.deadline_passed = False
+                        w.ticks_run += 1
+                        w.e.set()  # set the event that each controller is waiting on
                 
             # When the processes have finished one iteration of their loops,
-            # they will clear their events.  We wait for this so that we're
-            # sure no subprocess is falling behind
-            for p in proc_list:
-                while p.is_alive() and p.e.is_set():
-                    time.sleep( 0.01)
+            # they will send a message on their pipes.  We wait for this (up
+            # until the next tick) so that we know who's falling behind.
+            # (Virtual time doesn't move while we wait, so in that case we
+            # wait for as long as it takes.)
+            if clock.virtual:
+                wait_for_iterations( proc_list, None)
+            else:
+                wait_for_iterations( proc_list, scheduler.time_to_next_tick())
+            if tick % STRAGGLER_REPORT_TICKS == 0:
+                log_lateness( proc_list)
+            if profiler:
+                profiler.end_tick()
             logger.debug( "All sub-processes have completed their iterations")
             logger.debug("")    # Insert a blank line in the debug log - makes
                                 # it easier to figure out where the loop 
@@ -201,6 +631,11 @@ def main_loop( proc_list, wake_time, update_time):
     except KeyboardInterrupt:
         # Perfectly normal.  Ctrl-C is how we expect to exit
         logger.debug( "Exiting from main loop")
+
+    if clock.virtual:
+        logger.info( "Ran %d ticks (%.1f seconds of virtual time) in %.1f "
+                     "seconds"%(tick, clock.time() - start_time,
+                                time.time() - real_start_time))
       
 
 def main_func():
@@ -271,58 +706,82 @@ def main_func():
         logger.info(  "Initializing the the database(s)...")
         print "Initializing the the database(s)..."
 
-        sqldb_configured = False
-        if config.has_section('SqlDb'):
-            sqldb_user = config.get('SqlDb', 'user')
-            sqldb_password = config.get('SqlDb', 'password')
-            sqldb_host = config.get('SqlDb', 'host')
-            sqldb_name = config.get('SqlDb', 'name')
-            sqldb_configured = True
-        elif config.has_section('database'):
-            sqldb_user = config.get('database', 'db_user')
-            sqldb_password = config.get('database', 'db_password')
-            sqldb_host = config.get('database', 'db_host')
-            sqldb_name = config.get('database', 'db_name')
-            sqldb_configured = True       
-        
-        if sqldb_configured:
-            # don't actually need the db connection, but this is how we force
-            # the db init code to run
-            db = SFAMySqlDb.SFAMySqlDb(sqldb_user, sqldb_password,   # @UnusedVariable
-                                       sqldb_host, sqldb_name,
-                                       main_args.init_db)
-            db = None  # @UnusedVariable
-        
-        if config.has_section('TSDb'):
-            tsdb_user = config.get('TSDb', 'user')
-            tsdb_password = config.get('TSDb', 'password')
-            tsdb_host = config.get('TSDb', 'host')
-            tsdb_name = config.get('TSDb', 'name')
-            # Again, we don't actually need the db connection here, but it's how we
-            # force the init code to run
-            db = SFAInfluxDb.SFAInfluxDb( tsdb_user, tsdb_password, # @UnusedVariable
-                                          tsdb_host, tsdb_name,
-                                          main_args.init_db)
-            db = None # @UnusedVariable
+        # don't actually need the db connections, but this is how we force
+        # the db init code to run
+        sinks = SFAWriter.open_sinks( config, main_args.init_db)  # @UnusedVariable
+        sinks = None  # @UnusedVariable
 
     # shared memory value that all the sub-processes will have access to
     # main_loop() will update it with the time the sub-processes will use
     # for their LastUpdate fields
     update_time = multiprocessing.Value( 'L', 0)
+
+    # The clock has to be created before the processes are forked so that
+    # a virtual clock is shared with them
+    clock = SFAClock.open_clock( config)
+    end_time = None
+    if clock.virtual:
+        logger.info( "Using a virtual clock starting at %s"% \
+                     time.ctime( clock.time()))
+        if config.has_option('polling', 'virtual_duration') and \
+           config.getfloat('polling', 'virtual_duration') > 0:
+            end_time = clock.time() + config.getfloat('polling', 'virtual_duration')
     
-    # Fork a process for each controller in the config file
+    # Fork a process for each controller in the config file (or, in pool mode,
+    # a process for each group of controllers)
     sfa_processes = [] # holds the ProcessData objects, not SFAClient objects!
     sfa_hosts = [ host.strip() for host in
             bracket_aware_split(config.get('ddn_hardware', 'sfa_hosts')) ]
     bracket_expand( sfa_hosts)
-    for host in sfa_hosts:
-        sfa_processes.append( ProcessData( host, main_args.conf_file, update_time))       
+
+    # If requested, start up the process that does all the database writes
+    write_queue = None
+    writer_proc = None
+    if SFAWriter.writer_mode( config) == 'central':
+        write_queue = multiprocessing.Queue( CENTRAL_QUEUE_POLLS * len(sfa_hosts))
+        writer_proc = WriterProcessData( main_args.conf_file, write_queue, len(sfa_hosts))
+
+    if config.has_option('workers', 'pool') and config.getboolean('workers', 'pool'):
+        # Pool mode: spread the controllers over a fixed number of processes
+        num_procs = 0
+        if config.has_option('workers', 'processes'):
+            num_procs = config.getint('workers', 'processes')
+        if num_procs <= 0:
+            num_procs = multiprocessing.cpu_count()
+        num_procs = min( num_procs, len(sfa_hosts))
+        for i in range(num_procs):
+            sfa_processes.append( PoolProcessData( 'pool%d'%i, sfa_hosts[i::num_procs],
+                                                   main_args.conf_file, update_time,
+                                                   write_queue, clock))
+    else:
+        for host in sfa_hosts:
+            sfa_processes.append( ProcessData( host, main_args.conf_file, update_time,
+                                               write_queue, clock))
         
     # All processes are started (and are waiting on their events). Have
     # the main loop take over...
     wake_time = config.getfloat('polling', 'fast_poll_interval')
-    main_loop( sfa_processes, wake_time, update_time)
+    stagger = config.has_option('polling', 'stagger') and \
+              config.getboolean('polling', 'stagger')
+
+    # SIGUSR1 starts (or stops early) a profile of the main loop and is
+    # passed on to all the controller processes so they profile themselves
+    # too.  (It has to be installed after the processes have been forked.)
+    profiler = SFAProfiler.open_profiler( config, 'supervisor')
+    def forward_signal():
+        if profiler is None:
+            logger.warning( "Got SIGUSR1, but there's no profiling section "
+                            "in the config file.")
+            return
+        for p in sfa_processes:
+            if p.is_alive():
+                os.kill( p.p.pid, signal.SIGUSR1)
+    SFAProfiler.install_signal_handler( forward_signal)
+
+    main_loop( sfa_processes, wake_time, update_time, writer_proc, stagger,
+               profiler, clock, end_time)
     # if we've returned from main_loop(), it's because someone hit CTRL-C
+    # (or a virtual clock reached virtual_duration)
     
     # Make sure all the events have been cleared by the sub processes
     # (Prevents a race condition caused by the fact that each sub-process
@@ -331,8 +790,9 @@ def main_func():
     logger.info( "Exited from main loop.  Waiting for subprocesses to finish"
                   " their current loop iteration.")
     for p in sfa_processes:
-        while p.is_alive() and p.e.is_set():
-            time.sleep( 0.01)  # sleep waiting for sub-process to finish its current task  
+        for w in p.workers:
+            while p.is_alive() and w.e.is_set():
+                time.sleep( 0.01)  # sleep waiting for sub-process to finish its current task  
     
     logger.debug( "All processes have finished current event.  "
                   "Setting update time to 0.")
@@ -341,13 +801,22 @@ def main_func():
                             # shutdown command
     for p in sfa_processes:
         if p.is_alive():
-            p.e.set()
+            for w in p.workers:
+                w.e.set()
         
     logger.debug( "Waiting for processes to shut down.")
     for p in sfa_processes:
         if p.is_alive():
             p.p.join()
 
+    # The controller processes are all gone, so the writer has everything
+    # it's going to get.  Tell it to finish up.
+    if writer_proc:
+        logger.debug( "Waiting for the DB writer process to shut down.")
+        if writer_proc.is_alive():
+            write_queue.put( None)
+            writer_proc.p.join()
+
     
     logger.info( "DDNTool exiting")
     print "DDNTool exiting"
@@ -0,0 +1,163 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import ConfigParser
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import unittest
+import DDNTool
+from SFAClientUtils import SFAClient, SFAProfiler
+from SFACapture_Test import RecordingSink
+
+
+class FakeProcessData(object):
+    '''
+    Just enough of DDNTool.ProcessData for wait_for_iterations() and
+    log_lateness(): a pipe and real WorkerData objects, but no process
+    '''
+    def __init__(self, hosts, conn):
+        self.conn = conn
+        self.workers = [ DDNTool.WorkerData( host) for host in hosts ]
+        self.workers_by_host = dict( [ (w.host, w) for w in self.workers ])
+        for w in self.workers:
+            w.busy = True
+
+    def busy(self):
+        return any( w.busy for w in self.workers)
+
+    def is_alive(self):
+        return True
+
+
+class DDNTool_Test( unittest.TestCase):
+
+    def tearDown(self):
+        signal.signal( signal.SIGUSR1, signal.SIG_DFL)
+
+    # SIGUSR1 (profiling) used to kill the main process when it arrived
+    # while wait_for_iterations() was in select()
+    def testSignalDuringWait(self):
+        SFAProfiler.install_signal_handler()
+        (conn, child_conn) = multiprocessing.Pipe( False)
+        p = FakeProcessData( [ 'sfa1' ], conn)
+        signaller = threading.Timer( 0.1, os.kill, (os.getpid(), signal.SIGUSR1))
+        reporter = threading.Timer( 0.3, child_conn.send, (('sfa1', 'done', 100, 0.25),))
+        signaller.start()
+        reporter.start()
+        try:
+            DDNTool.wait_for_iterations( [p], 5.0)
+        finally:
+            signaller.join()
+            reporter.join()
+        self.assertFalse( p.workers[0].busy)
+        self.assertEqual( p.workers[0].last_duration, 0.25)
+
+    # In pool mode, each controller reports back (and is marked as not busy)
+    # as soon as it's done, whether or not the rest of the pool is
+    def testPoolReportsPerHost(self):
+        (conn, child_conn) = multiprocessing.Pipe( False)
+        p = FakeProcessData( [ 'sfa1', 'sfa2', 'sfa3' ], conn)
+        child_conn.send( ('sfa3', 'done', 100, 0.5))
+        child_conn.send( ('sfa1', 'error', 100, 'APIException'))
+        DDNTool.wait_for_iterations( [p], 0.2)
+        (sfa1, sfa2, sfa3) = p.workers
+        self.assertFalse( sfa1.busy)
+        self.assertTrue( sfa2.busy)
+        self.assertFalse( sfa3.busy)
+        self.assertEqual( sfa1.last_duration, None)
+        self.assertEqual( sfa3.last_duration, 0.5)
+        self.assertEqual( sfa3.max_duration, 0.5)
+
+        child_conn.send( ('sfa2', 'done', 100, 3.0))
+        DDNTool.wait_for_iterations( [p], 0.2)
+        self.assertFalse( p.busy())
+        self.assertEqual( sfa2.max_duration, 3.0)
+
+    # The lateness counters live in shared memory so the controller's own
+    # process can publish them (see SFAClient._record_lateness())
+    def testSharedCounters(self):
+        w = DDNTool.WorkerData( 'sfa1')
+        w.ticks_run += 3
+        w.ticks_late += 1
+        w.ticks_skipped += 2
+        self.assertEqual( list( w.counters), [ 3, 1, 2 ])
+        self.assertEqual( w.counters[SFAClient.TICKS_SKIPPED], 2)
+
+    # Each controller publishes the ticks the main process counted as late or
+    # skipped for it in its own metrics
+    def testClientPublishesLateness(self):
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'TSDb')
+        config.add_section( 'polling')
+        config.set( 'polling', 'fast_poll_interval', '2')
+        config.set( 'polling', 'med_poll_multiple', '100')
+        config.set( 'polling', 'slow_poll_multiple', '100')
+        config.add_section( 'ddn_hardware')
+        config.set( 'ddn_hardware', 'sfa_user', 'user')
+        config.set( 'ddn_hardware', 'sfa_password', 'password')
+        config.set( 'ddn_hardware', 'api', 'simulator')
+        config.add_section( 'simulator')
+        config.set( 'simulator', 'luns', '2')
+        config.set( 'simulator', 'latency_ms', '0')
+        config.add_section( 'metrics')
+        config.set( 'metrics', 'enabled', 'true')
+        w = DDNTool.WorkerData( 'sim1')
+        event = threading.Event()
+        update_time = multiprocessing.Value( 'L', 0)
+        (conn, child_conn) = multiprocessing.Pipe( False)
+        (fd, conf_file) = tempfile.mkstemp( suffix = '.conf')
+        try:
+            conf = os.fdopen( fd, 'w')
+            config.write( conf)
+            conf.close()
+            client = SFAClient.SFAClient( 'sim1', conf_file, event, update_time,
+                                          done_conn = child_conn,
+                                          sinks = { 'tsdb' : RecordingSink() },
+                                          counters = w.counters)
+        finally:
+            os.remove( conf_file)
+        thread = threading.Thread( target = client.run)
+        thread.start()
+        try:
+            update_time.value = 1000
+            event.set()
+            (status, unused_t, duration) = conn.recv()
+            self.assertEqual( status, 'done')
+            # The main process found it busy at the next tick and the one
+            # after that
+            w.ticks_late += 1
+            w.ticks_skipped += 2
+            update_time.value = 1006
+            event.set()
+            self.assertEqual( conn.recv()[0], 'done')
+        finally:
+            update_time.value = 0
+            event.set()
+            thread.join()
+
+        summary = dict( [ (row[0], row[1:]) for row in client._metrics.summarize() ])
+        self.assertEqual( summary['late_iteration'][:2], (1, duration))
+        self.assertEqual( summary['skipped_tick'][:2], (2, 4.0))
+
+if __name__ == '__main__':
+    unittest.main()
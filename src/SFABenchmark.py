@@ -0,0 +1,273 @@
+#!/usr/bin/python
+
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+End-to-end benchmark of the collector pipeline.
+
+Runs the SFAClient poll/write cycle against simulated controllers (see
+SFAClientUtils/SFASimulator.py, with no API latency) and fake databases,
+as fast as it can, for every combination of controller and LUN counts
+given on the command line.  All the controllers are polled one after the
+other from a single thread, so the numbers are the CPU cost of the
+pipeline itself.  Each combination runs in a fresh process (so that the
+peak RSS belongs to that combination alone).
+
+The results are printed as JSON:
+    { "benchmark" : "pipeline", "python" : ..., "sinks" : ...,
+      "results" : [ { "controllers", "luns", "ticks", "ticks_per_second",
+                      "tick_latency_p50", "tick_latency_p99",
+                      "tick_latency_max", "cpu_seconds_per_tick",
+                      "peak_rss_kb", "setup_seconds", "rows_written" }, ... ] }
+(Latencies and CPU times are in seconds.)
+
+Example:
+    SFABenchmark.py --controllers 1,10,100 --luns 10,100,2000 --ticks 60
+'''
+
+import argparse
+import ConfigParser
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+from SFAClientUtils import SFAClient
+from SFAClientUtils.SFAMetrics import percentile
+from SFAClientUtils.SFAScheduler import monotonic
+
+# The (simulated) fast poll interval.  Only used for the update times.
+BENCHMARK_POLL_INTERVAL = 2
+
+
+class CountingSink(object):
+    '''
+    A fake database.  Accepts any of the SFAMySqlDb or SFAInfluxDb write
+    methods and just counts the rows it's given.
+    '''
+    def __init__(self):
+        self.rows = 0
+
+    def __getattr__(self, name):
+        if name.startswith( '_'):
+            raise AttributeError( name)
+
+        def write( *args):
+            if name.endswith( '_multi'):
+                self.rows += len(args[-1])
+            elif name != 'flush_to_db':
+                self.rows += 1
+        return write
+
+
+class NullInfluxClient(object):
+    '''
+    Stands in for the InfluxDBClient object.  Throws the requests away (but
+    counts the bytes).
+    '''
+    def __init__(self):
+        self.bytes_sent = 0
+
+    def request(self, url, method = 'GET', params = None, data = None,
+                expected_response_code = 200, headers = None):
+        self.bytes_sent += len(data)
+
+
+def make_sinks( sink_type):
+    '''
+    Returns the fake databases for one controller.  sink_type is 'count'
+    (both databases are CountingSinks) or 'influx' (a real SFAInfluxDb object
+    with the network replaced by a NullInfluxClient, so the line protocol
+    encoding is included in the measurements).
+    '''
+    sinks = { 'sqldb' : CountingSink() }
+    if sink_type == 'influx':
+        from SFAClientUtils.SFAInfluxDb import SFAInfluxDb
+        tsdb = SFAInfluxDb( 'user', 'password', 'localhost', 'benchmark', precision = 's')
+        tsdb._dbcon = NullInfluxClient()
+        sinks['tsdb'] = tsdb
+    else:
+        sinks['tsdb'] = CountingSink()
+    return sinks
+
+
+def write_config( num_luns, med_poll_multiple, slow_poll_multiple):
+    '''
+    Writes a config file for the simulated controllers and returns its name
+    '''
+    config = ConfigParser.ConfigParser()
+    # The database sections only need to exist (the benchmark passes its own
+    # fake databases to SFAClient)
+    for section in [ 'SqlDb', 'TSDb' ]:
+        config.add_section( section)
+        for option in [ 'host', 'name', 'user', 'password' ]:
+            config.set( section, option, 'benchmark')
+    config.add_section( 'polling')
+    config.set( 'polling', 'fast_poll_interval', str(BENCHMARK_POLL_INTERVAL))
+    config.set( 'polling', 'med_poll_multiple', str(med_poll_multiple))
+    config.set( 'polling', 'slow_poll_multiple', str(slow_poll_multiple))
+    config.add_section( 'ddn_hardware')
+    config.set( 'ddn_hardware', 'sfa_user', 'user')
+    config.set( 'ddn_hardware', 'sfa_password', 'password')
+    config.set( 'ddn_hardware', 'api', 'simulator')
+    config.add_section( 'simulator')
+    config.set( 'simulator', 'luns', str(num_luns))
+    config.set( 'simulator', 'latency_ms', '0')
+
+    (fd, conf_file) = tempfile.mkstemp( prefix = 'ddntool_benchmark', suffix = '.conf')
+    conf = os.fdopen( fd, 'w')
+    try:
+        config.write( conf)
+    finally:
+        conf.close()
+    return conf_file
+
+
+def cpu_seconds( usage):
+    '''
+    User plus system CPU time in a resource.getrusage() result
+    '''
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_case( num_controllers, num_luns, ticks, warmup, sink_type,
+              med_poll_multiple, slow_poll_multiple):
+    '''
+    Benchmarks one combination of controller and LUN counts.  Returns a
+    dictionary of the results.  (Runs in its own process.)
+    '''
+    logging.getLogger().setLevel( logging.WARNING)
+    conf_file = write_config( num_luns, med_poll_multiple, slow_poll_multiple)
+    try:
+        setup_start = monotonic()
+        clients = [ ]
+        for i in range( num_controllers):
+            # All the clients are in this process, so each one has to use
+            # its own API context (see SFAClient.__init__())
+            client = SFAClient.SFAClient( 'sim%d'%i, conf_file, None, None,
+                                          shared_process = True,
+                                          sinks = make_sinks( sink_type))
+            client.prepare()
+            clients.append( client)
+        setup_seconds = monotonic() - setup_start
+    finally:
+        os.remove( conf_file)
+
+    update_time = int( time.time())
+    latencies = [ ]
+    run_start = None
+    usage_start = None
+    for tick in range( warmup + ticks):
+        if tick == warmup:
+            run_start = monotonic()
+            usage_start = resource.getrusage( resource.RUSAGE_SELF)
+        tick_start = monotonic()
+        for client in clients:
+            client.poll_once( tick, update_time + tick * BENCHMARK_POLL_INTERVAL)
+        if tick >= warmup:
+            latencies.append( monotonic() - tick_start)
+    # The CPU time and peak RSS are measured once over the whole run (the
+    # CPU times' resolution is too coarse for a single tick)
+    run_seconds = monotonic() - run_start
+    usage = resource.getrusage( resource.RUSAGE_SELF)
+    total_cpu = cpu_seconds( usage) - cpu_seconds( usage_start)
+
+    latencies.sort()
+    rows_written = sum( [ sink.rows for client in clients
+                          for sink in client._sinks.values()
+                          if isinstance( sink, CountingSink) ])
+    return { 'controllers' : num_controllers,
+             'luns' : num_luns,
+             'ticks' : ticks,
+             'ticks_per_second' : ticks / run_seconds,
+             'tick_latency_p50' : percentile( latencies, 0.50),
+             'tick_latency_p99' : percentile( latencies, 0.99),
+             'tick_latency_max' : latencies[-1],
+             'cpu_seconds_per_tick' : total_cpu / ticks,
+             'peak_rss_kb' : usage.ru_maxrss,
+             'setup_seconds' : setup_seconds,
+             'rows_written' : rows_written }
+
+
+def _int_list( text):
+    return [ int(value) for value in text.split( ',') ]
+
+
+def main_func():
+    parser = argparse.ArgumentParser(
+            description = "Benchmark the SFAClient poll/write pipeline against "
+                          "simulated controllers and fake databases.")
+    parser.add_argument( '--controllers', type=_int_list, default=[1, 10, 100],
+                         help="Comma separated list of controller counts (default: 1,10,100)")
+    parser.add_argument( '--luns', type=_int_list, default=[10, 100],
+                         help="Comma separated list of LUNs per controller (default: 10,100)")
+    parser.add_argument( '--ticks', type=int, default=60,
+                         help="Number of measured ticks for each combination (default: 60)")
+    parser.add_argument( '--warmup', type=int, default=2,
+                         help="Number of ticks to run before measuring (default: 2)")
+    parser.add_argument( '--sinks', choices=[ 'count', 'influx' ], default='count',
+                         help="Fake databases to write to.  'influx' includes the "
+                              "InfluxDB line protocol encoding (default: count)")
+    parser.add_argument( '--med_poll_multiple', type=int, default=15,
+                         help="As in the config file (default: 15)")
+    parser.add_argument( '--slow_poll_multiple', type=int, default=60,
+                         help="As in the config file (default: 60)")
+    parser.add_argument( '-o', '--output',
+                         help="Write the JSON to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = [ ]
+    for num_controllers in args.controllers:
+        for num_luns in args.luns:
+            # A new process for each case, so the peak RSS is just this case's
+            pool = multiprocessing.Pool( 1)
+            try:
+                results.append( pool.apply( run_case, (num_controllers, num_luns,
+                        args.ticks, args.warmup, args.sinks,
+                        args.med_poll_multiple, args.slow_poll_multiple)))
+            finally:
+                pool.close()
+                pool.join()
+            sys.stderr.write( "%d controllers x %d LUNs: %.2f ticks/s\n"% \
+                              (num_controllers, num_luns,
+                               results[-1]['ticks_per_second']))
+
+    report = { 'benchmark' : 'pipeline',
+               'python' : platform.python_version(),
+               'sinks' : args.sinks,
+               'results' : results }
+    if args.output:
+        output = open( args.output, 'w')
+        try:
+            json.dump( report, output, indent=2, sort_keys=True)
+        finally:
+            output.close()
+    else:
+        json.dump( report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write( '\n')
+
+if __name__ == '__main__':
+    main_func()
@@ -0,0 +1,227 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import ConfigParser
+import os
+import shutil
+import tempfile
+import unittest
+from SFAClientUtils import SFACapture
+from SFAClientUtils import SFAClient
+from SFAClientUtils import SFAReplay
+
+
+class FakeApiObject(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update( kwargs)
+
+
+class RecordingSink(object):
+    '''
+    A fake database that remembers every write
+    '''
+    def __init__(self):
+        self.writes = [ ]
+
+    def __getattr__(self, name):
+        if name.startswith( '_'):
+            raise AttributeError( name)
+        return lambda *args: self.writes.append( (name, args))
+
+
+class SFACapture_Test( unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree( self._dir)
+
+    def write_capture(self, name, records):
+        writer = SFACapture.SFACaptureWriter( self._dir, name, 0)
+        for (timestamp, class_name, objects) in records:
+            writer.record( timestamp, class_name, objects)
+        writer.close()
+        return writer.path
+
+    def testRoundTrip(self):
+        labels = [ 'IO Size <=4KiB', 'IO Size >4MiB' ]
+        pools = [ FakeApiObject( Index = i, PoolState = i % 2, Extra = 'x') for i in range(3) ]
+        path = self.write_capture( 'host1', [ (100.5, 'SFAStoragePool', pools) ])
+        # Restarting the capture appends to the same file
+        self.write_capture( 'host1', [ (102.5, 'SFAController',
+                                        [ FakeApiObject( Index = 0, FWRelease = '3.1.0.0') ]) ])
+
+        reader = SFACapture.SFACaptureReader( path)
+        records = list( reader)
+        reader.close()
+        self.assertEqual( [ (r[0], r[1]) for r in records ],
+                          [ (100.5, 'SFAStoragePool'), (102.5, 'SFAController') ])
+        self.assertEqual( [ p.PoolState for p in records[0][2] ], [ 0, 1, 0 ])
+        self.assertFalse( hasattr( records[0][2][0], 'Extra'))  # not captured
+        self.assertEqual( records[1][2][0].FWRelease, '3.1.0.0')
+
+        # Lists come back as lists (not tuples)
+        stats = FakeApiObject( **dict( [ (field, [1, 2]) for field in
+                                         SFACapture.CAPTURE_FIELDS['SFAVirtualDiskStatistics'] ]))
+        stats.Index = 7
+        stats.IOSizeIndexLabels = labels
+        path = self.write_capture( 'host2', [ (1.0, 'SFAVirtualDiskStatistics', [ stats, stats ]) ])
+        reader = SFACapture.SFACaptureReader( path)
+        objects = reader.next()[2]
+        reader.close()
+        self.assertEqual( objects[1].Index, 7)
+        self.assertEqual( objects[1].IOSizeIndexLabels, labels)
+        self.assertEqual( objects[0].ReadIOs, [1, 2])
+
+    def testTruncatedRecord(self):
+        pools = [ FakeApiObject( Index = 0, PoolState = 0) ]
+        path = self.write_capture( 'host1', [ (1.0, 'SFAStoragePool', pools),
+                                              (2.0, 'SFAStoragePool', pools) ])
+        # Chop off the end of the last record (as if we'd been killed while
+        # writing it)
+        size = os.path.getsize( path)
+        capture_file = open( path, 'r+b')
+        capture_file.truncate( size - 3)
+        capture_file.close()
+        reader = SFACapture.SFACaptureReader( path)
+        self.assertEqual( [ r[0] for r in reader ], [ 1.0 ])
+        reader.close()
+
+    # Restarting the capture after a torn record has to drop the partial
+    # record, or the reader would choke on the new ones appended after it
+    def testAppendAfterTruncatedRecord(self):
+        pools = [ FakeApiObject( Index = 0, PoolState = 0) ]
+        path = self.write_capture( 'host1', [ (1.0, 'SFAStoragePool', pools),
+                                              (2.0, 'SFAStoragePool', pools) ])
+        size = os.path.getsize( path)
+        capture_file = open( path, 'r+b')
+        capture_file.truncate( size - 5)
+        capture_file.close()
+        self.write_capture( 'host1', [ (3.0, 'SFAStoragePool', pools) ])
+        reader = SFACapture.SFACaptureReader( path)
+        self.assertEqual( [ r[0] for r in reader ], [ 1.0, 3.0 ])
+        reader.close()
+
+        # Same thing with only part of the header record written
+        capture_file = open( path, 'r+b')
+        capture_file.truncate( 2)
+        capture_file.close()
+        self.write_capture( 'host1', [ (4.0, 'SFAStoragePool', pools) ])
+        reader = SFACapture.SFACaptureReader( path)
+        self.assertEqual( [ r[0] for r in reader ], [ 4.0 ])
+        reader.close()
+
+    def testReplayOrder(self):
+        def vd( value):
+            return [ FakeApiObject( **dict( [ (field, value) for field in
+                     SFACapture.CAPTURE_FIELDS['SFAVirtualDiskStatistics'] ])) ]
+        def pool( state):
+            return [ FakeApiObject( Index = 0, PoolState = state) ]
+        self.write_capture( 'host1', [ (10.0, 'SFAVirtualDiskStatistics', vd( 1)),
+                                       (10.1, 'SFAStoragePool', pool( 5)),
+                                       (12.0, 'SFAVirtualDiskStatistics', vd( 2)),
+                                       (14.0, 'SFAVirtualDiskStatistics', vd( 3)),
+                                       (14.1, 'SFAStoragePool', pool( 6)) ])
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'replay')
+        config.set( 'replay', 'directory', self._dir)
+        SFAReplay.configure( config)
+        self.assertRaises( SFAReplay.CIMError, SFAReplay.APIConnect,
+                           'https://nohost', ('user', 'password'))
+        context = SFAReplay.APIConnect( 'https://host1', ('user', 'password'))
+
+        self.assertEqual( context.peek_time(), 10.0)
+        self.assertEqual( SFAReplay.SFAVirtualDiskStatistics.getAll()[0].Index, 1)
+        self.assertEqual( SFAReplay.sample_time(), 10.0)
+        self.assertEqual( SFAReplay.SFAStoragePool.getAll( context)[0].PoolState, 5)
+        self.assertEqual( SFAReplay.SFAVirtualDiskStatistics.getAll()[0].Index, 2)
+        self.assertEqual( context.peek_time(), 14.0)
+        # No new pool record yet, so we get the previous one again
+        self.assertEqual( SFAReplay.SFAStoragePool.getAll()[0].PoolState, 5)
+        self.assertEqual( SFAReplay.SFAVirtualDiskStatistics.getAll()[0].Index, 3)
+        self.assertEqual( SFAReplay.SFAStoragePool.getAll()[0].PoolState, 6)
+        self.assertEqual( context.peek_time(), None)
+        self.assertRaises( SFAReplay.ReplayFinished,
+                           SFAReplay.SFAVirtualDiskStatistics.getAll)
+        self.assertRaises( SFAReplay.CIMError, SFAReplay.SFAController.getAll)
+        context.close()
+
+    # Capture a few polls of a simulated controller, then replay them and
+    # check that exactly the same data gets written to the databases
+    def testCaptureAndReplay(self):
+        capture_dir = os.path.join( self._dir, 'capture')
+        config = ConfigParser.ConfigParser()
+        for section in [ 'SqlDb', 'TSDb' ]:
+            config.add_section( section)
+        config.add_section( 'polling')
+        config.set( 'polling', 'fast_poll_interval', '2')
+        config.set( 'polling', 'med_poll_multiple', '3')
+        config.set( 'polling', 'slow_poll_multiple', '6')
+        config.add_section( 'ddn_hardware')
+        config.set( 'ddn_hardware', 'sfa_user', 'user')
+        config.set( 'ddn_hardware', 'sfa_password', 'password')
+        config.set( 'ddn_hardware', 'api', 'simulator')
+        config.add_section( 'simulator')
+        config.set( 'simulator', 'luns', '3')
+        config.set( 'simulator', 'latency_ms', '1')
+        config.add_section( 'capture')
+        config.set( 'capture', 'directory', capture_dir)
+        conf_file = os.path.join( self._dir, 'capture.conf')
+        self.save_config( config, conf_file)
+
+        live_sinks = { 'sqldb' : RecordingSink(), 'tsdb' : RecordingSink() }
+        client = SFAClient.SFAClient( 'sim1', conf_file, None, None, sinks = live_sinks)
+        self.assertTrue( client.prepare())
+        for tick in range(7):
+            client.poll_once( tick, 1000 + 2 * tick)
+        client.close()
+
+        config.set( 'ddn_hardware', 'api', 'replay')
+        config.remove_section( 'capture')
+        config.add_section( 'replay')
+        config.set( 'replay', 'directory', capture_dir)
+        self.save_config( config, conf_file)
+
+        replay_sinks = { 'sqldb' : RecordingSink(), 'tsdb' : RecordingSink() }
+        client = SFAClient.SFAClient( 'sim1', conf_file, None, None, sinks = replay_sinks)
+        self.assertTrue( client.prepare())
+        sample_times = [ ]
+        for tick in range(7):
+            sample_times.append( client.next_sample_time())
+            client.poll_once( tick, 1000 + 2 * tick)
+        self.assertEqual( sample_times, sorted( sample_times))
+        self.assertEqual( client.next_sample_time(), None)
+        self.assertRaises( SFAReplay.ReplayFinished, client.poll_once, 7, 1014)
+        client.close()
+
+        for name in [ 'sqldb', 'tsdb' ]:
+            self.assertTrue( len( live_sinks[name].writes) > 10)
+            self.assertEqual( replay_sinks[name].writes, live_sinks[name].writes)
+
+    def save_config(self, config, conf_file):
+        conf = open( conf_file, 'w')
+        try:
+            config.write( conf)
+        finally:
+            conf.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Capture files: a record of everything an SFAClient got back from its
+controller.
+
+When the config file has a capture section, each SFAClient appends the
+result of every getAll() call to <directory>/<host name>.sfacap.  The
+files can be fed back through SFAClient with SFAReplay.py (see
+SFAReplay_Driver.py).
+
+The file format is the same as the spool's (see SFASpool.py): a series of
+records, each one zlib compressed with a 4 byte length header.  Every
+record is a pickled tuple.  The first one is a header:
+    (CAPTURE_FORMAT, { class name : [ field names ] })
+and the rest are the results of one getAll() call each:
+    (timestamp, class name, [ (field values), ... ])
+Only the fields that SFAClient uses are saved.  If the capture is restarted,
+the new records are appended to the existing file (after dropping any
+partly written record from the end of it).
+'''
+
+import cPickle
+import logging
+import os
+import zlib
+
+from SFASpool import RECORD_HEADER
+
+CAPTURE_SUFFIX = '.sfacap'
+CAPTURE_FORMAT = 'DDNTool capture 1'
+
+# The fields saved for each class from the SFA API
+CAPTURE_FIELDS = {
+    'SFAVirtualDiskStatistics' : [ 'Index', 'ReadIOs', 'WriteIOs', 'TotalIOs',
+                                   'ForwardedIOs', 'KBytesRead', 'KBytesWritten',
+                                   'KBytesTransferred', 'KBytesForwarded',
+                                   'ReadIOSizeBuckets', 'WriteIOSizeBuckets',
+                                   'ReadIOLatencyBuckets', 'WriteIOLatencyBuckets',
+                                   'IOSizeIndexLabels', 'IOLatencyIndexLabels' ],
+    'SFAPresentation' : [ 'VirtualDiskIndex', 'LUN' ],
+    'SFAStoragePool' : [ 'Index', 'PoolState' ],
+    'SFAVirtualDisk' : [ 'Index', 'PoolIndex' ],
+    'SFAController' : [ 'Index', 'FWRelease' ]
+}
+
+# Fields whose values are the same for every object.  They're only pickled
+# once per record.
+SHARED_FIELDS = [ 'IOSizeIndexLabels', 'IOLatencyIndexLabels' ]
+
+# Default for the optional max_mb setting in the capture section
+CAPTURE_DEFAULT_MAX_MB = 1024
+
+
+def open_capture( config, name):
+    '''
+    Returns an SFACaptureWriter for the named host using the settings in
+    the config file's capture section, or None if the section (or its
+    directory setting) is missing.
+    '''
+    if not config.has_option('capture', 'directory'):
+        return None
+    max_mb = CAPTURE_DEFAULT_MAX_MB
+    if config.has_option('capture', 'max_mb'):
+        max_mb = config.getint('capture', 'max_mb')
+    return SFACaptureWriter( config.get('capture', 'directory'), name,
+                             max_mb * 1024 * 1024)
+
+
+def capture_path( directory, name):
+    return os.path.join( directory, name + CAPTURE_SUFFIX)
+
+
+class CapturedObject(object):
+    '''
+    Stands in for an object returned by the SFA API.  It has the attributes
+    listed in CAPTURE_FIELDS.
+    '''
+    def __init__(self, fields, values):
+        for (field, value) in zip( fields, values):
+            if isinstance( value, tuple):
+                value = list( value)  # the API returns lists
+            setattr( self, field, value)
+
+
+class SFACaptureWriter(object):
+    '''
+    Appends getAll() results to a capture file
+    '''
+
+    def __init__(self, directory, name, max_bytes):
+        '''
+        Opens (or creates) the capture file for the named host.  Once the
+        file is bigger than max_bytes, nothing more is written to it (0
+        means no limit).
+        '''
+        self.logger = logging.getLogger( 'DDNTool_SFACapture')
+        if not os.path.isdir( directory):
+            os.makedirs( directory)
+        self.path = capture_path( directory, name)
+        self._max_bytes = max_bytes
+        if os.path.exists( self.path):
+            self._file = open( self.path, 'r+b')
+            self._drop_partial_record()
+        else:
+            self._file = open( self.path, 'wb')
+        if self._file.tell() == 0:
+            self._write( (CAPTURE_FORMAT, CAPTURE_FIELDS))
+        self.logger.info( "Capturing the controller data to %s"%self.path)
+
+    def record(self, timestamp, class_name, objects):
+        '''
+        Saves the result of one getAll() call on class_name
+        '''
+        if self._file is None:
+            return
+        shared = { }
+        rows = [ ]
+        for obj in objects:
+            values = [ ]
+            for field in CAPTURE_FIELDS[class_name]:
+                value = getattr( obj, field)
+                if isinstance( value, list):
+                    value = tuple( value)
+                    if field in SHARED_FIELDS:
+                        # Use the same tuple object every time so that
+                        # pickle only writes it once
+                        value = shared.setdefault( value, value)
+                values.append( value)
+            rows.append( tuple( values))
+
+        try:
+            self._write( (timestamp, class_name, rows))
+        except (IOError, OSError), e:
+            self.logger.error( "Error writing to %s (%s).  Capture stopped."%(self.path, e))
+            self.close()
+            return
+        if self._max_bytes and self._file.tell() >= self._max_bytes:
+            self.logger.warning( "%s has reached its maximum size.  Capture stopped."%self.path)
+            self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drop_partial_record(self):
+        '''
+        Finds the end of the last complete record in the (existing) file and
+        truncates the file there.  If DDNTool was killed in the middle of
+        writing a record, anything we appended after that partial record
+        could never be read back.  Leaves the file positioned at the end.
+        '''
+        size = os.fstat( self._file.fileno()).st_size
+        end = 0
+        while end + RECORD_HEADER.size <= size:
+            self._file.seek( end)
+            (length,) = RECORD_HEADER.unpack( self._file.read( RECORD_HEADER.size))
+            if end + RECORD_HEADER.size + length > size:
+                break
+            end += RECORD_HEADER.size + length
+        if end < size:
+            self.logger.warning( "Dropping a partly written record (%d bytes) from "
+                                 "the end of %s"%(size - end, self.path))
+            self._file.truncate( end)
+        self._file.seek( end)
+
+    def _write(self, record):
+        data = zlib.compress( cPickle.dumps( record, cPickle.HIGHEST_PROTOCOL))
+        self._file.write( RECORD_HEADER.pack( len(data)))
+        self._file.write( data)
+        self._file.flush()
+
+
+class SFACaptureReader(object):
+    '''
+    Reads the records from a capture file.  Iterating over it yields a
+    tuple of (timestamp, class name, list of CapturedObjects) for each
+    getAll() call.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open( path, 'rb')
+        header = self._read_record()
+        if header is None or header[0] != CAPTURE_FORMAT:
+            self._file.close()
+            raise ValueError( "%s is not a DDNTool capture file"%path)
+        self._fields = header[1]
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        record = self._read_record()
+        if record is None:
+            raise StopIteration
+        (timestamp, class_name, rows) = record
+        fields = self._fields[class_name]
+        return (timestamp, class_name, [ CapturedObject( fields, values)
+                                         for values in rows ])
+
+    def close(self):
+        self._file.close()
+
+    def _read_record(self):
+        '''
+        Returns the next record, or None at the end of the file.  (A record
+        that was only partly written - because DDNTool was killed in the
+        middle of writing it - counts as the end of the file.)
+        '''
+        header = self._file.read( RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        (length,) = RECORD_HEADER.unpack( header)
+        data = self._file.read( length)
+        if len(data) < length:
+            return None
+        return cPickle.loads( zlib.decompress( data))
@@ -21,13 +21,19 @@
 
 import ConfigParser
 import logging
-import SFAMySqlDb
-import SFAInfluxDb
-from SFATimeSeries import SFATimeSeries
+import math
+import Queue
+import SFAWriter
+import SFAProfiler
+import SFACapture
+import SFADeltaFilter
+from SFAClock import REAL_CLOCK
+from SFAScheduler import monotonic
+from SFATimeSeriesMatrix import SFATimeSeriesMatrix
 from SFATimeSeries import EmptyTimeSeriesException
 
-from ddn.sfa.api import *
-from pywbem.cim_operations import CIMError
+# Note: the SFA API (the real one or the simulator) is imported by
+# load_api() rather than up here
 
 #
 # Note:  There are several code blocks that deal with the data from the 
@@ -39,6 +45,52 @@ from pywbem.cim_operations import CIMError
 MINIMUM_FW_VER = '2.3.0' 
 # 2.3.0 is needed for the read & write bandwidth numbers
 
+# Names of the per-LUN time series that we compute averages for
+LUN_SERIES_NAMES = [ 'lun_read_iops', 'lun_write_iops', 'lun_transfer_bytes',
+                     'lun_read_bytes', 'lun_write_bytes', 'lun_forwarded_bytes',
+                     'lun_forwarded_iops' ]
+
+# Time span (in seconds) of the averages we compute from those series
+LUN_AVERAGE_SPAN = 60
+
+# Indexes into the supervisor's lateness counters for a controller (see the
+# counters parameter to SFAClient.__init__())
+TICKS_RUN = 0       # iterations started
+TICKS_LATE = 1      # iterations that overran into the next tick
+TICKS_SKIPPED = 2   # ticks skipped because the last iteration was still running
+
+def load_api( config, clock = REAL_CLOCK):
+    '''
+    Returns a tuple of the SFA API module and its CIMError exception class.
+    The api setting in the config file's ddn_hardware section picks the
+    module: 'ddn' (the default) for the real ddn.sfa.api package,
+    'simulator' for SFASimulator or 'replay' for SFAReplay (which plays
+    back capture files).  The modules are only imported when they're
+    needed, so the simulator and replay work without the DDN API (or
+    pywbem) installed.
+
+    clock is passed on to the simulator (see SFASimulator.configure()).
+    '''
+    api_name = 'ddn'
+    if config.has_option('ddn_hardware', 'api'):
+        api_name = config.get('ddn_hardware', 'api')
+
+    if api_name == 'simulator':
+        import SFASimulator
+        SFASimulator.configure( config, clock)
+        return (SFASimulator, SFASimulator.CIMError)
+    elif api_name == 'replay':
+        import SFAReplay
+        SFAReplay.configure( config)
+        return (SFAReplay, SFAReplay.CIMError)
+    elif api_name == 'ddn':
+        import ddn.sfa.api
+        from pywbem.cim_operations import CIMError
+        return (ddn.sfa.api, CIMError)
+    raise ValueError( "Invalid api '%s' in the ddn_hardware section.  Must be "
+                      "'ddn', 'simulator' or 'replay'."%api_name)
+
+
 class UnexpectedClientDataException( Exception):
     '''
     Used when the DDN API sent back data that we weren't expecting
@@ -55,12 +107,41 @@ class SFAClient():
     the data and then push it up to the database specified in the config file.
     
     This class is designed to be used from its own process via the multiprocessing library.  The
-    only "public" function it has is run().
+    only "public" function it has is run().  (prepare(), poll_once(), close() and
+    next_sample_time() are public too, but only so that the benchmarks and the replay driver
+    can drive the polling loop themselves.)
     '''
 
-    def __init__(self, address, conf_file, event, update_time):
+    def __init__(self, address, conf_file, event, update_time, write_queue = None,
+                 done_conn = None, shared_process = False, sinks = None,
+                 clock = REAL_CLOCK, counters = None):
         '''
         Constructor
+
+        write_queue is only used when the config file sets the writer mode
+        to 'central'.  It's the multiprocessing.Queue that the central
+        writer process reads from.
+
+        done_conn is an optional multiprocessing Connection.  At the end of
+        each iteration of the main loop, a tuple of ('done', update time,
+        duration in seconds) is sent on it.
+
+        shared_process should be True if other SFAClient objects are running
+        (in other threads) in the same process.  In that case, each API call
+        is passed this object's own API context instead of relying on the
+        API's global default context (which is whichever one connected last).
+
+        sinks is an optional dictionary of database objects (see SFAWriter.py)
+        to write to instead of the databases in the config file.  It's for
+        the benchmarks, which use fake databases.
+
+        clock is the SFAClock object used to time stamp the samples (see
+        SFAClock.py).  The iteration times are always measured in real time.
+
+        counters is an optional shared array (multiprocessing.Array) holding
+        the main process's lateness counters for this controller (indexed by
+        TICKS_RUN, TICKS_LATE and TICKS_SKIPPED).  run() publishes any new
+        late or skipped ticks with the rest of the metrics.
         '''
 
         # Get the logger object
@@ -76,6 +157,7 @@ class SFAClient():
         
         self._connected = False;
         self._exit_requested = False;
+        self._clock = clock
         
         # open up the config file and grab settings for the database and
         # polling intervals
@@ -83,12 +165,11 @@ class SFAClient():
         self._parse_config_file( conf_file)
         
         # Time series data
-        # This is a dictionary of dictionaries of SFATimeSeries objects
-        # The outer dictionary maps the type of data (ie: vd_read_iops),
-        # the inner dictionary maps the actual device number.
-        # (We use an inner dictionary instead of a list so the device
-        # numbers don't have to be sequential.)
-        self._time_series = {}
+        # This is an SFATimeSeriesMatrix object (created in _time_series_init())
+        # that holds one row per fast poll for each of the series named in
+        # LUN_SERIES_NAMES.  The columns are the LUN numbers.  (Use the matrix's
+        # column_index dictionary to map a LUN number to its column.)
+        self._lun_series = None
   
         # Statistics objects
         # We keep copies of each SFAVirtualDiskStatistics and 
@@ -111,20 +192,62 @@ class SFAClient():
         self._vd_to_lun = { }
 
         # open a connection to the database(s)
-        if self._have_sqldb:
-            self.logger.debug( 'Opening SQL DB connection')
-            self._sqldb = SFAMySqlDb.SFAMySqlDb(self._sqldb_user, self._sqldb_password,
-                                                self._sqldb_host, self._sqldb_name, False)
-            
-        if self._have_tsdb:
-            self.logger.debug( 'Opening time series DB connection')
-            self._tsdb = SFAInfluxDb.SFAInfluxDb(self._tsdb_user, self._tsdb_password,
-                                                 self._tsdb_host, self._tsdb_name, False)
+        # Note: apart from opening them, we don't use the database objects
+        # directly.  The DB tasks add write operations to _pending_writes and
+        # then _submit_writes() hands them off at the end of each iteration
+        # of the main loop.  (See SFAWriter.py.)
+        # In central mode, we don't open the databases at all.  The batches
+        # are sent to the writer process instead.
+        self._sinks = { }
+        self._sink_names = [ name for (name, have) in [ ('sqldb', self._have_sqldb),
+                                                        ('tsdb', self._have_tsdb) ]
+                             if have ]
+        self._pending_writes = [ ]
+        self._write_queue = None
+        if self._write_mode == 'central':
+            if write_queue is None:
+                raise RuntimeError( "Writer mode is 'central', but no write queue was given.")
+            self._write_queue = write_queue
+        elif sinks is not None:
+            self._sinks = sinks
+        else:
+            self.logger.debug( 'Opening DB connection(s)')
+            self._sinks = SFAWriter.open_sinks( self._config, spool_name = address)
+
+        # Timings of our own work (polls, DB tasks and writes).  They're
+        # published to the database(s) every _metrics_multiple fast polls if
+        # they're enabled in the config file.
+        (self._metrics, self._metrics_multiple) = SFAWriter.open_metrics( self._config)
+
+        # Optionally, skip the fast rate writes for LUNs whose values haven't
+        # changed (see SFADeltaFilter.py)
+        self._delta_filter = SFADeltaFilter.open_delta_filter( self._config)
+
+        # On-demand profiling (if there's a profiling section in the config
+        # file).  See SFAProfiler.py.
+        self._profiler = SFAProfiler.open_profiler( self._config, address)
+
+        # Optionally, save everything we get from the controller to a capture
+        # file (see SFACapture.py).  Must be opened before we connect.
+        self._capture = SFACapture.open_capture( self._config, address)
+        self._last_sample_time = 0  # see _sample_time()
+
+        # Optionally, do the database writes from a separate thread so that
+        # a slow database doesn't delay the next poll of the controller
+        self._writer = None
+        if self._background_writes and self._write_queue is None:
+            self.logger.debug( 'Starting background writer thread')
+            self._writer = SFAWriter.SFABackgroundWriter( self._sinks,
+                    self._write_queue_size, self._write_overflow_policy,
+                    'DDNTool_writer_' + address, self._metrics)
+            self._writer.start()
     
         # connect to the SFA controller
         self.logger.debug( 'Connecting to DDN hardware')
+        self._shared_process = shared_process
+        (self._api, CIMError) = load_api( self._config, self._clock)
         try:
-            APIConnect( self._uri, (self._sfa_user, self._sfa_password))        # @UndefinedVariable
+            self._api_context = self._api.APIConnect( self._uri, (self._sfa_user, self._sfa_password))
         except CIMError, err:
             # Not sure of all the reasons this exception might happen, but
             # known ones are:
@@ -135,7 +258,7 @@ class SFAClient():
             # error message and then pass the exception up the stack
             self.logger.error( 'CIMError connecting to "%s"    Error code: %d   Desc: %s'%(self._uri, err[0], err[1]))          
             raise err
-        except APIContextException, err:
+        except self._api.APIContextException, err:
             # ddn.sfa.core.APIContextException: -2: Invalid username and/or password
             self.logger.error( 'APIContextException connecting to "%s"    Details: %s'%(self._uri, err))          
             raise err
@@ -154,6 +277,13 @@ class SFAClient():
         # multiprocessing.Value object
         self._event = event
         self._update_time = update_time
+        self._done_conn = done_conn
+        self._counters = counters
+        self._ticks_late = 0        # the counters as of our last wakeup
+        self._ticks_skipped = 0
+        if counters is not None:
+            self._ticks_late = counters[TICKS_LATE]
+            self._ticks_skipped = counters[TICKS_SKIPPED]
         # keep a local copy of the time value that we're sure won't change in
         # the middle of the main loop
         self._non_shared_update_time = 0  
@@ -168,22 +298,12 @@ class SFAClient():
         until the main processes sends an update time of 0.
         '''
         
-        # make sure the firmware is new enough to have the features we need
-        self.logger.debug( 'Verifying Controller Firmware Version')
-        if not self._verify_fw_version():
-            return  # _verify_fw_version will output the necessary lines to the log        
-        
+        if not self.prepare():
+            return
+
         self.logger.debug( 'Starting main loop')
         
-        # Run the fast poll stuff once right away.  The reason has to do with the time
-        # series data:  in order to calculate an average, we need 2 data points.  Calling
-        # the fast poll tasks now loads the first data point in all the series.  The second
-        # point will be added down in the main loop when the _fast_poll_tasks() is called
-        # again.  This means that by the time we get down to the db update code, all the
-        # time series should be able to return a value for their average and we shouldn't
-        # get any EmptyTimeSeries exceptions.
-        self._fast_poll_tasks()
-
+        duration = None     # how long the last iteration took
         fast_iteration = -1 # This is initialized to -1 in order to force us to execute
                             # the medium and slow poll stuff the first time we pass
                             # through the while loop.
@@ -193,6 +313,7 @@ class SFAClient():
             self.logger.debug( "Waiting on event")
             self._event.wait()  # wait until we're told to poll
             self.logger.debug( "Waking up")
+            iteration_start = monotonic()
                       
             fast_iteration += 1
             
@@ -200,54 +321,176 @@ class SFAClient():
             # supposed to exit
             # Note: this should be the only place in this module where
             # _update_time.value is referenced
-            self._non_shared_update_time = self._update_time.value 
-            if self._non_shared_update_time == 0:
+            update_time = self._update_time.value 
+            if update_time == 0:
                 self._exit_requested = True
                 break
-            
-                
-            ############# Fast Interval Stuff #######################
+
+            if self._counters is not None:
+                self._record_lateness( duration)
+
+            self.poll_once( fast_iteration, update_time)
+
+            self._event.clear();    # Clear the event to signal that we're done
+                                    # processing this iteration
+            duration = monotonic() - iteration_start
+            self._metrics.add( 'iteration', duration)
+            if self._done_conn:
+                self._done_conn.send( ('done', self._non_shared_update_time, duration))
+        # end of main while loop
+        
+        self.close()
+    # end of run() 
+
+
+    def _record_lateness(self, last_duration):
+        '''
+        Adds the ticks the main process has counted as late or skipped since
+        our last wakeup to the metrics: a 'late_iteration' sample with the
+        duration of the last iteration if it overran into the next tick and
+        a 'skipped_tick' sample (of one fast poll interval) for each tick
+        that was skipped while it was running
+        '''
+        ticks_late = self._counters[TICKS_LATE]
+        ticks_skipped = self._counters[TICKS_SKIPPED]
+        if ticks_late != self._ticks_late and last_duration is not None:
+            self._metrics.add( 'late_iteration', last_duration)
+        for unused in range( ticks_skipped - self._ticks_skipped):
+            self._metrics.add( 'skipped_tick', self._fast_poll_interval)
+        self._ticks_late = ticks_late
+        self._ticks_skipped = ticks_skipped
+
+
+    def close(self):
+        '''
+        Waits for the background writer (if there is one) to finish and
+        closes the profiler and capture file
+        '''
+        if self._writer:
+            self.logger.debug( 'Waiting for background writer to finish')
+            self._writer.stop()
+        if self._profiler:
+            self._profiler.close()
+        if self._capture:
+            self._capture.close()
+
+
+    def prepare(self):
+        '''
+        Checks the controller's firmware version and takes the first sample
+        of the fast poll data.  Returns False (after logging why) if the
+        controller can't be used.  run() calls this before starting its
+        loop.  Anything that calls poll_once() directly must call it first.
+        '''
+        # make sure the firmware is new enough to have the features we need
+        self.logger.debug( 'Verifying Controller Firmware Version')
+        if not self._verify_fw_version():
+            return False  # _verify_fw_version will output the necessary lines to the log        
+        
+        # Run the fast poll stuff once right away.  The reason has to do with the time
+        # series data:  in order to calculate an average, we need 2 data points.  Calling
+        # the fast poll tasks now loads the first data point in all the series.  The second
+        # point will be added in poll_once() when the _fast_poll_tasks() is called
+        # again.  This means that by the time we get down to the db update code, all the
+        # time series should be able to return a value for their average and we shouldn't
+        # get any EmptyTimeSeries exceptions.
+        self._fast_poll_tasks()
+        return True
+
+
+    def poll_once(self, fast_iteration, update_time):
+        '''
+        One iteration of the main loop (without the waiting): polls the
+        controller, runs the DB tasks and submits the writes.  fast_iteration
+        counts the iterations from 0 (the medium and slow tasks run when it's
+        a multiple of their poll multiples) and update_time is the time to
+        use for the LastUpdate fields.
+
+        Normally, only run() calls this.  It's public so that the benchmarks
+        can drive an SFAClient without the event and the other processes.
+        '''
+        self._non_shared_update_time = update_time
+
+        if self._profiler:
+            self._profiler.begin_tick()
+        try:
+            self._poll_once( fast_iteration)
+        finally:
+            if self._profiler:
+                self._profiler.end_tick()
+
+
+    def _poll_once(self, fast_iteration):
+        if self._delta_filter:
+            self._delta_filter.next_tick()
+
+        ############# Fast Interval Stuff #######################
+        with self._metrics.timer( 'fast_poll'):
             self._fast_poll_tasks()           
-            
-            ############# Medium Interval Stuff #####################
-            if (fast_iteration % self._med_poll_multiple == 0):
+        
+        ############# Medium Interval Stuff #####################
+        if (fast_iteration % self._med_poll_multiple == 0):
+            with self._metrics.timer( 'medium_poll'):
                 self._medium_poll_tasks()
-            
-            ############# Slow Interval Stuff #######################
-            if (fast_iteration % self._slow_poll_multiple == 0):
+        
+        ############# Slow Interval Stuff #######################
+        if (fast_iteration % self._slow_poll_multiple == 0):
+            with self._metrics.timer( 'slow_poll'):
                 self._slow_poll_tasks()
 
-            ##=====================Database Stuff====================
-            # Note: the database operations are down here after the polling operations
-            # to ensure that everything is polled at least once before we try to push
-            # anything to the database
-            ############# Fast Interval Stuff #######################
-            if self._have_sqldb:
+        ##=====================Database Stuff====================
+        # Note: the database operations are down here after the polling operations
+        # to ensure that everything is polled at least once before we try to push
+        # anything to the database
+        ############# Fast Interval Stuff #######################
+        if self._have_sqldb:
+            with self._metrics.timer( 'fast_sqldb_tasks'):
                 self._fast_sqldb_tasks()
-                           
-            if self._have_tsdb:
+                       
+        if self._have_tsdb:
+            with self._metrics.timer( 'fast_tsdb_tasks'):
                 self._fast_tsdb_tasks()
-                        
-            ############# Medium Interval Stuff #####################
-            if (fast_iteration % self._med_poll_multiple == 0):
-                self.logger.debug( 'Executing medium rate DB tasks')
-                if self._have_sqldb:
+                    
+        ############# Medium Interval Stuff #####################
+        if (fast_iteration % self._med_poll_multiple == 0):
+            self.logger.debug( 'Executing medium rate DB tasks')
+            if self._have_sqldb:
+                with self._metrics.timer( 'medium_sqldb_tasks'):
                     self._medium_sqldb_tasks()
-                if self._have_tsdb:
+            if self._have_tsdb:
+                with self._metrics.timer( 'medium_tsdb_tasks'):
                     self._medium_tsdb_tasks()
-            
-            ############# Slow Interval Stuff #######################
-            if (fast_iteration % self._slow_poll_multiple == 0):
-                self.logger.debug( 'Executing slow rate DB tasks')
-                if self._have_sqldb:
+        
+        ############# Slow Interval Stuff #######################
+        if (fast_iteration % self._slow_poll_multiple == 0):
+            self.logger.debug( 'Executing slow rate DB tasks')
+            if self._have_sqldb:
+                with self._metrics.timer( 'slow_sqldb_tasks'):
                     self._slow_sqldb_tasks()
-                if self._have_tsdb:
+            if self._have_tsdb:
+                with self._metrics.timer( 'slow_tsdb_tasks'):
                     self._slow_tsdb_tasks()
-                        
-            self._event.clear();    # Clear the event to signal that we're done
-                                    # processing this iteration
-        # end of main while loop
-    # end of run() 
+
+        # Publish our own timings along with everything else
+        if (fast_iteration % self._metrics_multiple == 0):
+            self._pending_writes.extend(
+                    SFAWriter.metrics_batch( self._metrics, self._sink_names,
+                                             self._get_host_name(),
+                                             self._non_shared_update_time))
+            
+        # Send this iteration's writes off to the database(s)
+        with self._metrics.timer( 'submit_writes'):
+            self._submit_writes()
+        if self._writer and (fast_iteration % self._slow_poll_multiple == 0):
+            stats = self._writer.stats()
+            self.logger.debug( 'Background writer: queue depth %d (max %d), '
+                               '%d batches written, %d batches dropped'% \
+                               (stats['queue_depth'], stats['max_queue_depth'],
+                                stats['batches_written'], stats['batches_dropped']))
+        if self._delta_filter and (fast_iteration % self._slow_poll_multiple == 0):
+            stats = self._delta_filter.stats()
+            self.logger.debug( 'Unchanged LUN rows: %d written, %d skipped'% \
+                               (stats['rows_written'], stats['rows_skipped']))
 
 
     def _fast_poll_tasks(self):
@@ -255,39 +498,51 @@ class SFAClient():
         Retrieves all the values we need to get from the controller at the fast interval.
         '''
         ##Virtual Disk Statistics 
-        vd_stats = SFAVirtualDiskStatistics.getAll()  # @UndefinedVariable
+        vd_stats = self._get_all( 'SFAVirtualDiskStatistics')
         
         self._vd_stats = { } # erase the old _vd_stats dictionary
+        
+        # Start each row off with the previous values.  (In the unlikely event
+        # that a LUN is missing from the results, it'll just look idle.)
+        rows = { }
+        for name in LUN_SERIES_NAMES:
+            rows[name] = self._lun_series.latest( name)
+        column_index = self._lun_series.column_index
+        
         for stats in vd_stats:
             index = stats.Index
+            lun_num = self._vd_to_lun[index]
+            col = column_index[lun_num]
 
             # Save the entire object (mainly for its I/O latency and request
             # size arrays
-            self._vd_stats[self._vd_to_lun[index]] = stats
+            self._vd_stats[lun_num] = stats
             
             # Note: we actually get back 2 element lists - one element
             # for each controller in the couplet.  In theory, one of those
             # elements should always be 0.
-            self._time_series['lun_read_iops'][self._vd_to_lun[index]].append(stats.ReadIOs[0] + stats.ReadIOs[1])
-            self._time_series['lun_write_iops'][self._vd_to_lun[index]].append(stats.WriteIOs[0] + stats.WriteIOs[1])
-            self._time_series['lun_transfer_bytes'][self._vd_to_lun[index]].append(
-                    (stats.KBytesTransferred[0] + stats.KBytesTransferred[1]) * 1024)
+            rows['lun_read_iops'][col] = stats.ReadIOs[0] + stats.ReadIOs[1]
+            rows['lun_write_iops'][col] = stats.WriteIOs[0] + stats.WriteIOs[1]
+            rows['lun_transfer_bytes'][col] = \
+                    (stats.KBytesTransferred[0] + stats.KBytesTransferred[1]) * 1024
             # Note: converted to bytes
             
-            self._time_series['lun_read_bytes'][self._vd_to_lun[index]].append(
-                    (stats.KBytesRead[0] + stats.KBytesRead[1]) * 1024)
+            rows['lun_read_bytes'][col] = \
+                    (stats.KBytesRead[0] + stats.KBytesRead[1]) * 1024
             # Note: converted to bytes
             
-            self._time_series['lun_write_bytes'][self._vd_to_lun[index]].append(
-                    (stats.KBytesWritten[0] + stats.KBytesWritten[1]) * 1024)
+            rows['lun_write_bytes'][col] = \
+                    (stats.KBytesWritten[0] + stats.KBytesWritten[1]) * 1024
             # Note: converted to bytes
 
-            self._time_series['lun_forwarded_bytes'][self._vd_to_lun[index]].append(
-                    (stats.KBytesForwarded[0] + stats.KBytesForwarded[1]) * 1024)
+            rows['lun_forwarded_bytes'][col] = \
+                    (stats.KBytesForwarded[0] + stats.KBytesForwarded[1]) * 1024
             # Note: converted to bytes 
 
-            self._time_series['lun_forwarded_iops'][self._vd_to_lun[index]].append(
-                    stats.ForwardedIOs[0] + stats.ForwardedIOs[1])
+            rows['lun_forwarded_iops'][col] = \
+                    stats.ForwardedIOs[0] + stats.ForwardedIOs[1]
+
+        self._lun_series.append( rows, self._sample_time())
 
         ##Disk Statistics
 # Disabling this code because we don't need it at the fast rate.
@@ -317,7 +572,7 @@ class SFAClient():
         
         # Grab the storage pool data (so we can find out if the pool is in a degraded state)
         # Store it in a temporary dictionary, indexed by the pool's Index member
-        storage_pools = SFAStoragePool.getAll()  # @UndefinedVariable
+        storage_pools = self._get_all( 'SFAStoragePool')
         pools_d = { }
         for pool in storage_pools:
             pools_d[pool.Index] = pool
@@ -326,7 +581,7 @@ class SFAClient():
 
         # Now, get all the virtual disks and map them back to the pool they're created
         # from.  (For now, we just want the pool state, not the whole SFAStoragePool object)
-        virt_disks = SFAVirtualDisk.getAll()  # @UndefinedVariable
+        virt_disks = self._get_all( 'SFAVirtualDisk')
         for disk in virt_disks:
             # Save the PoolState field in the dictionary
             self._storage_pool_states[self._vd_to_lun[disk.Index]] = pools_d[disk.PoolIndex].PoolState
@@ -347,34 +602,44 @@ class SFAClient():
         Update all the values in the SQL database that need to be updated at the fast rate.
         '''
 
+        # Compute the 60 second averages for every LUN and every series
+        # in one shot
+        try:
+            averages = self._lun_series.average( LUN_AVERAGE_SPAN)[0]
+        except EmptyTimeSeriesException:
+            print "Skipping empty time series for host %s"%self._get_host_name()
+            averages = None
+        column_index = self._lun_series.column_index
+
+        # Build up the rows for all the LUNs and then send them to the
+        # database with a few multi-row statements per table
+        lun_rows = [ ]
+        raw_lun_rows = [ ]
         for lun_num in self._vd_to_lun.values():
+            # Get the pool state we copied out of the associated SFAStoragePool object
+            # Note: this object is only updated at the medium rate
             try:
-                read_iops = self._get_time_series_average( 'lun_read_iops', lun_num, 60)
-                write_iops = self._get_time_series_average( 'lun_write_iops', lun_num, 60)
-                transfer_bandwidth = self._get_time_series_average( 'lun_transfer_bytes', lun_num, 60)
-                read_bandwidth = self._get_time_series_average( 'lun_read_bytes', lun_num, 60)
-                write_bandwidth = self._get_time_series_average( 'lun_write_bytes', lun_num, 60)
-                fw_bandwidth = self._get_time_series_average( 'lun_forwarded_bytes', lun_num, 60)
-                fw_iops = self._get_time_series_average( 'lun_forwarded_iops', lun_num, 60)
+                pool_state = self._storage_pool_states[lun_num]
+            except KeyError:
+                self.logger.error( "No storage pool states mapped to LUN number %d!!"%lun_num)
+                self.logger.error( "Setting pool state to UNKNOWN!")
+                pool_state = 255
                 
-                # Get the pool state we copied out of the associated SFAStoragePool object
-                # Note: this object is only updated at the medium rate
-                try:
-                    pool_state = self._storage_pool_states[lun_num]
-                except KeyError:
-                    self.logger.error( "No storage pool states mapped to LUN number %d!!"%lun_num)
-                    self.logger.error( "Setting pool state to UNKNOWN!")
-                    pool_state = 255
+            if averages is not None:
+                col = column_index[lun_num]
+                read_iops = averages['lun_read_iops'][col]
+                write_iops = averages['lun_write_iops'][col]
+                transfer_bandwidth = averages['lun_transfer_bytes'][col]
+                read_bandwidth = averages['lun_read_bytes'][col]
+                write_bandwidth = averages['lun_write_bytes'][col]
+                fw_bandwidth = averages['lun_forwarded_bytes'][col]
+                fw_iops = averages['lun_forwarded_iops'][col]
                 
-                self._sqldb.update_lun_table(self._get_host_name(), self._non_shared_update_time, 
-                                          lun_num, transfer_bandwidth[0],
-                                          read_bandwidth[0], write_bandwidth[0],
-                                          read_iops[0], write_iops[0],
-                                          fw_bandwidth[0], fw_iops[0], pool_state)
-            
-            except EmptyTimeSeriesException:
-                print "Skipping empty time series for host %s, virtual disk %d"% \
-                        (self._get_host_name(), lun_num)
+                lun_rows.append( (self._get_host_name(), self._non_shared_update_time, 
+                                  lun_num, transfer_bandwidth,
+                                  read_bandwidth, write_bandwidth,
+                                  read_iops, write_iops,
+                                  fw_bandwidth, fw_iops, pool_state))
                    
             # Work on the values for the raw lun table (grab the raw
             # values out of the saved stats object)
@@ -391,12 +656,13 @@ class SFAClient():
             read_ios = (tmp_stats.ReadIOs[0] + tmp_stats.ReadIOs[1])
             write_ios = (tmp_stats.WriteIOs[0] + tmp_stats.WriteIOs[1])
             
-            self._sqldb.update_raw_lun_table( self._get_host_name(), self._non_shared_update_time,
-                          lun_num, transfer_bytes,read_bytes, write_bytes,
-                          forwarded_bytes, total_ios, read_ios, write_ios,
-                          forwarded_ios, pool_state)
+            raw_lun_rows.append( (self._get_host_name(), self._non_shared_update_time,
+                                  lun_num, transfer_bytes,read_bytes, write_bytes,
+                                  forwarded_bytes, total_ios, read_ios, write_ios,
+                                  forwarded_ios, pool_state))
                 
-
+        self._queue_lun_rows( 'sqldb', 'update_lun_table_multi', lun_rows)
+        self._queue_lun_rows( 'sqldb', 'update_raw_lun_table_multi', raw_lun_rows)
 
 
 # It turns out that we don't care about the per-disk iops & bandwidth
@@ -417,19 +683,27 @@ class SFAClient():
         '''
         Update all the values in the SQL database that need to be updated at the medium rate.
         '''
+        # Collect the rows for all the LUNs so each table gets updated
+        # with a few multi-row statements
+        read_size_rows = [ ]
+        write_size_rows = [ ]
+        read_latency_rows = [ ]
+        write_latency_rows = [ ]
         for lun_num in self._vd_to_lun.values():
-            request_values =  self._vd_stats[lun_num].ReadIOSizeBuckets
-            self._sqldb.update_lun_request_size_table( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, True, request_values)
-            request_values =  self._vd_stats[lun_num].WriteIOSizeBuckets
-            self._sqldb.update_lun_request_size_table( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, False, request_values)
-            request_values =  self._vd_stats[lun_num].ReadIOLatencyBuckets
-            self._sqldb.update_lun_request_latency_table( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, True, request_values)
-            request_values =  self._vd_stats[lun_num].WriteIOLatencyBuckets
-            self._sqldb.update_lun_request_latency_table( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, False, request_values)
+            stats = self._vd_stats[lun_num]
+            read_size_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.ReadIOSizeBuckets))
+            write_size_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.WriteIOSizeBuckets))
+            read_latency_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.ReadIOLatencyBuckets))
+            write_latency_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.WriteIOLatencyBuckets))
+
+        self._queue_write( 'sqldb', 'update_lun_request_size_table_multi', True, read_size_rows)
+        self._queue_write( 'sqldb', 'update_lun_request_size_table_multi', False, write_size_rows)
+        self._queue_write( 'sqldb', 'update_lun_request_latency_table_multi', True, read_latency_rows)
+        self._queue_write( 'sqldb', 'update_lun_request_latency_table_multi', False, write_latency_rows)
 
 #        for dd_num in self._dd_stats.keys():
 #            request_values = self._dd_stats[dd_num].ReadIOSizeBuckets
@@ -458,6 +732,7 @@ class SFAClient():
         updated at the fast rate.
         '''
         
+        lun_rows = [ ]
         for lun_num in self._vd_to_lun.values():
             # grab the raw values out of the saved stats object
             tmp_stats = self._vd_stats[lun_num]
@@ -486,13 +761,14 @@ class SFAClient():
             # _fast_sqldb_tasks().  We should probably move the code to a single location
             # (_fast_poll_tasks, maybe?)
             
-            self._tsdb.update_lun_series( self._get_host_name(), self._non_shared_update_time,
-                          lun_num, transfer_bytes,read_bytes, write_bytes,
-                          forwarded_bytes, total_ios, read_ios, write_ios,
-                          forwarded_ios, pool_state)
+            lun_rows.append( (self._get_host_name(), self._non_shared_update_time,
+                              lun_num, transfer_bytes,read_bytes, write_bytes,
+                              forwarded_bytes, total_ios, read_ios, write_ios,
+                              forwarded_ios, pool_state))
             
+        self._queue_lun_rows( 'tsdb', 'update_lun_series_multi', lun_rows)
         # Now flush all the queued data at one shot
-        self._tsdb.flush_to_db()
+        self._queue_write( 'tsdb', 'flush_to_db')
         
     
     def _medium_tsdb_tasks(self):
@@ -501,22 +777,27 @@ class SFAClient():
         updated at the medium rate.
         '''
         
+        read_size_rows = [ ]
+        write_size_rows = [ ]
+        read_latency_rows = [ ]
+        write_latency_rows = [ ]
         for lun_num in self._vd_to_lun.values():
-            request_values =  self._vd_stats[lun_num].ReadIOSizeBuckets
-            self._tsdb.update_lun_request_size_series( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, True, request_values)
-            request_values =  self._vd_stats[lun_num].WriteIOSizeBuckets
-            self._tsdb.update_lun_request_size_series( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, False, request_values)
-            request_values =  self._vd_stats[lun_num].ReadIOLatencyBuckets
-            self._tsdb.update_lun_request_latency_series( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, True, request_values)
-            request_values =  self._vd_stats[lun_num].WriteIOLatencyBuckets
-            self._tsdb.update_lun_request_latency_series( self._get_host_name(),
-                    self._non_shared_update_time, lun_num, False, request_values)
+            stats = self._vd_stats[lun_num]
+            read_size_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.ReadIOSizeBuckets))
+            write_size_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.WriteIOSizeBuckets))
+            read_latency_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.ReadIOLatencyBuckets))
+            write_latency_rows.append( (self._get_host_name(),
+                    self._non_shared_update_time, lun_num, stats.WriteIOLatencyBuckets))
             
+        self._queue_write( 'tsdb', 'update_lun_request_size_series_multi', True, read_size_rows)
+        self._queue_write( 'tsdb', 'update_lun_request_size_series_multi', False, write_size_rows)
+        self._queue_write( 'tsdb', 'update_lun_request_latency_series_multi', True, read_latency_rows)
+        self._queue_write( 'tsdb', 'update_lun_request_latency_series_multi', False, write_latency_rows)
         # Now flush all the queued data at one shot
-        self._tsdb.flush_to_db()
+        self._queue_write( 'tsdb', 'flush_to_db')
 
 
     def _slow_tsdb_tasks(self):
@@ -554,10 +835,6 @@ class SFAClient():
         self._have_sqldb = False
         self._have_tsdb = False
         if config.has_section('SqlDb'):
-            self._sqldb_user = config.get('SqlDb', 'user')
-            self._sqldb_password = config.get('SqlDb', 'password')
-            self._sqldb_host = config.get('SqlDb', 'host')
-            self._sqldb_name = config.get('SqlDb', 'name')
             self._have_sqldb = True
             output_defined = True
             if config.has_section('database'):
@@ -567,18 +844,12 @@ class SFAClient():
             self.logger.warn("The 'database' section of the config file has been "
                              "deprecated and support for it will eventually be "
                              "removed.  Please use the 'SqlDb' section, instead.")
-            self._sqldb_user = config.get('database', 'db_user')
-            self._sqldb_password = config.get('database', 'db_password')
-            self._sqldb_host = config.get('database', 'db_host')
-            self._sqldb_name = config.get('database', 'db_name')
             self._have_sqldb = True
             output_defined = True
            
+        # Note: the database connection parameters themselves are read by
+        # SFAWriter.open_sinks(), so we hang on to the config object.
         if config.has_section('TSDb'):
-            self._tsdb_user = config.get('TSDb', 'user')
-            self._tsdb_password = config.get('TSDb', 'password')
-            self._tsdb_host = config.get('TSDb', 'host')
-            self._tsdb_name = config.get('TSDb', 'name')
             self._have_tsdb = True
             output_defined = True
              
@@ -588,6 +859,21 @@ class SFAClient():
             raise RuntimeError( "No output databases were defined in the config file. "
                                 "There's no place to write the results.")
 
+        self._config = config
+
+        # Settings for the database writes (all optional)
+        self._write_mode = SFAWriter.writer_mode( config)
+        self._background_writes = False
+        self._write_queue_size = 8
+        self._write_overflow_policy = 'drop_oldest'
+        if config.has_section('writer'):
+            if config.has_option('writer', 'background'):
+                self._background_writes = config.getboolean('writer', 'background')
+            if config.has_option('writer', 'queue_size'):
+                self._write_queue_size = config.getint('writer', 'queue_size')
+            if config.has_option('writer', 'overflow_policy'):
+                self._write_overflow_policy = config.get('writer', 'overflow_policy')
+
         
     def _time_series_init(self):
         '''
@@ -600,29 +886,24 @@ class SFAClient():
         # so that I can store time series data by LUN instead of by virtual disk
         self._update_lun_map()
 
-        # initialize the time series arrays
-        vd_stats = SFAVirtualDiskStatistics.getAll()  # @UndefinedVariable
-        self._time_series['lun_read_iops'] = { }
-        self._time_series['lun_write_iops'] = { }
-        self._time_series['lun_transfer_bytes'] = { }
-        self._time_series['lun_read_bytes'] = { }
-        self._time_series['lun_write_bytes'] = { }
-        self._time_series['lun_forwarded_bytes'] = { }
-        self._time_series['lun_forwarded_iops'] = { }
+        # initialize the time series matrix
+        # Note that the columns are indexed by Lun, not by virtual disk (despite
+        # the data coming from SFAVirtualDiskStatistics objects)
+        vd_stats = self._get_all( 'SFAVirtualDiskStatistics')
+        luns = [ ]
         for stats in vd_stats:
             index = stats.Index
             self._vd_stats[index] = stats
-
-            # Note that these maps are indexed by Lun, not by virtual disk (despite
-            # coming from SFAVirtualDiskStatistics objects)
-            # 300 entries is 10 minutes of data at 2 second sample rate
-            self._time_series['lun_read_iops'][self._vd_to_lun[index]] = SFATimeSeries( 300) 
-            self._time_series['lun_write_iops'][self._vd_to_lun[index]] = SFATimeSeries( 300)
-            self._time_series['lun_transfer_bytes'][self._vd_to_lun[index]] = SFATimeSeries( 300)
-            self._time_series['lun_read_bytes'][self._vd_to_lun[index]] = SFATimeSeries( 300)
-            self._time_series['lun_write_bytes'][self._vd_to_lun[index]] = SFATimeSeries( 300)
-            self._time_series['lun_forwarded_bytes'][self._vd_to_lun[index]] = SFATimeSeries( 300)
-            self._time_series['lun_forwarded_iops'][self._vd_to_lun[index]] = SFATimeSeries( 300)
+            luns.append( self._vd_to_lun[index])
+        
+        # We only ever compute averages over LUN_AVERAGE_SPAN, so we only need
+        # to keep enough samples to cover that span (plus a couple extra so
+        # there's always a sample on either side of the start of the span).
+        # For a 60 second span at a 2 second sample rate, that's 32 entries.
+        max_size = int(math.ceil( LUN_AVERAGE_SPAN / self._fast_poll_interval)) + 2
+        self._lun_series = SFATimeSeriesMatrix( LUN_SERIES_NAMES, sorted(luns),
+                                                max_size, [LUN_AVERAGE_SPAN],
+                                                self._clock.time)
 
 # Don't need per-disk bandwidth & iops
 #       disk_stats = SFADiskDriveStatistics.getAll()
@@ -659,7 +940,7 @@ class SFAClient():
 #                'Latency Counts <=1s', 'Latency Counts <=2s', 'Latency Counts <=4s',
 #                'Latency Counts >4s']
 
-        vd_stats = SFAVirtualDiskStatistics.getAll()  # @UndefinedVariable
+        vd_stats = self._get_all( 'SFAVirtualDiskStatistics')
         for stats in vd_stats:
             if stats.IOSizeIndexLabels != expected_size_labels:
                 raise UnexpectedClientDataException(
@@ -683,6 +964,56 @@ class SFAClient():
 #                                (self._get_host_name(), stats.Index))
 
     
+    def _queue_write(self, sink_name, method_name, *args):
+        '''
+        Adds one write operation to the list that will be sent to the
+        database(s) at the end of this iteration of the main loop.
+        (ie: self._queue_write( 'sqldb', 'update_dd_table', ...) will
+        eventually call self._sinks['sqldb'].update_dd_table( ...) )
+        '''
+        self._pending_writes.append( (sink_name, method_name, args))
+
+    def _queue_lun_rows(self, sink_name, method_name, rows):
+        '''
+        Like _queue_write() for the multi-row per-LUN methods, but if
+        skip_unchanged is set, only the rows that have changed (or are due
+        for a heartbeat) are written
+        '''
+        if self._delta_filter:
+            rows = self._delta_filter.filter( (sink_name, method_name), rows)
+        self._queue_write( sink_name, method_name, rows)
+
+    def _submit_writes(self):
+        '''
+        Hands all the write operations queued up during this iteration of the
+        main loop to the central writer process or the background writer
+        thread (or, if there isn't either, executes them right now).
+        '''
+        batch = self._pending_writes
+        self._pending_writes = [ ]
+        if not batch:
+            return
+        
+        if self._write_queue is not None:
+            try:
+                self._write_queue.put_nowait( (self._address, self._non_shared_update_time, batch))
+            except Queue.Full:
+                self.logger.warning( 'Central write queue is full.  Dropping this '
+                                     'iteration\'s writes.')
+                if self._delta_filter:
+                    self._delta_filter.reset()  # rewrite everything next time
+        elif self._writer:
+            # A batch can be lost either way: drop_newest drops this one
+            # (and submit() returns False) and drop_oldest makes room by
+            # dropping a queued one (which only shows up in the counters)
+            dropped = self._writer.stats()['batches_dropped']
+            queued = self._writer.submit( batch)
+            if self._delta_filter and \
+               (not queued or self._writer.stats()['batches_dropped'] != dropped):
+                self._delta_filter.reset()  # rewrite everything next time
+        else:
+            SFAWriter.execute_batch( self._sinks, batch, self._metrics)
+
     def _get_host_name(self):
         '''
         Mostly a convenience function so we can map an object back to a
@@ -691,22 +1022,50 @@ class SFAClient():
         return self._address
 
 
-    def _get_time_series_average( self, series_name, device_num, span):
+    def _get_all( self, class_name):
+        '''
+        Calls getAll() on the named class from the SFA API (or the
+        simulator) with the right API context (see the shared_process
+        parameter to __init__())
         '''
-        Return the average value for the specified series and device
-        calculated over the specified number of seconds.
+        api_class = getattr( self._api, class_name)
+        with self._metrics.timer( 'getAll.' + class_name):
+            if self._shared_process:
+                results = api_class.getAll( context=self._api_context)
+            else:
+                results = api_class.getAll()
+        self._last_sample_time = self._clock.time()
+        if self._capture:
+            self._capture.record( self._last_sample_time, class_name, results)
+        return results
 
-        Returns a tuple: first value is the calculated average, second
-        value is the actual timespan (in seconds) used to calculate
-        the average.
+
+    def _sample_time(self):
+        '''
+        Returns the time stamp for the data from the latest getAll() call:
+        when it returned, or when replaying a capture file, the time the
+        data was captured
         '''
-        #TODO: need some protection against 'key not found' type of
-        #errors for both the series name and device number
-        return self._time_series[series_name][device_num].average(span)
+        if hasattr( self._api, 'sample_time'):
+            return self._api.sample_time( self._api_context)
+        return self._last_sample_time
+
+
+    def next_sample_time(self):
+        '''
+        When replaying a capture file, returns the time the data for the
+        next poll was captured (or None if the capture has ended).  The
+        replay driver uses this to pace the replay.  Raises RuntimeError
+        with any other API.
+        '''
+        if not hasattr( self._api, 'next_sample_time'):
+            raise RuntimeError( "next_sample_time() is only available when "
+                                "replaying a capture file")
+        return self._api.next_sample_time( self._api_context)
+
 
-                
     def _update_lun_map( self):
-        presentations = SFAPresentation.getAll()  # @UndefinedVariable
+        presentations = self._get_all( 'SFAPresentation')
         for p in presentations:
             self._vd_to_lun[p.VirtualDiskIndex] = p.LUN
         self.logger.debug( "Mapped %d virtual disks to LUNs"%len(self._vd_to_lun))
@@ -717,7 +1076,7 @@ class SFAClient():
         Returns True if the controller firmware version is sufficiently new.
         Returns False and writes an error to the log if it's not.
         '''    
-        fw_version = SFAController.getAll()[0].FWRelease  # @UndefinedVariable
+        fw_version = self._get_all( 'SFAController')[0].FWRelease
         # DDN version strings are 4 numbers separated by periods
         
         fw_nums = fw_version.split('.')
@@ -0,0 +1,118 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Clocks for the scheduler, the controller clients and the time series.
+
+Everything that needs to know what time it is (as opposed to how long
+something took) asks a clock object instead of calling time.time() or
+time.sleep() itself.  Normally, that's REAL_CLOCK.  With 'clock = virtual'
+in the config file's polling section, it's an SFAVirtualClock instead:
+time only moves when the main loop sleeps, and sleeping doesn't take any
+(real) time at all, so the fast, medium and slow polls run as fast as the
+CPU allows.  A day of ticks for a large (simulated) fleet takes minutes.
+
+Durations - the timings in SFAMetrics, the iteration times the controller
+processes report and the timeouts for talking to other processes - are
+always measured in real time.
+'''
+
+import multiprocessing
+import time
+
+from SFAScheduler import monotonic
+
+
+class SFAClock(object):
+    '''
+    The real clock
+    '''
+    virtual = False
+
+    def time(self):
+        '''
+        Seconds since the epoch (like time.time())
+        '''
+        return time.time()
+
+    def monotonic(self):
+        '''
+        Seconds from an arbitrary starting point.  Never goes backwards.
+        '''
+        return monotonic()
+
+    def sleep(self, seconds):
+        time.sleep( seconds)
+
+REAL_CLOCK = SFAClock()
+
+
+class SFAVirtualClock(object):
+    '''
+    A simulated clock.  The time is kept in shared memory, so a clock that's
+    created before the controller processes are forked is shared with them:
+    the main process moves it forward (by sleeping) and everyone sees the
+    new time.  Only one process should sleep on it.
+    '''
+    virtual = True
+
+    def __init__(self, start = None):
+        '''
+        start is the initial time, in seconds since the epoch.  (The default
+        is now.)
+        '''
+        if start is None:
+            start = time.time()
+        self._now = multiprocessing.Value( 'd', start)
+
+    def time(self):
+        return self._now.value
+
+    def monotonic(self):
+        return self._now.value
+
+    def sleep(self, seconds):
+        '''
+        Moves the clock forward by seconds (and returns immediately)
+        '''
+        if seconds > 0:
+            with self._now.get_lock():
+                self._now.value += seconds
+
+
+def open_clock( config):
+    '''
+    Returns the clock selected by the config file's polling section:
+    REAL_CLOCK, or an SFAVirtualClock if clock is 'virtual'.  A virtual
+    clock starts at virtual_start (in seconds since the epoch), if that's
+    set, or now.
+    '''
+    if not config.has_option('polling', 'clock'):
+        return REAL_CLOCK
+    clock_type = config.get('polling', 'clock')
+    if clock_type == 'real':
+        return REAL_CLOCK
+    elif clock_type == 'virtual':
+        start = None
+        if config.has_option('polling', 'virtual_start'):
+            start = config.getfloat('polling', 'virtual_start')
+        return SFAVirtualClock( start)
+    raise ValueError( "Invalid clock '%s' in the polling section.  Must be "
+                      "'real' or 'virtual'."%clock_type)
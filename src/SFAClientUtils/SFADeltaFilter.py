@@ -0,0 +1,128 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Skipping the writes for LUNs whose values haven't changed.
+
+Most LUNs are idle most of the time, and an idle LUN's row is the same
+every fast poll: the same counters and zero rates.  An SFADeltaFilter
+remembers the values last written for each LUN (separately for each
+database and each table) and drops the rows that haven't changed.  So
+that a LUN whose row hasn't been written in a while can be told apart from
+one that isn't being polled any more, an unchanged row is still written
+once every heartbeat_multiple fast polls.
+
+The rows are in the layout the multi-row database methods use (see
+SFAMySqlDb.update_lun_table_multi(), for example): host name, update time,
+LUN number and then the values.  Only the values are compared.
+
+Note: the filter assumes every row it passes is actually written.  When
+SFAClient knows a batch of writes was dropped (because the central or
+background writer's queue was full), it calls reset() so that everything
+is written again on the next poll.
+'''
+
+
+def open_delta_filter( config):
+    '''
+    Returns an SFADeltaFilter if skip_unchanged is true in the config file's
+    writer section, or None otherwise.  The heartbeat rate is the
+    heartbeat_multiple setting in that section.  (The default is the medium
+    poll rate.)
+    '''
+    if not (config.has_option('writer', 'skip_unchanged') and
+            config.getboolean('writer', 'skip_unchanged')):
+        return None
+    if config.has_option('writer', 'heartbeat_multiple'):
+        heartbeat_multiple = config.getint('writer', 'heartbeat_multiple')
+    else:
+        heartbeat_multiple = config.getint('polling', 'med_poll_multiple')
+    return SFADeltaFilter( heartbeat_multiple)
+
+
+class SFADeltaFilter(object):
+    '''
+    Drops the rows that are the same as the last ones written (see above)
+    '''
+
+    def __init__(self, heartbeat_multiple):
+        '''
+        heartbeat_multiple is the most fast polls that can go by without a
+        row being written for a LUN (even if nothing's changed)
+        '''
+        if heartbeat_multiple < 1:
+            raise ValueError( "heartbeat_multiple must be at least 1")
+        self._heartbeat_multiple = heartbeat_multiple
+        self._tick = 0
+        # Maps the table (any hashable name) to a dictionary mapping each
+        # LUN number to a tuple of its last written values and the tick
+        # they were written in
+        self._last_written = { }
+
+        # Counters (see stats())
+        self._rows_written = 0
+        self._rows_skipped = 0
+
+    def next_tick(self):
+        '''
+        Must be called once per fast poll (before that poll's rows are
+        filtered)
+        '''
+        self._tick += 1
+
+    def filter(self, table, rows):
+        '''
+        Returns the rows (in the same order) that need to be written to the
+        table: the ones whose values have changed, the ones for LUNs we
+        haven't seen before and the ones that are due for a heartbeat.
+        '''
+        previous = self._last_written.get( table, { })
+        # Rebuilt from scratch so that LUNs that have gone away are forgotten
+        current = { }
+        changed = [ ]
+        for row in rows:
+            lun_num = row[2]
+            values = row[3:]
+            last = previous.get( lun_num)
+            if last is not None and last[0] == values and \
+               self._tick - last[1] < self._heartbeat_multiple:
+                current[lun_num] = last
+            else:
+                current[lun_num] = (values, self._tick)
+                changed.append( row)
+        self._last_written[table] = current
+
+        self._rows_written += len(changed)
+        self._rows_skipped += len(rows) - len(changed)
+        return changed
+
+    def reset(self):
+        '''
+        Forgets everything that's been written, so every row is written
+        the next time.  (For when we know some writes were lost.)
+        '''
+        self._last_written = { }
+
+    def stats(self):
+        '''
+        Returns a dictionary with the number of rows written and skipped
+        '''
+        return { 'rows_written' : self._rows_written,
+                 'rows_skipped' : self._rows_skipped }
@@ -18,10 +18,11 @@
 # WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
 # A PARTICULAR PURPOSE.
 
-import copy
 import logging
+import zlib
+import requests
 from influxdb import InfluxDBClient
-from influxdb.exceptions import InfluxDBClientError
+from influxdb.exceptions import InfluxDBClientError, InfluxDBServerError
 
 # Dictionary of the measurement names we'll use in the database
 MEASUREMENT_NAMES = {
@@ -29,9 +30,81 @@ MEASUREMENT_NAMES = {
     "READ_REQUEST_SIZES" : "read_request_sizes",
     "WRITE_REQUEST_SIZES" : "write_request_sizes",
     "READ_REQUEST_LATENCIES" : "read_request_latencies",
-    "WRITE_REQUEST_LATENCIES" : "write_request_latencies"
+    "WRITE_REQUEST_LATENCIES" : "write_request_latencies",
+    "INTERNAL_METRICS" : "ddntool_internal"
 }
 
+# Field names (in the order they're written) for the LUN_DATA measurement.
+# They match the value parameters of update_lun_series().
+LUN_DATA_FIELDS = [ "transfer_bytes", "read_bytes", "write_bytes",
+                    "forwarded_bytes", "total_iops", "read_iops", "write_iops",
+                    "forwarded_iops", "pool_state" ]
+
+# Field names (in the order they're written) for the INTERNAL_METRICS
+# measurement.  They match the values from SFAMetrics.summarize().
+INTERNAL_METRICS_FIELDS = [ "count", "sum", "max", "p50", "p99" ]
+
+# Valid values for the precision parameter.  Maps each one to the number of
+# timestamp units per second and the value of the 'precision' parameter
+# that the InfluxDB write endpoint expects.
+PRECISIONS = {
+    "s"  : (1, "s"),
+    "ms" : (1000, "ms"),
+    "ns" : (1000000000, "n")
+}
+
+# Valid values for the histogram_schema parameter:
+#   tagged : one point per bucket, with the bucket label as a tag and the
+#            count in a field named 'value' (the original layout)
+#   wide   : one point per histogram, with one field per bucket (see
+#            _bucket_field_name())
+HISTOGRAM_SCHEMAS = [ "tagged", "wide" ]
+
+# Exceptions that mean the server is down or unreachable (as opposed to
+# rejecting the data we sent it).  Writes that fail with one of these are
+# spooled if there's a spool.
+RETRYABLE_ERRORS = (InfluxDBServerError, requests.exceptions.RequestException)
+
+# Compression level for gzip'ed requests.  (Higher levels don't shrink our
+# data much more and cost quite a bit more CPU.)
+GZIP_LEVEL = 6
+
+
+def _escape_key( key):
+    '''
+    Escape a measurement name, tag key or tag value (or field key) for the
+    InfluxDB line protocol
+    '''
+    return str(key).replace( '\\', '\\\\').replace( ',', '\\,') \
+                   .replace( '=', '\\=').replace( ' ', '\\ ')
+
+
+def _bucket_field_name( label):
+    '''
+    Converts a bucket label (such as '<=4KiB' or '>16s') into the field name
+    used by the wide histogram schema ('le_4KiB' or 'gt_16s')
+    '''
+    if label.startswith( '<='):
+        return 'le_' + label[2:]
+    elif label.startswith( '>'):
+        return 'gt_' + label[1:]
+    raise ValueError( "Unexpected bucket label '%s'"%label)
+
+
+def _format_field_value( value):
+    '''
+    Format one field value for the InfluxDB line protocol.  Integers get the
+    'i' suffix so that they're stored as integers (the same as the JSON
+    points that influxdb-python used to build for us).
+    '''
+    if isinstance( value, bool):
+        return 'true' if value else 'false'
+    if isinstance( value, (int, long)):
+        return '%di'%value
+    if isinstance( value, float):
+        return repr(value)
+    return '"%s"'%str(value).replace( '\\', '\\\\').replace( '"', '\\"')
+
 
 class SFAInfluxDb(object):
     '''
@@ -54,9 +127,21 @@ class SFAInfluxDb(object):
 
 
 
-    def __init__(self, user, password, host, db_name, init = False):
+    def __init__(self, user, password, host, db_name, init = False,
+                 gzip = False, max_points = 0, precision = 'ns',
+                 histogram_schema = 'tagged', spool = None):
         '''
         Connect to the InfluxDB server
+
+        If gzip is True, the requests sent to the server are compressed.
+        max_points is the maximum number of points to send in a single
+        request (0 means no limit).  precision is the precision of the
+        timestamps that are sent: 's', 'ms' or 'ns'.  (The update times we're
+        given are whole seconds, so 's' is the most compact.)
+        histogram_schema is either 'tagged' or 'wide' (see HISTOGRAM_SCHEMAS).
+        spool is an optional SFASpool object.  If it's given, data that
+        can't be sent because the server is unavailable is saved there and
+        sent later.
         
         Note that we're deliberately *NOT* catching any exceptions that might
         be thrown.  There's really very little that this class could do to
@@ -68,10 +153,38 @@ class SFAInfluxDb(object):
         self.logger = logging.getLogger( 'DDNTool_SFAInfluxDb')
         self.logger.debug( 'Creating instance of SFAInfluxDb')
 
-        # This holds the JSON data that will be sent to the database
-        self._json_body = []
+        # The points that will be sent to the database, already encoded in
+        # the InfluxDB line protocol
+        self._buffer = bytearray()
+        self._num_points = 0
+
+        # Cache of the escaped series keys (measurement name plus tags).
+        # Building these is the expensive part of encoding a point and they
+        # don't change from one poll to the next.  The key for the LUN_DATA
+        # series is (measurement, sfa_host_name, lun_num).  The request size
+        # and latency series use the same key, but the value is a list with
+        # one series key per bucket.
+        self._series_keys = {}
+
+        # Settings for the requests we send to the server
+        if precision not in PRECISIONS:
+            raise ValueError( "Invalid precision '%s'.  Must be one of: %s"% \
+                              (precision, ", ".join(sorted(PRECISIONS.keys()))))
+        (self._time_multiplier, self._precision_param) = PRECISIONS[precision]
+        self._gzip = gzip
+        self._max_points = max_points
+
+        if histogram_schema not in HISTOGRAM_SCHEMAS:
+            raise ValueError( "Invalid histogram schema '%s'.  Must be one of: %s"% \
+                              (histogram_schema, ", ".join(HISTOGRAM_SCHEMAS)))
+        self._wide_histograms = (histogram_schema == 'wide')
+
+        self._spool = spool
+        if spool:
+            spool.attach( self._send_request, RETRYABLE_ERRORS)
         
         # open the database connection
+        self._db_name = db_name
         self._dbcon = InfluxDBClient(host=host, port=8086, username=user, password=password, database=db_name)
         
         if init:
@@ -90,9 +203,51 @@ class SFAInfluxDb(object):
         Send all the queued up data to the database server
         '''
         
-        if self._json_body:
-            self._dbcon.write_points(self._json_body)
-            self._json_body = []
+        if not self._buffer:
+            return
+
+        if self._max_points and self._num_points > self._max_points:
+            # Split the buffer on line boundaries (one point per line)
+            start = 0
+            while start < len(self._buffer):
+                end = start
+                for unused_i in range(self._max_points):
+                    end = self._buffer.find( '\n', end) + 1
+                    if end == 0:
+                        end = len(self._buffer)
+                        break
+                self._send_or_spool( self._buffer[start:end])
+                start = end
+        else:
+            self._send_or_spool( self._buffer)
+
+        self._buffer = bytearray()
+        self._num_points = 0
+
+
+    def _send_or_spool(self, data):
+        if self._spool:
+            self._spool.write( data)
+        else:
+            self._send_request( data)
+
+
+    def _send_request(self, data):
+        '''
+        POST one chunk of line protocol data to the server's write endpoint
+        '''
+        headers = { 'Content-Type' : 'application/octet-stream' }
+        if self._gzip:
+            compressor = zlib.compressobj( GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            # Note: the 16 tells zlib to add the gzip header & trailer
+            data = compressor.compress( str(data)) + compressor.flush()
+            headers['Content-Encoding'] = 'gzip'
+
+        self._dbcon.request( url='write', method='POST',
+                             params={ 'db' : self._db_name,
+                                      'precision' : self._precision_param },
+                             data=data, expected_response_code=204,
+                             headers=headers)
 
 
     def update_lun_series( self, sfa_host_name, update_time, lun_num,
@@ -112,30 +267,27 @@ class SFAInfluxDb(object):
         #   values: bytes read, bytes written, bytes transferred, bytes
         #   forwarded, read iops, write iops, forwarded iops and pool state    
         
-        # self.logger.debug( 'Updating lun data for lun %d at %s'%(lun_num, update_time))
-        # This generages too much output, even for debug
-        
-        # this is what will be sent over to the influx server
-        self._json_body.append({
-           "measurement": MEASUREMENT_NAMES["LUN_DATA"],
-           "tags": {
-                "sfa_host": sfa_host_name,
-                "lun_num": lun_num
-            },
-           "time": update_time * 1000000000,  # influx wants time in nano-seconds
-           "fields": {
-              "transfer_bytes":  transfer_bytes,
-              "read_bytes":      read_bytes,
-              "write_bytes":     write_bytes,
-              "forwarded_bytes": forwarded_bytes,
-              "total_iops":       total_ios,
-              "read_iops":        read_ios,
-              "write_iops":       write_ios,
-              "forwarded_iops":   forwarded_ios,
-              "pool_state":      pool_state,
-            }
-        })
+        self.update_lun_series_multi( [ (sfa_host_name, update_time, lun_num,
+                                         transfer_bytes, read_bytes, write_bytes,
+                                         forwarded_bytes, total_ios, read_ios,
+                                         write_ios, forwarded_ios, pool_state) ])
         
+    def update_lun_series_multi( self, rows):
+        '''
+        Queues the per-lun data for several LUNs.  rows is a list of tuples.
+        Each tuple holds the same values (in the same order) as the parameters
+        to update_lun_series().
+        '''
+        measurement = MEASUREMENT_NAMES["LUN_DATA"]
+        lines = []
+        for row in rows:
+            series_key = self._get_series_key( measurement, row[0], row[2])
+            fields = ','.join( [ '%s=%s'%(name, _format_field_value( value))
+                                 for (name, value) in zip( LUN_DATA_FIELDS, row[3:]) ])
+            lines.append( '%s %s %d\n'%(series_key, fields, row[1] * self._time_multiplier))
+        self._buffer += ''.join( lines)
+        self._num_points += len(rows)
+
 
     def update_lun_request_size_series( self, sfa_host_name, update_time,
                                        lun_num, read_series, size_buckets):
@@ -155,32 +307,26 @@ class SFAInfluxDb(object):
         # 'write_request_sizes' (depending on value of read_series)
         # Tags: sfa host name, lun number, bucket
         # Fields: value
+        # (Or, with the wide histogram schema:
+        # Tags: sfa host name, lun number
+        # Fields: le_4KiB, le_8KiB, ... le_4MiB, gt_4MiB)
 
-        # sanity check
-        if len(size_buckets) != len(self._expected_size_field_values):
-            raise RuntimeError( "Invalid number of size buckets")
-        
-        # structure to hold one mesurement
-        measurement = {
-            "time" : update_time * 1000000000,
-            # influx wants time in nano-seconds
-            "tags": {
-                "sfa_host" : sfa_host_name,
-                "lun_num" : lun_num 
-            },
-            "fields" :  {}
-        }
-        
+        self.update_lun_request_size_series_multi( read_series,
+                [ (sfa_host_name, update_time, lun_num, size_buckets) ])
+
+
+    def update_lun_request_size_series_multi( self, read_series, rows):
+        '''
+        Queues the read or write request size data for several LUNs.  rows is
+        a list of tuples of (sfa_host_name, update_time, lun_num, size_buckets).
+        See update_lun_request_size_series() for details.
+        '''
         if (read_series):
-            measurement["measurement"] = MEASUREMENT_NAMES["READ_REQUEST_SIZES"]
+            measurement = MEASUREMENT_NAMES["READ_REQUEST_SIZES"]
         else:
-            measurement["measurement"] = MEASUREMENT_NAMES["WRITE_REQUEST_SIZES"]
-
-        # add measurements to json_body for each bucket
-        for i in range(len(size_buckets)):
-            measurement["tags"]["bucket"] = self._expected_size_field_values[i]
-            measurement["fields"]["value"] = size_buckets[i]
-            self._json_body.append( copy.deepcopy(measurement))
+            measurement = MEASUREMENT_NAMES["WRITE_REQUEST_SIZES"]
+        self._add_bucket_points( measurement, self._expected_size_field_values,
+                                 rows, "size")
             
 
 
@@ -202,30 +348,116 @@ class SFAInfluxDb(object):
         # 'write_request_latencies' (depending on value of read_series)
         # Tags: sfa host name, lun number, bucket
         # Fields: value
+        # (Or, with the wide histogram schema:
+        # Tags: sfa host name, lun number
+        # Fields: le_16ms, le_32ms, ... le_16s, gt_16s)
         
-        # sanity check
-        if len(latency_buckets) != len(self._expected_latency_field_values):
-            raise RuntimeError( "Invalid number of size buckets")       
-                   
-        # structure to hold one mesurement
-        measurement = {
-            "time" : update_time * 1000000000,
-            # influx wants time in nano-seconds
-            "tags": {
-                "sfa_host" : sfa_host_name,
-                "lun_num" : lun_num 
-            },
-            "fields" :  {}
-        }
-        
+        self.update_lun_request_latency_series_multi( read_series,
+                [ (sfa_host_name, update_time, lun_num, latency_buckets) ])
+
+
+    def update_lun_request_latency_series_multi( self, read_series, rows):
+        '''
+        Queues the read or write request latency data for several LUNs.  rows
+        is a list of tuples of (sfa_host_name, update_time, lun_num,
+        latency_buckets).  See update_lun_request_latency_series() for details.
+        '''
         if (read_series):
-            measurement["measurement"] = MEASUREMENT_NAMES["READ_REQUEST_LATENCIES"]
+            measurement = MEASUREMENT_NAMES["READ_REQUEST_LATENCIES"]
         else:
-            measurement["measurement"] = MEASUREMENT_NAMES["WRITE_REQUEST_LATENCIES"]
+            measurement = MEASUREMENT_NAMES["WRITE_REQUEST_LATENCIES"]
+        self._add_bucket_points( measurement, self._expected_latency_field_values,
+                                 rows, "latency")
 
-        # add measurements to json_body for each bucket
-        for i in range(len(latency_buckets)):
-            measurement["tags"]["bucket"] = self._expected_latency_field_values[i]
-            measurement["fields"]["value"] = latency_buckets[i]
-            self._json_body.append( copy.deepcopy(measurement))
-            
+
+    def update_internal_metrics_multi( self, rows):
+        '''
+        Queues DDNTool's own timing data.  rows is a list of tuples of
+        (host name, update time, phase, count, sum, max, p50, p99).  (The
+        times are in seconds.)
+
+        Note: This function only queues the values for later output.  To
+        actually send anything to the database, you must call flush_to_db().
+        '''
+
+        # Schema:
+        # One measurement (called ddntool_internal)
+        #   tags: phase, sfa host name
+        #   values: count, sum, max, p50, p99
+
+        measurement = _escape_key( MEASUREMENT_NAMES["INTERNAL_METRICS"])
+        lines = []
+        for row in rows:
+            fields = ','.join( [ '%s=%s'%(name, _format_field_value( value))
+                                 for (name, value) in zip( INTERNAL_METRICS_FIELDS, row[3:]) ])
+            lines.append( '%s,phase=%s,sfa_host=%s %s %d\n'% \
+                          (measurement, _escape_key( row[2]), _escape_key( row[0]),
+                           fields, row[1] * self._time_multiplier))
+        self._buffer += ''.join( lines)
+        self._num_points += len(rows)
+
+
+    def _add_bucket_points( self, measurement, bucket_labels, rows, bucket_type):
+        '''
+        Encodes one point per bucket for each of the rows (which are tuples of
+        (sfa_host_name, update_time, lun_num, buckets)) and adds them to the
+        buffer.  bucket_type is only used in the error message.
+
+        With the wide histogram schema, it's one point per row instead.
+        '''
+        num_buckets = len(bucket_labels)
+        if self._wide_histograms:
+            field_names = [ _bucket_field_name( label) + '=' for label in bucket_labels ]
+        lines = []
+        for (sfa_host_name, update_time, lun_num, buckets) in rows:
+            # sanity check
+            if len(buckets) != num_buckets:
+                raise RuntimeError( "Invalid number of %s buckets"%bucket_type)
+
+            timestamp = ' %d\n'%(update_time * self._time_multiplier)
+            if self._wide_histograms:
+                series_key = self._get_series_key( measurement, sfa_host_name, lun_num)
+                fields = ','.join( [ field_names[i] + _format_field_value( buckets[i])
+                                     for i in range(num_buckets) ])
+                lines.append( series_key + ' ' + fields + timestamp)
+            else:
+                series_keys = self._get_bucket_series_keys( measurement, sfa_host_name,
+                                                            lun_num, bucket_labels)
+                for i in range(num_buckets):
+                    lines.append( series_keys[i] + _format_field_value( buckets[i]) + timestamp)
+        self._buffer += ''.join( lines)
+        self._num_points += len(lines)
+
+
+    def _get_series_key( self, measurement, sfa_host_name, lun_num):
+        '''
+        Returns the escaped measurement name and tags for one LUN's series
+        '''
+        key = (measurement, sfa_host_name, lun_num)
+        try:
+            return self._series_keys[key]
+        except KeyError:
+            # Note: tags are sorted by key (which is what InfluxDB prefers)
+            series_key = '%s,lun_num=%s,sfa_host=%s'%(_escape_key( measurement),
+                                                      _escape_key( lun_num),
+                                                      _escape_key( sfa_host_name))
+            self._series_keys[key] = series_key
+            return series_key
+
+
+    def _get_bucket_series_keys( self, measurement, sfa_host_name, lun_num, bucket_labels):
+        '''
+        Returns a list of the escaped series keys (with the bucket tag and the
+        start of the 'value' field already appended) for each bucket of one
+        LUN's request size or latency series
+        '''
+        key = (measurement, sfa_host_name, lun_num)
+        try:
+            return self._series_keys[key]
+        except KeyError:
+            series_keys = [ '%s,bucket=%s,lun_num=%s,sfa_host=%s value='% \
+                            (_escape_key( measurement), _escape_key( label),
+                             _escape_key( lun_num), _escape_key( sfa_host_name))
+                            for label in bucket_labels ]
+            self._series_keys[key] = series_keys
+            return series_keys
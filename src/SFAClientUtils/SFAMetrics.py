@@ -0,0 +1,130 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Timing of DDNTool's own work.
+
+An SFAMetrics object collects the durations of named phases (such as one
+getAll() call on the SFA API or one database write) and summarizes them
+as a count, sum, max and 50th and 99th percentiles.  The summaries are
+written to the databases alongside the storage data (see
+SFAInfluxDb.update_internal_metrics_multi() and
+SFAMySqlDb.update_internal_metrics_table_multi()).
+'''
+
+import threading
+from SFAScheduler import monotonic
+
+
+def percentile( sorted_values, fraction):
+    '''
+    Returns the value at the given fraction (0.0 - 1.0) of a sorted list,
+    using the nearest-rank method.  (No interpolation, so the result is
+    always one of the actual values.)
+    '''
+    if not sorted_values:
+        raise ValueError( "Can't take a percentile of an empty list")
+    rank = int( fraction * len(sorted_values) + 0.5)
+    return sorted_values[ min( max( rank - 1, 0), len(sorted_values) - 1)]
+
+
+class _PhaseTimer(object):
+    '''
+    Context manager returned by SFAMetrics.timer()
+    '''
+    def __init__(self, metrics, phase):
+        self._metrics = metrics
+        self._phase = phase
+        self._start = None
+
+    def __enter__(self):
+        self._start = monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._metrics.add( self._phase, monotonic() - self._start)
+        return False  # don't swallow exceptions
+
+
+class _NullTimer(object):
+    '''
+    Context manager returned by SFAMetrics.timer() when the metrics are
+    disabled.  Does nothing.
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+
+class SFAMetrics(object):
+    '''
+    Collects phase durations between calls to summarize().  It's safe to
+    add durations from more than one thread (the background writer adds
+    the database timings while the polling thread adds its own).
+
+    If enabled is False, nothing is recorded (and summarize() always
+    returns an empty list), so the timers can be left in place at almost
+    no cost.
+    '''
+
+    def __init__(self, enabled = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._samples = { }  # maps each phase name to a list of durations
+
+    def timer(self, phase):
+        '''
+        Returns a context manager that times the code in its 'with' block:
+            with metrics.timer( 'fast_poll'):
+                ...
+        '''
+        if not self.enabled:
+            return _NULL_TIMER
+        return _PhaseTimer( self, phase)
+
+    def add(self, phase, seconds):
+        '''
+        Records one duration (in seconds) for the named phase
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            self._samples.setdefault( phase, []).append( seconds)
+
+    def summarize(self):
+        '''
+        Returns a list of (phase, count, sum, max, p50, p99) tuples (sorted by
+        phase name) for everything recorded since the last call and then
+        starts over.  Times are in seconds.
+        '''
+        with self._lock:
+            samples = self._samples
+            self._samples = { }
+
+        summary = [ ]
+        for phase in sorted( samples.keys()):
+            values = sorted( samples[phase])
+            summary.append( (phase, len(values), sum(values), values[-1],
+                             percentile( values, 0.50), percentile( values, 0.99)))
+        return summary
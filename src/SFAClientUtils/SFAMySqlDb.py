@@ -19,6 +19,7 @@
 # A PARTICULAR PURPOSE.
 
 
+import cPickle
 import logging
 import mysql.connector
 
@@ -39,7 +40,8 @@ TABLE_NAMES = {
              "DD_READ_REQUEST_SIZE_TABLE_NAME" : u"DiskDriveReadRequestSizes",
              "DD_READ_REQUEST_LATENCY_TABLE_NAME" : u"DiskDriveReadRequestLatencies",
              "DD_WRITE_REQUEST_SIZE_TABLE_NAME" : u"DiskDriveWriteRequestSizes",
-             "DD_WRITE_REQUEST_LATENCY_TABLE_NAME" : u"DiskDriveWriteRequestLatencies"
+             "DD_WRITE_REQUEST_LATENCY_TABLE_NAME" : u"DiskDriveWriteRequestLatencies",
+             "INTERNAL_METRICS_TABLE_NAME" : u"DDNToolInternal"
 #define USER_TABLE_NAME             "Users"
  }
 #
@@ -113,6 +115,115 @@ PARTIAL_SIZE_TABLE_DEF = \
 # buckets that the DDN controllers are using match what we expect.  If that
 # ever changes, we'll obviously have to change this code, too.
 
+# Pieces of the INSERT statements for the lun info tables.  The statements
+# are built by _multi_row_query() with one copy of the _ROW part for each
+# row we're updating.
+LUN_TABLE_INSERT_PREFIX = \
+    "INSERT INTO " + TABLE_NAMES['LUN_TABLE_NAME'] +                     \
+    "(Hostname, LastUpdate, Disk_Num, Transfer_BW, Read_BW, Write_BW, "  \
+    "Read_IOPS, Write_IOPS, Forwarded_BW, Forwarded_IOPS, Pool_State) "  \
+    "VALUES "
+LUN_TABLE_INSERT_ROW = \
+    "( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+LUN_TABLE_INSERT_SUFFIX = \
+    " ON DUPLICATE KEY UPDATE LastUpdate=VALUES(LastUpdate), "           \
+    "Transfer_BW=VALUES(Transfer_BW), Read_BW=VALUES(Read_BW), "         \
+    "Write_BW=VALUES(Write_BW), Read_IOPS=VALUES(Read_IOPS), "           \
+    "Write_IOPS=VALUES(Write_IOPS), Forwarded_BW=VALUES(Forwarded_BW), " \
+    "Forwarded_IOPS=VALUES(Forwarded_IOPS), Pool_State=VALUES(Pool_State);"
+
+RAW_LUN_TABLE_INSERT_PREFIX = \
+    "INSERT INTO " + TABLE_NAMES['RAW_LUN_TABLE_NAME'] +   \
+    "(Hostname, LastUpdate, Disk_Num, Transfer_Bytes, "     \
+    "Read_Bytes, Write_Bytes, Forwarded_bytes, "            \
+    "Total_IOs, Read_IOs, Write_IOs, Forwarded_IOs, Pool_State) " \
+    "VALUES "
+RAW_LUN_TABLE_INSERT_ROW = \
+    "( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+RAW_LUN_TABLE_INSERT_SUFFIX = \
+    " ON DUPLICATE KEY UPDATE LastUpdate=VALUES(LastUpdate), "     \
+    "Transfer_Bytes=VALUES(Transfer_Bytes), "                     \
+    "Read_Bytes=VALUES(Read_Bytes), "                             \
+    "Write_Bytes=VALUES(Write_Bytes), "                           \
+    "Forwarded_Bytes=VALUES(Forwarded_Bytes), "                   \
+    "Total_IOs=VALUES(Total_IOs), Read_IOs=VALUES(Read_IOs), "    \
+    "Write_IOs=VALUES(Write_IOs), "                               \
+    "Forwarded_IOs=VALUES(Forwarded_IOs), "                       \
+    "Pool_State=VALUES(Pool_State);"
+
+DISK_TABLE_REPLACE_PREFIX = \
+    "REPLACE INTO " + TABLE_NAMES['DISK_TABLE_NAME'] +   \
+    "(Hostname, LastUpdate, Disk_Num, Transfer_BW, "     \
+    "Read_IOPS, Write_IOPS) VALUES "
+DISK_TABLE_REPLACE_ROW = "( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s)"
+
+INTERNAL_METRICS_REPLACE_PREFIX = \
+    "REPLACE INTO " + TABLE_NAMES['INTERNAL_METRICS_TABLE_NAME'] +  \
+    "(Hostname, LastUpdate, Phase, Count, Total_Time, Max_Time, "  \
+    "P50_Time, P99_Time) VALUES "
+INTERNAL_METRICS_REPLACE_ROW = "( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s)"
+
+# Pieces of the REPLACE statements for the request size and latency tables.
+# There's one placeholder for each bucket in PARTIAL_SIZE_TABLE_DEF,
+# PARTIAL_LUN_LATENCY_TABLE_DEF and PARTIAL_DD_LATENCY_TABLE_DEF (12 each).
+NUM_SIZE_BUCKETS = 12
+NUM_LUN_LATENCY_BUCKETS = 12
+NUM_DD_LATENCY_BUCKETS = 12
+REQUEST_SIZE_ROW = \
+    "( %s, FROM_UNIXTIME(%s), %s" + (", %s" * NUM_SIZE_BUCKETS) + ")"
+LUN_REQUEST_LATENCY_ROW = \
+    "( %s, FROM_UNIXTIME(%s), %s" + (", %s" * NUM_LUN_LATENCY_BUCKETS) + ")"
+DD_REQUEST_LATENCY_ROW = \
+    "( %s, FROM_UNIXTIME(%s), %s" + (", %s" * NUM_DD_LATENCY_BUCKETS) + ")"
+
+# MySQL won't accept a prepared statement with more than 65535 placeholders,
+# so large batches are split into several statements.
+MAX_PLACEHOLDERS = 65535
+
+
+# Exceptions that mean the server is down or the connection was lost (as
+# opposed to something being wrong with the statement).  Writes that fail
+# with one of these are spooled if there's a spool.
+RETRYABLE_ERRORS = (mysql.connector.errors.OperationalError,
+                    mysql.connector.errors.InterfaceError)
+
+
+def _encode_statement( statement):
+    '''
+    Converts a (query, values) tuple to a string for the spool
+    '''
+    return cPickle.dumps( statement, cPickle.HIGHEST_PROTOCOL)
+
+
+def _chunk_sizes( num_rows, max_rows):
+    '''
+    Returns the sizes of the statements to split num_rows rows into: powers
+    of two (largest first), none bigger than max_rows.  With only a few
+    fixed sizes, the number of different statements (and prepared cursors)
+    for a table stays small, no matter how much the number of rows varies
+    from one write to the next.  (With skip_unchanged set in the writer
+    section, it varies every poll - see SFADeltaFilter.py.)
+    '''
+    size = 1
+    while size * 2 <= max_rows:
+        size *= 2
+    sizes = [ ]
+    while num_rows > 0:
+        while size > num_rows:
+            size //= 2
+        sizes.append( size)
+        num_rows -= size
+    return sizes
+
+
+def _multi_row_query( prefix, row, suffix, num_rows):
+    '''
+    Builds an SQL statement that inserts num_rows rows at once: the prefix,
+    num_rows copies of the row placeholders (separated by commas), then the
+    suffix.
+    '''
+    return prefix + ", ".join( [row] * num_rows) + suffix
+
 
 class SFAMySqlDb(object):
     '''
@@ -120,7 +231,7 @@ class SFAMySqlDb(object):
     '''
 
 
-    def __init__(self, user, password, host, db_name, init = False ):
+    def __init__(self, user, password, host, db_name, init = False, spool = None):
         '''
         Connect to the database and create the tables (if necessary)
         
@@ -128,16 +239,50 @@ class SFAMySqlDb(object):
         be thrown.  There's really very little that this class could do to recover
         from any errors and without a database connection and properly initialized
         tables, this class is pretty useless.
+
+        The exception is when spool (an SFASpool object) is given.  Then, if
+        the server can't be reached (either now or later), the writes are
+        saved in the spool and we reconnect and send them when the server
+        comes back.  (Initializing the tables still needs the server, so
+        with init set, a connection error is passed on as usual.)
         '''
 
         # Get the logger object
         self.logger = logging.getLogger( 'DDNTool_SFAMySqlDb')
         self.logger.debug( 'Creating instance of SFAMySqlDb')
 
-        self._dbcon = mysql.connector.connect(user = user, password = password,
-                                              host = host, database = db_name)
-        if init:            
-            self._create_schema()
+        # Cache of the multi-row statements we've built, keyed by the
+        # statement prefix and the number of rows.  (The numbers of rows are
+        # all powers of two - see _chunk_sizes() - so this stays small.)
+        self._query_cache = {}
+
+        # Statement registry: maps the text of each statement we've executed
+        # to a prepared cursor for it.  The server only has to parse each
+        # statement once per connection and the parameters are sent in their
+        # native (binary) types.  The cursors belong to the connection, so if
+        # the connection is ever replaced, this must be emptied.
+        self._prepared = {}
+
+        self._connect_args = { 'user' : user, 'password' : password,
+                               'host' : host, 'database' : db_name }
+        self._dbcon = None
+        # Whether the internal metrics table exists (None until we've
+        # checked - see _check_internal_metrics_table())
+        self._have_internal_metrics_table = None
+        self._spool = spool
+        if spool:
+            spool.attach( self._execute_now, RETRYABLE_ERRORS,
+                          _encode_statement, cPickle.loads)
+        if spool and not init:
+            try:
+                self._connect()
+            except RETRYABLE_ERRORS, e:
+                self.logger.warning( "Can't connect to the database (%s).  "
+                                     "Writes will be spooled."%e)
+        else:
+            self._connect()
+            if init:            
+                self._create_schema()
         
  
     def update_lun_table( self, sfa_client_name, update_time, lun_num,
@@ -148,26 +293,20 @@ class SFAMySqlDb(object):
         Updates the row in the lun info table for the specified 
         client and virtual disk.
         '''
+        self.update_lun_table_multi( [(sfa_client_name, update_time, lun_num,
+                                       transfer_bw, read_bw, write_bw,
+                                       read_iops, write_iops, forwarded_bw,
+                                       forwarded_iops, pool_state)])
 
-        
-        insert_query = "INSERT INTO " + TABLE_NAMES['LUN_TABLE_NAME'] +                 \
-                "(Hostname, LastUpdate, Disk_Num, Transfer_BW, Read_BW, Write_BW, "     \
-                "Read_IOPS, Write_IOPS, Forwarded_BW, Forwarded_IOPS, Pool_State) "     \
-                "VALUES( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s) "   \
-                "ON DUPLICATE KEY UPDATE LastUpdate=VALUES(LastUpdate), "               \
-                "Transfer_BW=VALUES(Transfer_BW), Read_BW=VALUES(Read_BW), "            \
-                "Write_BW=VALUES(Write_BW), Read_IOPS=VALUES(Read_IOPS), "              \
-                "Write_IOPS=VALUES(Write_IOPS), Forwarded_BW=VALUES(Forwarded_BW), "    \
-                "Forwarded_IOPS=VALUES(Forwarded_IOPS), Pool_State=VALUES(Pool_State);" 
-        
-        cursor = self._dbcon.cursor()
-        cursor.execute( insert_query, (sfa_client_name, str(update_time),
-                                       str(lun_num), str(transfer_bw),
-                                       str(read_bw), str(write_bw),
-                                       str(read_iops), str(write_iops),
-                                       str(forwarded_bw), str(forwarded_iops),
-                                       str(pool_state)))
-        cursor.close()
+    def update_lun_table_multi( self, rows):
+        '''
+        Updates several rows in the lun info table with a few multi-row
+        statements (see _write_rows()).  rows is a list of tuples.  Each
+        tuple holds the same values (in the same order) as the parameters
+        to update_lun_table().
+        '''
+        self._write_rows( LUN_TABLE_INSERT_PREFIX, LUN_TABLE_INSERT_ROW,
+                          LUN_TABLE_INSERT_SUFFIX, rows)
 
     def update_raw_lun_table( self, sfa_client_name, update_time, lun_num,
                               transfer_bytes, read_bytes, write_bytes,
@@ -177,32 +316,20 @@ class SFAMySqlDb(object):
         Updates the row in the raw lun info table for the specified 
         client and virtual disk.
         '''
-        
-        insert_query = "INSERT INTO " + TABLE_NAMES['RAW_LUN_TABLE_NAME'] +   \
-                "(Hostname, LastUpdate, Disk_Num, Transfer_Bytes, "           \
-                "Read_Bytes, Write_Bytes, Forwarded_bytes, "                  \
-                "Total_IOs, Read_IOs, Write_IOs, Forwarded_IOs, Pool_State) " \
-                "VALUES( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, " \
-                "%s, %s, %s) "                                                \
-                "ON DUPLICATE KEY UPDATE LastUpdate=VALUES(LastUpdate), "     \
-                "Transfer_Bytes=VALUES(Transfer_Bytes), "                     \
-                "Read_Bytes=VALUES(Read_Bytes), "                             \
-                "Write_Bytes=VALUES(Write_Bytes), "                           \
-                "Forwarded_Bytes=VALUES(Forwarded_Bytes), "                   \
-                "Total_IOs=VALUES(Total_IOs), Read_IOs=VALUES(Read_IOs), "    \
-                "Write_IOs=VALUES(Write_IOs), "                               \
-                "Forwarded_IOs=VALUES(Forwarded_IOs), "                       \
-                "Pool_State=VALUES(Pool_State);" 
-        
-        cursor = self._dbcon.cursor()
-        cursor.execute( insert_query, (sfa_client_name, str(update_time),
-                                        str(lun_num), str(transfer_bytes),
-                                        str(read_bytes), str(write_bytes),
-                                        str(forwarded_bytes),
-                                        str(total_ios), str(read_ios),
-                                        str(write_ios), str(forwarded_ios),
-                                        str(pool_state)))
-        cursor.close()
+        self.update_raw_lun_table_multi( [(sfa_client_name, update_time, lun_num,
+                                           transfer_bytes, read_bytes, write_bytes,
+                                           forwarded_bytes, total_ios, read_ios,
+                                           write_ios, forwarded_ios, pool_state)])
+
+    def update_raw_lun_table_multi( self, rows):
+        '''
+        Updates several rows in the raw lun info table with a few multi-row
+        statements (see _write_rows()).  rows is a list of tuples.  Each
+        tuple holds the same values (in the same order) as the parameters
+        to update_raw_lun_table().
+        '''
+        self._write_rows( RAW_LUN_TABLE_INSERT_PREFIX, RAW_LUN_TABLE_INSERT_ROW,
+                          RAW_LUN_TABLE_INSERT_SUFFIX, rows)
         
     def update_dd_table( self, sfa_client_name, update_time, dd_num,
                          transfer_bw, read_iops, write_iops):
@@ -210,17 +337,9 @@ class SFAMySqlDb(object):
         Updates the row in the disk table for the specified 
         client and virtual disk.
         '''
-
-        replace_query = "REPLACE INTO " + TABLE_NAMES['DISK_TABLE_NAME'] + \
-                        "(Hostname, LastUpdate, Disk_Num, Transfer_BW, "   \
-                        "Read_IOPS, Write_IOPS) "                          \
-                        "VALUES( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s);"
-     
-        cursor = self._dbcon.cursor()
-        cursor.execute( replace_query, (sfa_client_name, str(update_time),
-                                        str(dd_num), str(transfer_bw),
-                                        str(read_iops), str(write_iops)))
-        cursor.close()
+        self._write_rows( DISK_TABLE_REPLACE_PREFIX, DISK_TABLE_REPLACE_ROW, ";",
+                          [(sfa_client_name, update_time, dd_num,
+                            transfer_bw, read_iops, write_iops)])
 
     def update_lun_request_size_table( self, sfa_client_name, update_time,
                                        lun_num, read_table, size_buckets):
@@ -230,28 +349,22 @@ class SFAMySqlDb(object):
         number of requests for each size and is expected to match the size values listed in
         the column headings.
         '''
-        
-        replace_query = "REPLACE INTO "
+        self.update_lun_request_size_table_multi( read_table,
+                [(sfa_client_name, update_time, lun_num, size_buckets)])
+
+    def update_lun_request_size_table_multi( self, read_table, rows):
+        '''
+        Update the read or write request size data (depending on the value of the read_table
+        boolean) for several LUNs with a few multi-row statements.  rows is a list of tuples of
+        (sfa_client_name, update_time, lun_num, size_buckets).  See
+        update_lun_request_size_table() for details.
+        '''
         if read_table:
-            replace_query += TABLE_NAMES["LUN_READ_REQUEST_SIZE_TABLE_NAME"]
+            table_name = TABLE_NAMES["LUN_READ_REQUEST_SIZE_TABLE_NAME"]
         else:    
-            replace_query += TABLE_NAMES["LUN_WRITE_REQUEST_SIZE_TABLE_NAME"]
-
-        replace_query += " VALUES( %s, FROM_UNIXTIME(%s), %s" 
-        
-        for unused_i in range(len(size_buckets)):
-            replace_query += ", %s"
-        replace_query += ");"
-       
-        values = (sfa_client_name, str(update_time), str(lun_num))
-        for size in size_buckets:
-                values += (str(size), )
-        # Note: it seems like I shouldn't have to convert all the sizes to strings manually,
-        # but I get strange mysql errors if I don't...
-
-        cursor = self._dbcon.cursor()
-        cursor.execute( replace_query, values)
-        cursor.close()
+            table_name = TABLE_NAMES["LUN_WRITE_REQUEST_SIZE_TABLE_NAME"]
+        self._replace_bucket_rows( table_name, REQUEST_SIZE_ROW,
+                                   NUM_SIZE_BUCKETS, rows)
 
     def update_lun_request_latency_table( self, sfa_client_name, update_time,
                                           lun_num, read_table, latency_buckets):
@@ -261,30 +374,23 @@ class SFAMySqlDb(object):
         the number of requests that were handled in each time frame and is expected to match
         the latency values listed in the column headings.
         '''
+        self.update_lun_request_latency_table_multi( read_table,
+                [(sfa_client_name, update_time, lun_num, latency_buckets)])
 
-        replace_query = "REPLACE INTO "
+    def update_lun_request_latency_table_multi( self, read_table, rows):
+        '''
+        Update the read or write request latency data (depending on the value of the
+        read_table boolean) for several LUNs with a few multi-row statements.  rows is a list of
+        tuples of (sfa_client_name, update_time, lun_num, latency_buckets).  See
+        update_lun_request_latency_table() for details.
+        '''
         if read_table:
-            replace_query += TABLE_NAMES["LUN_READ_REQUEST_LATENCY_TABLE_NAME"]
+            table_name = TABLE_NAMES["LUN_READ_REQUEST_LATENCY_TABLE_NAME"]
         else:
-            replace_query += TABLE_NAMES["LUN_WRITE_REQUEST_LATENCY_TABLE_NAME"]
-
-        replace_query += " VALUES( %s, FROM_UNIXTIME(%s), %s"
-
-        for unused_i in range(len(latency_buckets)):
-            replace_query += ", %s"
-        replace_query += ");"
+            table_name = TABLE_NAMES["LUN_WRITE_REQUEST_LATENCY_TABLE_NAME"]
+        self._replace_bucket_rows( table_name, LUN_REQUEST_LATENCY_ROW,
+                                   NUM_LUN_LATENCY_BUCKETS, rows)
 
-        values = (sfa_client_name, str(update_time), str(lun_num))
-        for latency in latency_buckets:
-                values += (str(latency), )
-        # Note: it seems like I shouldn't have to convert all the values to strings manually,
-        # but I get strange mysql errors if I don't...
-
-        cursor = self._dbcon.cursor()
-        cursor.execute( replace_query, values)
-        cursor.close()
-
- 
     def update_dd_request_size_table( self, sfa_client_name, update_time,
                                       disk_num, read_table, size_buckets):
         '''
@@ -293,28 +399,12 @@ class SFAMySqlDb(object):
         number of requests for each size and is expected to match the size values listed in
         the column headings.
         '''
-        
-        replace_query = "REPLACE INTO "
         if read_table:
-            replace_query += TABLE_NAMES["DD_READ_REQUEST_SIZE_TABLE_NAME"]
+            table_name = TABLE_NAMES["DD_READ_REQUEST_SIZE_TABLE_NAME"]
         else:    
-            replace_query += TABLE_NAMES["DD_WRITE_REQUEST_SIZE_TABLE_NAME"]
-            
-        replace_query += " VALUES( %s, FROM_UNIXTIME(%s), %s"
-        
-        for unused_i in range(len(size_buckets)):
-            replace_query += ", %s"
-        replace_query += ");"
-        
-        values = (sfa_client_name, str(update_time), str(disk_num))
-        for size in size_buckets:
-                values += (str(size), )
-        # Note: it seems like I shouldn't have to convert all the sizes to strings manually,
-        # but I get strange mysql errors if I don't...
-        
-        cursor = self._dbcon.cursor()
-        cursor.execute( replace_query, values)
-        cursor.close()
+            table_name = TABLE_NAMES["DD_WRITE_REQUEST_SIZE_TABLE_NAME"]
+        self._replace_bucket_rows( table_name, REQUEST_SIZE_ROW, NUM_SIZE_BUCKETS,
+                                   [(sfa_client_name, update_time, disk_num, size_buckets)])
         
     def update_dd_request_latency_table( self, sfa_client_name, update_time,
                                          disk_num, read_table, latency_buckets):
@@ -324,29 +414,133 @@ class SFAMySqlDb(object):
         the number of requests that were handled in each time frame and is expected to match
         the latency values listed in the column headings.
         '''
-
-        replace_query = "REPLACE INTO "
         if read_table:
-            replace_query += TABLE_NAMES["DD_READ_REQUEST_LATENCY_TABLE_NAME"]
+            table_name = TABLE_NAMES["DD_READ_REQUEST_LATENCY_TABLE_NAME"]
         else:
-            replace_query += TABLE_NAMES["DD_WRITE_REQUEST_LATENCY_TABLE_NAME"]
-            
-        replace_query += " VALUES( %s, FROM_UNIXTIME(%s), %s"
-        
-        for unused_i in range(len(latency_buckets)):
-            replace_query += ", %s"
-        replace_query += ");"
-        
-        values = (sfa_client_name, str(update_time), str(disk_num))
-        for latency in latency_buckets:
-                values += (str(latency), )
-        # Note: it seems like I shouldn't have to convert all the values to strings manually,
-        # but I get strange mysql errors if I don't...
-        
-        cursor = self._dbcon.cursor()
-        cursor.execute( replace_query, values)
-        cursor.close()
+            table_name = TABLE_NAMES["DD_WRITE_REQUEST_LATENCY_TABLE_NAME"]
+        self._replace_bucket_rows( table_name, DD_REQUEST_LATENCY_ROW,
+                                   NUM_DD_LATENCY_BUCKETS,
+                                   [(sfa_client_name, update_time, disk_num, latency_buckets)])
+
+    def update_internal_metrics_table_multi( self, rows):
+        '''
+        Updates the rows in the internal metrics table (DDNTool's timings of
+        its own work).  rows is a list of tuples of (host name, update time,
+        phase, count, sum, max, p50, p99).  The times are in seconds.
+        '''
+        if self._have_internal_metrics_table is False:
+            return  # see _check_internal_metrics_table()
+        self._write_rows( INTERNAL_METRICS_REPLACE_PREFIX, INTERNAL_METRICS_REPLACE_ROW,
+                          ";", rows)
 
+    def _replace_bucket_rows( self, table_name, row_placeholders, num_buckets, rows):
+        '''
+        Helper for the request size and latency tables: writes all the rows
+        (tuples of hostname, update time, device number and a list of bucket
+        values) into the named table with multi-row REPLACE statements.
+        '''
+        flat_rows = [ ]
+        for (sfa_client_name, update_time, device_num, buckets) in rows:
+            if len(buckets) != num_buckets:
+                raise RuntimeError( "Invalid number of buckets for %s"%table_name)
+            flat_rows.append( (sfa_client_name, update_time, device_num) + tuple(buckets))
+
+        self._write_rows( "REPLACE INTO " + table_name + " VALUES ",
+                          row_placeholders, ";", flat_rows)
+
+    def _write_rows( self, prefix, row_placeholders, suffix, rows):
+        '''
+        Writes all the rows (each one a tuple with a value for every
+        placeholder in row_placeholders) with multi-row statements whose
+        sizes come from _chunk_sizes().  (So no statement has more than
+        MAX_PLACEHOLDERS placeholders.)
+        '''
+        max_rows = MAX_PLACEHOLDERS // row_placeholders.count( '%s')
+        chunk_start = 0
+        for chunk_size in _chunk_sizes( len(rows), max_rows):
+            chunk = rows[chunk_start:chunk_start + chunk_size]
+            chunk_start += chunk_size
+            query = self._cached_query( prefix, row_placeholders, suffix, len(chunk))
+            values = [ ]
+            for row in chunk:
+                values.extend( row)
+            self._execute( query, values)
+
+    def _execute(self, query, values):
+        '''
+        Executes a statement (or, if the database is down, spools it)
+        '''
+        if self._spool:
+            self._spool.write( (query, tuple(values)))
+        else:
+            self._execute_now( (query, values))
+
+    def _execute_now(self, statement):
+        '''
+        Executes a (query, values) tuple using the prepared cursor from the
+        statement registry (preparing the statement the first time we see
+        it).  The values are bound in their native types - no string
+        conversions.
+        '''
+        (query, values) = statement
+        if self._dbcon is None:
+            self._connect()
+        cursor = self._prepared.get( query)
+        try:
+            if cursor is None:
+                cursor = self._dbcon.cursor( prepared=True)
+                self._prepared[query] = cursor
+            cursor.execute( query, tuple(values))
+        except RETRYABLE_ERRORS:
+            # The connection is probably dead.  Throw it (and its prepared
+            # statements) away so we start fresh next time.
+            self._disconnect()
+            raise
+
+    def _connect(self):
+        self._dbcon = mysql.connector.connect( **self._connect_args)
+        if self._have_internal_metrics_table is None:
+            self._check_internal_metrics_table()
+
+    def _check_internal_metrics_table(self):
+        '''
+        The internal metrics table is newer than the others, so a database
+        that was initialized by an older version won't have it.  Creates it
+        if it's missing.  If that fails (because the database user isn't
+        allowed to create tables, for example), the metrics just aren't
+        written to this database.
+        '''
+        try:
+            self._new_internal_metrics_table( if_not_exists = True)
+            self._have_internal_metrics_table = True
+        except RETRYABLE_ERRORS:
+            raise
+        except mysql.connector.Error, e:
+            self.logger.warning( "Can't create the %s table (%s).  DDNTool's internal "
+                                 "metrics won't be written to the database."% \
+                                 (TABLE_NAMES["INTERNAL_METRICS_TABLE_NAME"], e))
+            self._have_internal_metrics_table = False
+
+    def _disconnect(self):
+        self._prepared = {}
+        if self._dbcon is not None:
+            try:
+                self._dbcon.close()
+            except mysql.connector.Error:
+                pass  # it's already broken - nothing else to do
+            self._dbcon = None
+
+    def _cached_query(self, prefix, row, suffix, num_rows):
+        '''
+        Returns the multi-row statement built by _multi_row_query(), building
+        it only the first time a given statement and row count is requested.
+        '''
+        key = (prefix, num_rows)
+        query = self._query_cache.get( key)
+        if query is None:
+            query = _multi_row_query( prefix, row, suffix, num_rows)
+            self._query_cache[key] = query
+        return query
 
     def _create_schema(self):
         # Drop the old tables (since we're not storing long-term data, it's easier
@@ -379,6 +573,7 @@ class SFAMySqlDb(object):
         self._new_lun_read_request_latency_table()
         self._new_lun_write_request_size_table()
         self._new_lun_write_request_latency_table()
+        self._new_internal_metrics_table()
 
     def _query_exec(self, query):
         '''
@@ -501,6 +696,26 @@ class SFAMySqlDb(object):
 
         self._query_exec( table_def)
 
+    def _new_internal_metrics_table(self, if_not_exists = False):
+        '''
+        Create the db table that holds the timings of DDNTool's own work
+        '''
+
+        create = "CREATE TABLE "
+        if if_not_exists:
+            create = "CREATE TABLE IF NOT EXISTS "
+        table_def = \
+        create + TABLE_NAMES["INTERNAL_METRICS_TABLE_NAME"] + " "  \
+        "(Hostname VARCHAR(75) NOT NULL, LastUpdate TIMESTAMP, " \
+        "Phase VARCHAR(100) NOT NULL, Count INT UNSIGNED, "  \
+        "Total_Time DOUBLE, Max_Time DOUBLE, P50_Time DOUBLE, P99_Time DOUBLE, " \
+        "CONSTRAINT unique_phase UNIQUE (Hostname, Phase), "  \
+        "INDEX( Hostname) )"  \
+        "ENGINE=HEAP" \
+        ";"
+
+        self._query_exec( table_def)
+
 # Disk drive request size and latency tables
     def _new_dd_read_request_size_table( self):
         '''
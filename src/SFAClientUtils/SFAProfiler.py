@@ -0,0 +1,239 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+On-demand profiling of a running process.
+
+Sending SIGUSR1 to a process that has called install_signal_handler()
+starts profiling the next few ticks of every SFAProfiler in that process
+(sending it again while they're running stops them early).  When a
+profiler finishes, it writes two files to its directory:
+    <name>-<pid>-<date>-<time>.pstats   : cProfile data for the ticks
+                                          (load it with the pstats module)
+    <name>-<pid>-<date>-<time>.mem.txt  : the top memory allocators
+
+The memory report comes from tracemalloc if it's available (it's in the
+standard library from Python 3.4 and there's a back-port for 2.7).
+Otherwise, it's a count of the live objects of each type (from the gc
+module) and how much each count changed while we were profiling.
+'''
+
+import cProfile
+import gc
+import logging
+import os
+import signal
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# Defaults for the optional settings in the config file's profiling section
+PROFILING_DEFAULTS = { 'ticks' : '30', 'top' : '25' }
+
+# All the profilers in this process.  (The signal handler requests a
+# profile from every one of them.)
+_profilers = [ ]
+_profilers_lock = threading.Lock()
+
+# Number of profilers that are using tracemalloc right now.  (There's only
+# one tracemalloc per process, so it's started by the first and stopped by
+# the last.)
+_tracemalloc_users = 0
+
+
+def open_profiler( config, name):
+    '''
+    Returns an SFAProfiler using the settings in the config file's profiling
+    section, or None if the section (or its directory setting) is missing.
+    '''
+    if not config.has_option('profiling', 'directory'):
+        return None
+
+    def get_option( option):
+        if config.has_option('profiling', option):
+            return config.getint('profiling', option)
+        return int( PROFILING_DEFAULTS[option])
+
+    return SFAProfiler( config.get('profiling', 'directory'), name,
+                        get_option( 'ticks'), get_option( 'top'))
+
+
+def install_signal_handler( on_signal = None, signum = signal.SIGUSR1):
+    '''
+    Installs a handler for signum (SIGUSR1 by default) that requests a
+    profile from every SFAProfiler in this process.  If on_signal is given,
+    it's called (with no arguments) from the handler as well.  (The main
+    process uses it to pass the signal on to its children.)
+
+    The handler is installed so that the system calls it interrupts are
+    restarted (where possible) instead of failing with EINTR.  That matters
+    for the blocking socket calls to the controllers and the databases.
+    (select() is never restarted, so code that uses it must still handle
+    EINTR - see DDNTool.wait_for_iterations().)
+
+    Note: signal handlers can only be installed from the main thread.
+    '''
+    def handler( unused_signum, unused_frame):
+        with _profilers_lock:
+            profilers = list( _profilers)
+        for profiler in profilers:
+            profiler.request()
+        if on_signal:
+            on_signal()
+
+    signal.signal( signum, handler)
+    signal.siginterrupt( signum, False)
+
+
+def _count_types():
+    '''
+    Returns a dictionary mapping the name of each type to the number of live
+    objects (that the garbage collector knows about) of that type
+    '''
+    counts = { }
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        counts[name] = counts.get( name, 0) + 1
+    return counts
+
+
+class SFAProfiler(object):
+    '''
+    Profiles a number of ticks (iterations of a main loop) when asked to.
+    The loop calls begin_tick() and end_tick() around the work it does
+    each tick.  Only the work between those calls - in the thread that
+    makes them - is profiled.
+    '''
+
+    def __init__(self, directory, name, ticks, top):
+        '''
+        The output files go in directory and start with name.  ticks is the
+        number of ticks to profile for each request.  top is the number of
+        entries in the memory report.
+        '''
+        self.logger = logging.getLogger( 'DDNTool_SFAProfiler')
+        self._directory = directory
+        self._name = name
+        self._ticks = ticks
+        self._top = top
+
+        self._requested = False  # set by the signal handler
+        self._profile = None     # the cProfile object while we're profiling
+        self._ticks_left = 0
+        self._start_counts = None  # type counts when tracemalloc isn't available
+
+        with _profilers_lock:
+            _profilers.append( self)
+
+    def close(self):
+        '''
+        Stops any profile that's running (and writes it out) and removes
+        this profiler from the signal handler's list
+        '''
+        if self._profile is not None:
+            self._stop()
+        with _profilers_lock:
+            if self in _profilers:
+                _profilers.remove( self)
+
+    def request(self):
+        '''
+        Asks for a profile to start (or, if one's running, to stop) at the
+        beginning of the next tick.  This is all the signal handler does:
+        the real work happens in the thread that's being profiled.
+        '''
+        self._requested = True
+
+    def begin_tick(self):
+        if self._requested:
+            self._requested = False
+            if self._profile is None:
+                self._start()
+            else:
+                self._stop()  # a second request ends the profile early
+                return
+
+        if self._profile is not None:
+            self._profile.enable()
+
+    def end_tick(self):
+        if self._profile is None:
+            return
+        self._profile.disable()
+        self._ticks_left -= 1
+        if self._ticks_left <= 0:
+            self._stop()
+
+    def _start(self):
+        global _tracemalloc_users
+        self.logger.info( "Profiling %s for %d ticks"%(self._name, self._ticks))
+        self._profile = cProfile.Profile()
+        self._ticks_left = self._ticks
+        if tracemalloc:
+            with _profilers_lock:
+                if _tracemalloc_users == 0:
+                    tracemalloc.start()
+                _tracemalloc_users += 1
+        else:
+            self._start_counts = _count_types()
+
+    def _stop(self):
+        global _tracemalloc_users
+        profile = self._profile
+        self._profile = None
+        profile.disable()
+
+        if not os.path.isdir( self._directory):
+            os.makedirs( self._directory)
+        base_name = os.path.join( self._directory, '%s-%d-%s'% \
+                                  (self._name, os.getpid(),
+                                   time.strftime( '%Y%m%d-%H%M%S')))
+        profile.dump_stats( base_name + '.pstats')
+
+        if tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            with _profilers_lock:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+            lines = [ 'Top %d allocations (by line):'%self._top ]
+            lines.extend( [ str(stat) for stat in
+                            snapshot.statistics( 'lineno')[:self._top] ])
+        else:
+            counts = _count_types()
+            start_counts = self._start_counts
+            self._start_counts = None
+            lines = [ 'tracemalloc is not available.  Top %d object types '
+                      '(by number of live objects):'%self._top ]
+            for name in sorted( counts, key=counts.get, reverse=True)[:self._top]:
+                lines.append( '%-40s %10d  (%+d)'% \
+                              (name, counts[name], counts[name] - start_counts.get( name, 0)))
+
+        mem_file = open( base_name + '.mem.txt', 'w')
+        try:
+            mem_file.write( '\n'.join( lines) + '\n')
+        finally:
+            mem_file.close()
+
+        self.logger.info( "Profile of %s written to %s.pstats"%(self._name, base_name))
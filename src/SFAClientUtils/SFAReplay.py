@@ -0,0 +1,219 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Replays capture files (see SFACapture.py) in place of the SFA API.
+
+Like SFASimulator, this module implements the parts of the ddn.sfa.api
+package that SFAClient uses.  Set 'api = replay' in the config file's
+ddn_hardware section and 'directory' in its replay section.  Connecting to
+a host opens <directory>/<host>.sfacap and the getAll() calls return the
+recorded data instead of asking a controller.  It's normally driven by
+SFAReplay_Driver.py, which also sets the pace.
+
+The SFAVirtualDiskStatistics records set the pace of the replay: each
+getAll() on that class returns the next one in the file.  The other
+classes are polled less often (and maybe not at the same rate as when the
+file was recorded), so getAll() on them returns the newest record of that
+class from before the next SFAVirtualDiskStatistics record.  When there
+are no SFAVirtualDiskStatistics records left, getAll() raises
+ReplayFinished.
+
+sample_time() returns the time the current SFAVirtualDiskStatistics record
+was captured.  SFAClient uses it to timestamp the samples in its time
+series, so the averages are the same as when the data was recorded.
+'''
+
+import collections
+import os
+
+from SFACapture import SFACaptureReader, capture_path
+
+PACE_CLASS = 'SFAVirtualDiskStatistics'
+
+_directory = None
+
+# The context that getAll() uses when it's not given one (whichever host
+# connected most recently, as with the real API)
+_default_context = None
+
+
+class APIContextException( Exception):
+    pass
+
+
+class CIMError( Exception):
+    '''
+    Stands in for pywbem's CIMError.  The args are an error code and a
+    description.
+    '''
+    pass
+
+
+class ReplayFinished( Exception):
+    '''
+    Raised by getAll() when the end of the capture file has been reached
+    '''
+    pass
+
+
+def configure( config):
+    '''
+    Reads the directory setting from the config file's replay section (a
+    ConfigParser object)
+    '''
+    global _directory
+    _directory = config.get('replay', 'directory')
+
+
+def APIConnect( uri, auth, **unused_kwargs):
+    '''
+    Opens the capture file for the host in uri and makes it the default
+    context.  Raises CIMError if there isn't one.
+    '''
+    global _default_context
+    host = uri.split( '://')[-1]
+    path = capture_path( _directory, host)
+    if not os.path.exists( path):
+        raise CIMError( 0, 'No capture file for %s (%s)'%(host, path))
+    _default_context = SFAReplayController( path)
+    return _default_context
+
+
+def sample_time( context = None):
+    return _get_context( context).sample_time
+
+
+def next_sample_time( context = None):
+    '''
+    Returns the time the data for the next fast poll was captured, or None
+    at the end of the capture file.  (Only the replay API has this.)
+    '''
+    return _get_context( context).peek_time()
+
+
+def _get_context( context):
+    if context is None:
+        context = _default_context
+    if context is None:
+        raise APIContextException( "Not connected")
+    return context
+
+
+class SFAReplayController(object):
+    '''
+    The replay state for one capture file (this is the 'context' object
+    returned by APIConnect())
+    '''
+
+    def __init__(self, path):
+        self._reader = SFACaptureReader( path)
+        self._ahead = collections.deque()  # records read, but not returned yet
+        self._latest = { }  # the newest record returned for each class
+        self._at_end = False
+        self.sample_time = None
+
+    def close(self):
+        self._reader.close()
+
+    def get(self, class_name):
+        '''
+        Returns the objects for a getAll() call on class_name
+        '''
+        if class_name == PACE_CLASS:
+            while True:
+                if not self._ahead and not self._read_ahead():
+                    raise ReplayFinished( "End of %s"%self._reader.path)
+                (timestamp, record_class, objects) = self._ahead.popleft()
+                if record_class == PACE_CLASS:
+                    self.sample_time = timestamp
+                    return objects
+                self._latest[record_class] = objects
+
+        # Use up any records of this class before the next pace record
+        self._fill_to_pace()
+        for record in list( self._ahead):
+            if record[1] == PACE_CLASS:
+                break
+            if record[1] == class_name:
+                self._ahead.remove( record)
+                self._latest[class_name] = record[2]
+        if class_name not in self._latest:
+            raise CIMError( 0, 'No %s data in %s'%(class_name, self._reader.path))
+        return self._latest[class_name]
+
+    def peek_time(self):
+        '''
+        Returns the time the next SFAVirtualDiskStatistics record was
+        captured, or None if there are no more
+        '''
+        self._fill_to_pace()
+        for record in self._ahead:
+            if record[1] == PACE_CLASS:
+                return record[0]
+        return None
+
+    def _fill_to_pace(self):
+        '''
+        Reads ahead until there's a pace record in _ahead (or the file ends)
+        '''
+        while not [ r for r in self._ahead if r[1] == PACE_CLASS ]:
+            if not self._read_ahead():
+                return
+
+    def _read_ahead(self):
+        if self._at_end:
+            return False
+        try:
+            self._ahead.append( self._reader.next())
+        except StopIteration:
+            self._at_end = True
+            return False
+        return True
+
+
+class SFAVirtualDiskStatistics(object):
+    @staticmethod
+    def getAll( context = None):
+        return _get_context( context).get( 'SFAVirtualDiskStatistics')
+
+
+class SFAPresentation(object):
+    @staticmethod
+    def getAll( context = None):
+        return _get_context( context).get( 'SFAPresentation')
+
+
+class SFAStoragePool(object):
+    @staticmethod
+    def getAll( context = None):
+        return _get_context( context).get( 'SFAStoragePool')
+
+
+class SFAVirtualDisk(object):
+    @staticmethod
+    def getAll( context = None):
+        return _get_context( context).get( 'SFAVirtualDisk')
+
+
+class SFAController(object):
+    @staticmethod
+    def getAll( context = None):
+        return _get_context( context).get( 'SFAController')
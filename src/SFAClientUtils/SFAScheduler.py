@@ -0,0 +1,168 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Fixed rate scheduling for the main loop.
+
+Ticks are at exact multiples of the interval from the time the scheduler
+is started (so they don't drift, no matter how long each iteration takes)
+and are measured with a monotonic clock (so they're not affected by NTP
+or someone changing the system time).
+'''
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import time
+
+# Late ticks are logged if they're later than this fraction of the interval
+LATE_TICK_FRACTION = 0.1
+
+
+class _timespec( ctypes.Structure):
+    _fields_ = [ ('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long) ]
+
+CLOCK_MONOTONIC = 1  # from <linux/time.h>
+
+
+def _make_monotonic_clock():
+    '''
+    Returns a function that reads a monotonic clock (in seconds).  Python 2
+    doesn't have time.monotonic(), so we call clock_gettime() through
+    ctypes.  If that's not possible, we fall back to time.time().
+    '''
+    if hasattr( time, 'monotonic'):
+        return time.monotonic
+
+    try:
+        librt = ctypes.CDLL( ctypes.util.find_library( 'rt') or 'librt.so.1',
+                             use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ ctypes.c_int, ctypes.POINTER( _timespec) ]
+    except (OSError, AttributeError):
+        logging.getLogger( 'DDNTool_SFAScheduler').warning(
+                "clock_gettime() isn't available.  Using time.time() for scheduling.")
+        return time.time
+
+    def monotonic():
+        ts = _timespec()
+        if clock_gettime( CLOCK_MONOTONIC, ctypes.pointer( ts)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError( errno, os.strerror( errno))
+        return ts.tv_sec + ts.tv_nsec * 1e-9
+
+    return monotonic
+
+monotonic = _make_monotonic_clock()
+
+
+class SFAScheduler(object):
+    '''
+    Sleeps until the next tick.  If a tick is missed completely (because the
+    previous iteration took longer than the interval), it's skipped rather
+    than run late, so the ticks stay on the grid.
+    '''
+
+    def __init__(self, interval, clock = monotonic, sleep = time.sleep):
+        self.logger = logging.getLogger( 'DDNTool_SFAScheduler')
+        self._interval = float(interval)
+        self._clock = clock
+        self._sleep = sleep
+        self._start = None
+        self._next_tick = 1
+
+        # Counters (see stats())
+        self._ticks = 0
+        self._late_ticks = 0
+        self._skipped_ticks = 0
+        self._max_lateness = 0.0
+
+    def start(self):
+        '''
+        Sets tick 0 to the current time.  (The first call to wait() returns
+        one interval from now.)
+        '''
+        self._start = self._clock()
+        self._next_tick = 1
+
+    def wait(self):
+        '''
+        Blocks until the next tick.  Returns how late (in seconds) we woke up.
+        '''
+        if self._start is None:
+            self.start()
+
+        now = self._clock()
+        deadline = self._start + self._next_tick * self._interval
+        if now >= deadline + self._interval:
+            # We've missed at least one whole interval.  Skip all the ticks
+            # that have passed and wait for the next one that's in the future.
+            skipped = int( (now - deadline) / self._interval) + 1
+            self._skipped_ticks += skipped
+            self._next_tick += skipped
+            deadline += skipped * self._interval
+            self.logger.warning( "Skipped %d tick(s).  (The last iteration took "
+                                 "too long.)"%skipped)
+
+        # Normally, this is a single sleep.  The loop is just in case we're
+        # woken early (by a signal, for example).
+        while now < deadline:
+            self._sleep( deadline - now)
+            now = self._clock()
+
+        lateness = now - deadline
+        self._ticks += 1
+        self._next_tick += 1
+        self._max_lateness = max( self._max_lateness, lateness)
+        if lateness > self._interval * LATE_TICK_FRACTION:
+            self._late_ticks += 1
+            self.logger.warning( "Tick was %.3f seconds late."%lateness)
+        return lateness
+
+    def wait_for_offset(self, offset):
+        '''
+        Blocks until offset seconds after the most recent tick.  (Returns
+        immediately if that time has already passed.)  Used to stagger work
+        across the interval.
+        '''
+        target = self._start + (self._next_tick - 1) * self._interval + offset
+        now = self._clock()
+        while now < target:
+            self._sleep( target - now)
+            now = self._clock()
+
+    def time_to_next_tick(self):
+        '''
+        Returns the number of seconds until the next tick (or 0 if we're
+        already past it)
+        '''
+        deadline = self._start + self._next_tick * self._interval
+        return max( 0.0, deadline - self._clock())
+
+    def stats(self):
+        '''
+        Returns a dictionary with the number of ticks, the number that were
+        late or skipped and the largest lateness (in seconds)
+        '''
+        return { 'ticks' : self._ticks,
+                 'late_ticks' : self._late_ticks,
+                 'skipped_ticks' : self._skipped_ticks,
+                 'max_lateness' : self._max_lateness }
@@ -0,0 +1,335 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+A simulated SFA controller.
+
+This module implements the parts of the ddn.sfa.api package that SFAClient
+uses (APIConnect(), APIContextException and the getAll() methods of
+SFAVirtualDiskStatistics, SFAPresentation, SFAStoragePool, SFAVirtualDisk
+and SFAController), so DDNTool can be run, tested and benchmarked without
+any DDN hardware.  Set 'api = simulator' in the config file's ddn_hardware
+section to use it.  The settings in the config file's simulator section
+(see configure()) control the size and behavior of the simulated
+controllers.
+
+Each simulated LUN has its own I/O rate, read/write mix and request size
+and latency mix (chosen at random when the controller is connected).  Every
+call to SFAVirtualDiskStatistics.getAll() advances the counters by the
+time since the previous call, so they always increase, just like the real
+ones.  That time comes from the clock passed to configure(), so with a
+virtual clock (see SFAClock.py) the counters advance in simulated time.
+'''
+
+import random
+import threading
+import time
+
+from SFAClock import REAL_CLOCK
+
+
+# The labels that real controllers report (SFAClient._check_labels()
+# verifies these)
+IO_SIZE_LABELS = [ 'IO Size <=4KiB', 'IO Size <=8KiB', 'IO Size <=16KiB',
+                   'IO Size <=32KiB', 'IO Size <=64KiB', 'IO Size <=128KiB',
+                   'IO Size <=256KiB', 'IO Size <=512KiB', 'IO Size <=1MiB',
+                   'IO Size <=2MiB', 'IO Size <=4MiB', 'IO Size >4MiB' ]
+IO_LATENCY_LABELS = [ 'Latency Counts <=16ms', 'Latency Counts <=32ms',
+                      'Latency Counts <=64ms', 'Latency Counts <=128ms',
+                      'Latency Counts <=256ms', 'Latency Counts <=512ms',
+                      'Latency Counts <=1s', 'Latency Counts <=2s',
+                      'Latency Counts <=4s', 'Latency Counts <=8s',
+                      'Latency Counts <=16s', 'Latency Counts >16s' ]
+
+# Approximate size (in KiB) of the requests in each size bucket.  Used to
+# turn request counts into KBytes counts.
+IO_SIZE_KIB = [ 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192 ]
+
+FW_RELEASE = '3.1.0.0'
+
+# PoolState for a pool that's working normally and the (arbitrary,
+# non-zero) state reported for the pools we simulate as degraded
+POOL_STATE_NORMAL = 0
+POOL_STATE_DEGRADED = 1
+
+# Defaults for the settings in the config file's simulator section
+SIMULATOR_DEFAULTS = { 'luns' : '32',             # LUNs per controller
+                       'iops' : '2000',           # average IOPS per LUN
+                       'latency_ms' : '5',        # time each getAll() takes
+                       'failure_rate' : '0.0',    # chance a getAll() fails
+                       'degraded_pools' : '0',    # pools reported as degraded
+                       'idle_luns' : '0',         # LUNs with no I/O at all
+                       'seed' : '0' }             # for the random numbers
+
+_settings = dict( [ (name, float(value)) for (name, value) in SIMULATOR_DEFAULTS.items() ])
+
+_clock = REAL_CLOCK
+
+# The context that getAll() uses when it's not given one.  (Like the real
+# API, that's whichever controller connected most recently.)
+_default_context = None
+
+
+class APIContextException( Exception):
+    pass
+
+
+class CIMError( Exception):
+    '''
+    Stands in for pywbem's CIMError.  The args are an error code and a
+    description.
+    '''
+    pass
+
+
+def configure( config, clock = None):
+    '''
+    Reads the settings in the simulator section of the config file (a
+    ConfigParser object).  Anything that's missing gets its default.
+    Controllers that are already connected aren't affected.
+
+    clock is the SFAClock object the simulated controllers get the time
+    from (the default is the real clock).  With a virtual clock, getAll()
+    doesn't wait for latency_ms.
+    '''
+    global _clock
+    _clock = clock or REAL_CLOCK
+    for name in SIMULATOR_DEFAULTS:
+        if config.has_option('simulator', name):
+            _settings[name] = config.getfloat('simulator', name)
+        else:
+            _settings[name] = float( SIMULATOR_DEFAULTS[name])
+
+
+def APIConnect( uri, auth, **unused_kwargs):
+    '''
+    'Connects' to a simulated controller and makes it the default context.
+    Any user name and password are accepted.
+    '''
+    global _default_context
+    _default_context = SFASimController( uri, _settings)
+    return _default_context
+
+
+def _get_context( context):
+    if context is None:
+        context = _default_context
+    if context is None:
+        raise APIContextException( "Not connected")
+    return context
+
+
+class _SimLun(object):
+    '''
+    The counters and workload for one LUN
+    '''
+    def __init__(self, rng, index, iops):
+        self.index = index
+        self.owner = index % 2  # which controller in the couplet owns it
+        self.iops = iops * rng.uniform( 0.2, 1.8)
+        self.read_fraction = rng.uniform( 0.2, 0.8)
+        self.forwarded_fraction = rng.uniform( 0.0, 0.05)
+        self.size_weights = [ rng.random() for unused_i in IO_SIZE_LABELS ]
+        self.latency_weights = [ 2.0 ** -i for i in range(len(IO_LATENCY_LABELS)) ]
+
+        self.read_ios = 0
+        self.write_ios = 0
+        self.forwarded_ios = 0
+        self.kbytes_read = 0
+        self.kbytes_written = 0
+        self.kbytes_forwarded = 0
+        self.read_size_buckets = [ 0 ] * len(IO_SIZE_LABELS)
+        self.write_size_buckets = [ 0 ] * len(IO_SIZE_LABELS)
+        self.read_latency_buckets = [ 0 ] * len(IO_LATENCY_LABELS)
+        self.write_latency_buckets = [ 0 ] * len(IO_LATENCY_LABELS)
+
+    def advance(self, rng, seconds):
+        '''
+        Adds seconds' worth of I/O (give or take 50%) to the counters
+        '''
+        ios = int( self.iops * seconds * rng.uniform( 0.5, 1.5))
+        reads = int( ios * self.read_fraction)
+        writes = ios - reads
+        self.read_ios += reads
+        self.write_ios += writes
+        forwarded = int( ios * self.forwarded_fraction)
+        self.forwarded_ios += forwarded
+
+        read_sizes = _distribute( rng, reads, self.size_weights)
+        write_sizes = _distribute( rng, writes, self.size_weights)
+        read_kib = sum( [ n * kib for (n, kib) in zip( read_sizes, IO_SIZE_KIB) ])
+        write_kib = sum( [ n * kib for (n, kib) in zip( write_sizes, IO_SIZE_KIB) ])
+        self.kbytes_read += read_kib
+        self.kbytes_written += write_kib
+        self.kbytes_forwarded += int( (read_kib + write_kib) * self.forwarded_fraction)
+        _add( self.read_size_buckets, read_sizes)
+        _add( self.write_size_buckets, write_sizes)
+        _add( self.read_latency_buckets, _distribute( rng, reads, self.latency_weights))
+        _add( self.write_latency_buckets, _distribute( rng, writes, self.latency_weights))
+
+    def couplet(self, value):
+        '''
+        Returns value as the 2 element list the API uses (one element per
+        controller in the couplet, with the other one 0)
+        '''
+        if self.owner == 0:
+            return [ value, 0 ]
+        return [ 0, value ]
+
+
+def _distribute( rng, total, weights):
+    '''
+    Splits total into len(weights) parts, roughly in proportion to the
+    weights
+    '''
+    weight_sum = float( sum( weights))
+    parts = [ int( total * w / weight_sum) for w in weights ]
+    # Hand out whatever's left over from the rounding
+    for unused_i in range( total - sum( parts)):
+        parts[ rng.randrange( len(parts))] += 1
+    return parts
+
+
+def _add( totals, values):
+    for i in range( len(totals)):
+        totals[i] += values[i]
+
+
+class _ApiObject(object):
+    '''
+    Base class for the objects returned by getAll().  They just have the
+    attributes that are passed to the constructor.
+    '''
+    def __init__(self, **kwargs):
+        self.__dict__.update( kwargs)
+
+
+class SFASimController(object):
+    '''
+    The state of one simulated controller (this is the 'context' object
+    returned by APIConnect())
+    '''
+
+    def __init__(self, uri, settings):
+        self.uri = uri
+        self._lock = threading.Lock()
+        self._rng = random.Random( '%d-%s'%(int(settings['seed']), uri))
+        self._latency = settings['latency_ms'] / 1000.0
+        self._failure_rate = settings['failure_rate']
+        idle_luns = int( settings['idle_luns'])
+        self._luns = [ _SimLun( self._rng, i, 0 if i < idle_luns else settings['iops'])
+                       for i in range( int(settings['luns'])) ]
+        self._degraded_pools = int( settings['degraded_pools'])
+        self._clock = _clock
+        self._last_update = self._clock.time()
+
+    def call(self, name):
+        '''
+        Simulates the round trip to the controller for one getAll() call:
+        waits for the configured latency and (sometimes) fails.
+        '''
+        if self._latency > 0 and not self._clock.virtual:
+            time.sleep( self._latency * self._rng.uniform( 0.5, 1.5))
+        if self._failure_rate > 0 and self._rng.random() < self._failure_rate:
+            raise CIMError( 0, 'Simulated failure in %s.getAll() on %s'%(name, self.uri))
+
+    def vd_statistics(self):
+        with self._lock:
+            now = self._clock.time()
+            elapsed = now - self._last_update
+            self._last_update = now
+            results = [ ]
+            for lun in self._luns:
+                lun.advance( self._rng, elapsed)
+                results.append( _ApiObject(
+                    Index = lun.index,
+                    ReadIOs = lun.couplet( lun.read_ios),
+                    WriteIOs = lun.couplet( lun.write_ios),
+                    TotalIOs = lun.couplet( lun.read_ios + lun.write_ios),
+                    ForwardedIOs = lun.couplet( lun.forwarded_ios),
+                    KBytesRead = lun.couplet( lun.kbytes_read),
+                    KBytesWritten = lun.couplet( lun.kbytes_written),
+                    KBytesTransferred = lun.couplet( lun.kbytes_read + lun.kbytes_written),
+                    KBytesForwarded = lun.couplet( lun.kbytes_forwarded),
+                    ReadIOSizeBuckets = list( lun.read_size_buckets),
+                    WriteIOSizeBuckets = list( lun.write_size_buckets),
+                    ReadIOLatencyBuckets = list( lun.read_latency_buckets),
+                    WriteIOLatencyBuckets = list( lun.write_latency_buckets),
+                    IOSizeIndexLabels = list( IO_SIZE_LABELS),
+                    IOLatencyIndexLabels = list( IO_LATENCY_LABELS)))
+            return results
+
+    def presentations(self):
+        return [ _ApiObject( VirtualDiskIndex = lun.index, LUN = lun.index)
+                 for lun in self._luns ]
+
+    def virtual_disks(self):
+        # One pool per virtual disk
+        return [ _ApiObject( Index = lun.index, PoolIndex = lun.index)
+                 for lun in self._luns ]
+
+    def storage_pools(self):
+        return [ _ApiObject( Index = lun.index,
+                             PoolState = POOL_STATE_DEGRADED if lun.index < self._degraded_pools
+                                                             else POOL_STATE_NORMAL)
+                 for lun in self._luns ]
+
+    def controllers(self):
+        return [ _ApiObject( Index = i, FWRelease = FW_RELEASE) for i in range(2) ]
+
+
+class SFAVirtualDiskStatistics(object):
+    @staticmethod
+    def getAll( context = None):
+        context = _get_context( context)
+        context.call( 'SFAVirtualDiskStatistics')
+        return context.vd_statistics()
+
+
+class SFAPresentation(object):
+    @staticmethod
+    def getAll( context = None):
+        context = _get_context( context)
+        context.call( 'SFAPresentation')
+        return context.presentations()
+
+
+class SFAStoragePool(object):
+    @staticmethod
+    def getAll( context = None):
+        context = _get_context( context)
+        context.call( 'SFAStoragePool')
+        return context.storage_pools()
+
+
+class SFAVirtualDisk(object):
+    @staticmethod
+    def getAll( context = None):
+        context = _get_context( context)
+        context.call( 'SFAVirtualDisk')
+        return context.virtual_disks()
+
+
+class SFAController(object):
+    @staticmethod
+    def getAll( context = None):
+        context = _get_context( context)
+        context.call( 'SFAController')
+        return context.controllers()
@@ -0,0 +1,250 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+An on-disk spool for data that couldn't be written to a database.
+
+The spool is a directory of append-only segment files.  Each record is a
+string (the database classes decide what goes in it) that's compressed
+with zlib and written with a 4 byte length header.  When the total size
+of the segments goes over the limit, the oldest segment is deleted.
+
+A record is only removed from the spool after it's been sent successfully,
+so a crash while replaying may send a few records twice.  That's harmless
+for us: the SQL tables are written with REPLACE or ON DUPLICATE KEY UPDATE
+and InfluxDB just overwrites a point with the same series and timestamp.
+'''
+
+import logging
+import os
+import struct
+import time
+import zlib
+
+SEGMENT_SUFFIX = '.spool'
+RECORD_HEADER = struct.Struct( '!I')  # length of the compressed record
+
+
+class SFASpool(object):
+    '''
+    Sends records to a database with a function supplied by the database
+    object and spools them to disk when the database can't be reached.
+
+    Once anything has been spooled, new records are spooled too (so that
+    they're written in the order they were created) until the spool has
+    been emptied.  After a failure, we wait retry_interval seconds before
+    trying the database again and then replay at most replay_records
+    records per call to write().
+    '''
+
+    def __init__(self, directory, max_bytes, segment_bytes, replay_records,
+                 retry_interval):
+        '''
+        Sizes are in bytes and retry_interval is in seconds.  Each spool
+        must have its own directory.
+        '''
+        self.logger = logging.getLogger( 'DDNTool_SFASpool')
+        self._directory = directory
+        self._send = None
+        self._retryable_errors = ()
+        self._encode = str
+        self._decode = str
+        self._max_bytes = max_bytes
+        self._segment_bytes = segment_bytes
+        self._replay_records = replay_records
+        self._retry_interval = retry_interval
+
+        if not os.path.isdir( directory):
+            os.makedirs( directory)
+
+        # Segment files are named with an increasing sequence number.  Any
+        # that are left over from a previous run are replayed.
+        self._segments = sorted( [ int(name[:-len(SEGMENT_SUFFIX)])
+                                   for name in os.listdir( directory)
+                                   if name.endswith( SEGMENT_SUFFIX) ])
+        self._total_bytes = sum( [ os.path.getsize( self._segment_path( seq))
+                                   for seq in self._segments ])
+        if self._segments:
+            self.logger.warning( "Found %d bytes of spooled data in %s"% \
+                                 (self._total_bytes, directory))
+
+        self._write_file = None     # open file for the newest segment
+        self._read_offset = 0       # position of the next record in the oldest segment
+        self._next_attempt = 0      # when we can next try the database
+        self._records_dropped = 0
+
+    def attach(self, send, retryable_errors, encode = str, decode = str):
+        '''
+        Called by the database object that owns the spool.  send is the
+        function that writes one item to the database.  retryable_errors
+        is a tuple of the exception types that mean the database is
+        unavailable.  Any other exception is passed on to the caller of
+        write() (and the item is *not* spooled), except when a spooled item
+        is being replayed: then the item is logged and dropped so that it
+        doesn't block the rest of the spool.  encode and decode convert
+        an item to and from the string that's stored in the spool.
+        '''
+        self._send = send
+        self._retryable_errors = retryable_errors
+        self._encode = encode
+        self._decode = decode
+
+    def write(self, item):
+        '''
+        Sends the item to the database or, if that's not possible right
+        now, appends it to the spool
+        '''
+        if not self._segments:
+            if time.time() >= self._next_attempt:
+                try:
+                    self._send( item)
+                    return
+                except self._retryable_errors, e:
+                    self._send_failed( e)
+            self._append( self._encode( item))
+            return
+
+        # Keep everything in order: the new item goes on the end of the
+        # spool and we replay from the front
+        self._append( self._encode( item))
+        if time.time() >= self._next_attempt:
+            self._replay()
+
+    def has_records(self):
+        return len(self._segments) > 0
+
+    def _send_failed(self, e):
+        self.logger.warning( "Database write failed (%s: %s).  Spooling to %s "
+                             "and retrying in %d seconds."% \
+                             (type(e).__name__, e, self._directory,
+                              self._retry_interval))
+        self._next_attempt = time.time() + self._retry_interval
+
+    def _replay(self):
+        '''
+        Send up to _replay_records records from the front of the spool
+        '''
+        sent = 0
+        while sent < self._replay_records and self._segments:
+            seq = self._segments[0]
+            if seq == self._segments[-1]:
+                # We're about to read from the segment we're writing to.
+                # Close it so any new records go into a new one.
+                self._close_write_file()
+
+            segment_done = False
+            seg_file = open( self._segment_path( seq), 'rb')
+            try:
+                seg_file.seek( self._read_offset)
+                while sent < self._replay_records:
+                    record = self._read_record( seg_file)
+                    if record is None:
+                        segment_done = True
+                        break
+                    try:
+                        self._send( self._decode( record))
+                    except self._retryable_errors, e:
+                        self._send_failed( e)
+                        return
+                    except Exception, e:
+                        # The database will never accept this record, so
+                        # retrying it would just fail the same way every
+                        # time.  Skip it.
+                        self._records_dropped += 1
+                        self.logger.error( "Dropping a spooled record from %s that "
+                                           "can't be written (%s: %s).  %d records "
+                                           "dropped so far."% \
+                                           (self._directory, type(e).__name__, e,
+                                            self._records_dropped))
+                    sent += 1
+                    self._read_offset = seg_file.tell()
+            finally:
+                seg_file.close()
+
+            if segment_done:
+                self._remove_oldest_segment()
+
+        if not self._segments:
+            self.logger.info( "Spool %s has been emptied."%self._directory)
+
+    def _append(self, record):
+        data = zlib.compress( record)
+        if self._write_file is None or self._write_file.tell() >= self._segment_bytes:
+            self._close_write_file()
+            seq = self._segments[-1] + 1 if self._segments else 0
+            self._segments.append( seq)
+            self._write_file = open( self._segment_path( seq), 'ab')
+        self._write_file.write( RECORD_HEADER.pack( len(data)))
+        self._write_file.write( data)
+        self._write_file.flush()
+        self._total_bytes += RECORD_HEADER.size + len(data)
+
+        # Throw away the oldest data if we're over the limit (but never the
+        # segment we're writing to)
+        while self._total_bytes > self._max_bytes and len(self._segments) > 1:
+            self._records_dropped += self._remove_oldest_segment()
+            self.logger.warning( "Spool %s is full.  Oldest data discarded "
+                                 "(%d records dropped so far)."% \
+                                 (self._directory, self._records_dropped))
+
+    def _read_record(self, seg_file):
+        '''
+        Returns the next record from the file, or None at the end.  (A
+        record that was only partly written, because we crashed in the
+        middle of _append(), is treated as the end of the file.)
+        '''
+        header = seg_file.read( RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return None
+        (length,) = RECORD_HEADER.unpack( header)
+        data = seg_file.read( length)
+        if len(data) < length:
+            return None
+        return zlib.decompress( data)
+
+    def _remove_oldest_segment(self):
+        '''
+        Deletes the oldest segment file.  Returns the number of records in
+        it that hadn't been sent.
+        '''
+        seq = self._segments.pop( 0)
+        if not self._segments:
+            self._close_write_file()
+        path = self._segment_path( seq)
+        seg_file = open( path, 'rb')
+        try:
+            seg_file.seek( self._read_offset)
+            unsent = 0
+            while self._read_record( seg_file) is not None:
+                unsent += 1
+        finally:
+            seg_file.close()
+        self._total_bytes -= os.path.getsize( path)
+        os.remove( path)
+        self._read_offset = 0
+        return unsent
+
+    def _close_write_file(self):
+        if self._write_file is not None:
+            self._write_file.close()
+            self._write_file = None
+
+    def _segment_path(self, seq):
+        return os.path.join( self._directory, '%012d%s'%(seq, SEGMENT_SUFFIX))
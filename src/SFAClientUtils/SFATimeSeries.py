@@ -19,6 +19,8 @@
 # A PARTICULAR PURPOSE.
 
 
+from array import array
+from bisect import bisect_left
 import time
 
 class EmptyTimeSeriesException(Exception):
@@ -41,18 +43,33 @@ class SFATimeSeries( object):
     look at all the values in between.
     
     In truth, if we knew in advance what time spans we'll want to calculate averages
-    for, we wouldn't have to keep all the values in between...
+    for, we wouldn't have to keep all the values in between...  So, callers can
+    register those spans when creating the series.  For each registered span, we
+    keep an 'anchor' that points at the item closest to 'span' seconds before the
+    newest item and that moves forward as items are appended.  Averages over a
+    registered span don't need a search at all.  (Averages over other spans still
+    work; they just fall back to the binary search.)  max_size then only needs to
+    be large enough to cover the longest registered span.
+
+    Internally, the values and their timestamps are kept in two parallel arrays
+    of doubles.  If max_size is set, the arrays are allocated once and used as a
+    circular buffer, so appending never has to copy or shift the older values.
+
+    clock is the function that append() calls for the time of each value
+    (time.time() by default - see SFAClock.py).
     '''
     
-    def __init__(self, max_size = None):
-        self._series = []
+    def __init__(self, max_size = None, spans = None, clock = None):
         self._max_size = max_size
+        self._spans = list(spans or [])
+        self._clock = clock or time.time
+        self.flush()
     
     def size(self):
         '''
         Returns the number of items in the series
         '''
-        return len(self._series)
+        return self._count
     
     def get(self, item_num):
         '''
@@ -60,13 +77,32 @@ class SFATimeSeries( object):
         
         Throws an IndexError if item_num is out of range
         '''
-        return self._series[item_num]
+        if item_num < 0:
+            item_num += self._count
+        if item_num < 0 or item_num >= self._count:
+            raise IndexError( "SFATimeSeries index out of range")
+        pos = self._position( item_num)
+        return (self._values[pos], self._times[pos])
     
     def flush(self):
         '''
         Delete all the values from the series
         '''
-        self._series = []
+        if self._max_size:
+            self._values = array( 'd', [0.0]) * self._max_size
+            self._times = array( 'd', [0.0]) * self._max_size
+        else:
+            self._values = array( 'd')
+            self._times = array( 'd')
+        self._start = 0   # physical index of the oldest item
+        self._count = 0
+        self._total = 0   # number of items ever appended (since the last flush)
+        
+        # Maps each registered span to the sequence number (ie: the value of
+        # _total when it was appended) of its anchor item
+        self._anchors = {}
+        for span in self._spans:
+            self._anchors[span] = 0
     
     def average(self, span):
         '''
@@ -80,63 +116,156 @@ class SFATimeSeries( object):
         '''
        
         # Sanity check - we need at least to values to compute a meaningful average
-        if len(self._series) < 2:
+        if self._count < 2:
             raise EmptyTimeSeriesException()
 
         # Normal case: find the value who's time stamp is closest to what we want
         # and compute the average using it and the most recent value
-        last_index = len(self._series) - 1
-        first_index = self._binary_search( self._series[last_index][1] - span)
-        
-        # Sanity check:  If we were called with a very small span value, the binary search
-        # function could return last_index as the best choice.  If first_index == last_index
-        # though, we'd get a divide-by-zero error.
-        if first_index == last_index:
-            first_index = last_index - 1
+        last_index = self._count - 1
+        last_pos = self._position( last_index)
+        first_pos = self._position( self._first_index( span))
               
-        average = ((self._series[last_index][0] - self._series[first_index][0]) /
-                   (self._series[last_index][1] - self._series[first_index][1]))
+        actual_span = self._times[last_pos] - self._times[first_pos]
+        if actual_span <= 0:
+            # Only possible with a virtual clock (see SFAClock.py), where
+            # several samples can be taken without any time passing
+            raise EmptyTimeSeriesException()
+        average = (self._values[last_pos] - self._values[first_pos]) / actual_span
         average = abs( average)
-        return (average, self._series[last_index][1] - self._series[first_index][1]) 
+        return (average, actual_span) 
     
-    def append(self, value):
+    def append(self, value, timestamp = None):
         '''
         Adds one value to the time series and - if the max size has been
         exceeded - drops the oldest value.
+
+        The value's time is the clock's current time, unless timestamp (in
+        seconds since the epoch) is given.  Timestamps must never go
+        backwards.
         '''
         
-        self._series.append((value, time.time()))
-        
-        # Remove any values that are too old
-        if ( self._max_size and (len(self._series) > self._max_size)):
-            self._series = self._series[len(self._series) - self._max_size:]
+        if timestamp is None:
+            timestamp = self._clock()
+        pos = self._next_position( timestamp)
+        if self._max_size:
+            self._values[pos] = value
+        else:
+            self._values.append( value)
                             
+    
+    def _first_index(self, span):
+        '''
+        Returns the (logical) index of the item whose time is closest to
+        'span' seconds before the newest item.  Never returns the index of
+        the newest item itself.  Assumes there are at least 2 items.
+        '''
+        last_index = self._count - 1
+        if span in self._anchors:
+            first_index = self._anchors[span] - (self._total - self._count)
+        else:
+            first_index = self._binary_search(
+                    self._times[self._position( last_index)] - span)
+        
+        # Sanity check:  If we were called with a very small span value, the search
+        # could return last_index as the best choice.  If first_index == last_index
+        # though, we'd get a divide-by-zero error.
+        if first_index == last_index:
+            first_index = last_index - 1
+        return first_index
+    
+    def _next_position(self, timestamp):
+        '''
+        Records timestamp as the time of a new item and returns the index in
+        the underlying arrays where that item's value(s) should be stored.  If
+        the buffer is full, the oldest item is dropped.
+        
+        For unbounded series, the timestamp array grows by one and the caller
+        is expected to append to its value array(s).
+        '''
+        if not self._max_size:
+            self._times.append( timestamp)
+            self._count += 1
+            pos = self._count - 1
+        elif self._count < self._max_size:
+            pos = self._start + self._count
+            if pos >= self._max_size:
+                pos -= self._max_size
+            self._count += 1
+        else:
+            # Buffer is full: overwrite the oldest item
+            pos = self._start
+            self._start += 1
+            if self._start == self._max_size:
+                self._start = 0
+        if self._max_size:
+            self._times[pos] = timestamp
+        self._total += 1
+        
+        if self._anchors:
+            self._advance_anchors( timestamp)
+        return pos
+    
+    def _advance_anchors(self, newest_time):
+        '''
+        Moves each anchor forward to the item closest to 'span' seconds before
+        newest_time.  (Picks the same item that _binary_search() would.)
+        
+        Since both the item times and the target times only ever increase,
+        anchors only move forward and each one moves about one item per
+        append.
+        '''
+        oldest_seq = self._total - self._count
+        newest_seq = self._total - 1
+        for span in self._spans:
+            target = newest_time - span
+            seq = max( self._anchors[span], oldest_seq)
+            this_time = self._times[self._position( seq - oldest_seq)]
+            while seq < newest_seq:
+                next_time = self._times[self._position( seq + 1 - oldest_seq)]
+                if next_time <= target or (target - this_time) >= (next_time - target):
+                    seq += 1
+                    this_time = next_time
+                else:
+                    break
+            self._anchors[span] = seq
+    
+    def _position(self, item_num):
+        '''
+        Maps a logical index (0 is the oldest item) to its index in the
+        underlying arrays.  Doesn't do any range checking.
+        '''
+        pos = self._start + item_num
+        if self._max_size and pos >= self._max_size:
+            pos -= self._max_size
+        return pos
         
     def _binary_search(self, timeval):
         '''
-        Search the data series and return the (value, time) tuple that is
-        closest to the requested time.
-        '''
-        # Can't use the standard bisect module because we have a series
-        # of tuples, not individual values...
-        min_index = 0;
-        max_index = len(self._series) - 1
-        # loop until we've narrowed it down to the two indexes that bracket our desired time value
-        while (max_index - min_index) > 1:
-            m = (min_index + max_index) / 2
-            if self._series[m][1] < timeval:
-                min_index = m
-            elif self._series[m][1] > timeval:
-                max_index = m
-            else:  
-                # we found an exact match for the time value
-                # this will almost never happen...
-                return m
+        Search the data series and return the (logical) index of the item
+        whose time is closest to the requested time.
+        '''
+        # Once the circular buffer has wrapped, the timestamp array holds two
+        # sorted runs: [_start, _max_size) followed by [0, _start).  Figure out
+        # which run timeval falls in and bisect just that part of the array.
+        if self._start > 0 and timeval >= self._times[0]:
+            pos = bisect_left( self._times, timeval, 0, self._start)
+            index = pos + (self._max_size - self._start)
+        else:
+            end = min( self._start + self._count, len(self._times))
+            pos = bisect_left( self._times, timeval, self._start, end)
+            index = pos - self._start
+        # index is now the first item whose time is >= timeval
+        
+        if index == 0:
+            return 0
+        if index == self._count:
+            return self._count - 1
         
         # now pick the index with the closer time value
-        if (timeval - self._series[min_index][1]) < (self._series[max_index][1] - timeval):
-            return min_index
+        before = self._times[self._position( index - 1)]
+        after = self._times[self._position( index)]
+        if (timeval - before) < (after - timeval):
+            return index - 1
         else:
-            return max_index
+            return index
         
-    
@@ -0,0 +1,163 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+
+from array import array
+from operator import sub
+
+from SFATimeSeries import SFATimeSeries
+from SFATimeSeries import EmptyTimeSeriesException
+
+
+class SFATimeSeriesMatrix( SFATimeSeries):
+    '''
+    Holds several sets of time series that are all sampled at the same moment
+    (specifically, the per-LUN counters we get back from one call to
+    SFAVirtualDiskStatistics.getAll()).
+    
+    Instead of one SFATimeSeries object per metric per LUN, we keep one
+    circular buffer per metric where each row is one sample (tick) and each
+    column is one device (LUN).  All the metrics share a single timestamp
+    column, so computing the averages for every device and every metric only
+    needs one search through the timestamps and then a subtraction of two
+    rows per metric.
+    
+    Columns are fixed when the object is created.  The rows are stored in flat
+    arrays of doubles (row-major), so max_size is required.  As with
+    SFATimeSeries, spans that will be averaged over can be registered up front
+    so that average() doesn't need to search the timestamps.
+    '''
+    
+    def __init__(self, metrics, columns, max_size, spans = None, clock = None):
+        if not max_size:
+            raise ValueError( "SFATimeSeriesMatrix requires a max_size")
+        
+        self._metrics = list(metrics)
+        self._columns = list(columns)
+        self._width = len(self._columns)
+        
+        # maps a device number to its column index
+        self.column_index = {}
+        for i in range(self._width):
+            self.column_index[self._columns[i]] = i
+        
+        SFATimeSeries.__init__(self, max_size, spans, clock)
+        
+    def columns(self):
+        '''
+        Returns the list of device numbers in column order
+        '''
+        return list(self._columns)
+    
+    def get(self, item_num):
+        '''
+        Returns a tuple of (rows, timestamp) for the requested item.  rows is
+        a dictionary that maps each metric name to a list of values (one per
+        column).
+        
+        Throws an IndexError if item_num is out of range
+        '''
+        if item_num < 0:
+            item_num += self._count
+        if item_num < 0 or item_num >= self._count:
+            raise IndexError( "SFATimeSeriesMatrix index out of range")
+        pos = self._position( item_num)
+        rows = {}
+        for metric in self._metrics:
+            rows[metric] = self._row( metric, pos).tolist()
+        return (rows, self._times[pos])
+    
+    def flush(self):
+        '''
+        Delete all the values from the series
+        '''
+        SFATimeSeries.flush(self)
+        self._data = {}
+        for metric in self._metrics:
+            self._data[metric] = array( 'd', [0.0]) * (self._max_size * self._width)
+    
+    def latest(self, metric):
+        '''
+        Returns a copy of the most recent row for the specified metric as an
+        array of doubles.  If the series is empty, the row is all zeros.
+        
+        This is mostly useful for building up the next row to append: any
+        columns that don't get a new value will just repeat the previous one.
+        '''
+        if self._count == 0:
+            return array( 'd', [0.0]) * self._width
+        return self._row( metric, self._position( self._count - 1))
+    
+    def append(self, rows, timestamp = None):
+        '''
+        Adds one sample to every metric.  rows is a dictionary that maps
+        each metric name to a sequence of values in column order.  If the
+        max size has been exceeded, the oldest sample is dropped.  As with
+        SFATimeSeries.append(), the sample's time is the clock's current
+        time unless timestamp is given.
+        '''
+        for metric in self._metrics:
+            if len(rows[metric]) != self._width:
+                raise ValueError( "Row for '%s' has %d values, expected %d"% \
+                                  (metric, len(rows[metric]), self._width))
+        
+        if timestamp is None:
+            timestamp = self._clock()
+        pos = self._next_position( timestamp)
+        start = pos * self._width
+        for metric in self._metrics:
+            row = rows[metric]
+            if not isinstance( row, array):
+                row = array( 'd', row)
+            self._data[metric][start:start + self._width] = row
+    
+    def average(self, span):
+        '''
+        Computes the average value over the last 'span' seconds for every
+        metric and every column.
+        
+        Returns a tuple of a dictionary (mapping each metric name to a list
+        of averages in column order) and the actual span of seconds that the
+        averages covered.  See SFATimeSeries.average() for more details.
+        '''
+        if self._count < 2:
+            raise EmptyTimeSeriesException()
+        
+        last_pos = self._position( self._count - 1)
+        first_pos = self._position( self._first_index( span))
+        
+        actual_span = self._times[last_pos] - self._times[first_pos]
+        if actual_span <= 0:
+            raise EmptyTimeSeriesException()  # see SFATimeSeries.average()
+        averages = {}
+        for metric in self._metrics:
+            diffs = map( sub, self._row( metric, last_pos),
+                              self._row( metric, first_pos))
+            averages[metric] = [ abs(d) / actual_span for d in diffs ]
+        return (averages, actual_span)
+    
+    def _row(self, metric, pos):
+        '''
+        Returns a copy of the row stored at the specified position in the
+        underlying array (as an array of doubles)
+        '''
+        start = pos * self._width
+        return self._data[metric][start:start + self._width]
+
@@ -0,0 +1,462 @@
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Code for getting database writes out of the polling loop.
+
+SFAClient doesn't call the database objects directly.  Instead, each
+iteration of its main loop builds a 'batch': a list of write operations,
+each of which is a tuple of (sink name, method name, args).  The sink name
+is a key into a dictionary of output objects (currently 'sqldb' for the
+SFAMySqlDb object and 'tsdb' for the SFAInfluxDb object) and the method is
+called on that object with the args.  For example:
+    ('sqldb', 'update_lun_table_multi', (rows,))
+
+Batches can be executed right away with execute_batch(), or handed to an
+SFABackgroundWriter so that a slow database doesn't hold up the polling.
+
+Alternatively, all the controllers' batches can be sent to a single
+process running an SFACentralWriter.  It merges the batches for each poll
+(from all the controllers) together so that each table or measurement gets
+one large write instead of lots of small ones.
+'''
+
+import logging
+import os
+import Queue
+import sys
+import threading
+
+import SFAMySqlDb
+import SFAInfluxDb
+from SFASpool import SFASpool
+from SFAMetrics import SFAMetrics
+
+
+# Valid values for the overflow_policy parameter
+OVERFLOW_POLICIES = [ 'block', 'drop_oldest', 'drop_newest' ]
+
+# Valid values for the mode setting in the config file's writer section
+WRITER_MODES = [ 'local', 'central' ]
+
+# Defaults for the optional settings in the config file's spool section
+SPOOL_DEFAULTS = { 'max_mb' : '256', 'segment_mb' : '8',
+                   'replay_records' : '50', 'retry_interval' : '30' }
+
+
+def open_sinks( config, init = False, spool_name = None):
+    '''
+    Opens connections to the output database(s) listed in the config file
+    (which must already have been read by the ConfigParser object that's
+    passed in).  Returns a dictionary that maps the sink names ('sqldb'
+    and/or 'tsdb') to the database objects.  If init is True, the databases
+    are initialized (their tables or measurements are dropped and created
+    from scratch).
+
+    If the config file has a spool section and spool_name is given, each
+    database gets an SFASpool in <spool directory>/<spool_name>/<sink name>.
+    (Every process must use a different spool_name.)
+    '''
+    sinks = { }
+    if config.has_section('SqlDb'):
+        sinks['sqldb'] = SFAMySqlDb.SFAMySqlDb( config.get('SqlDb', 'user'),
+                                                config.get('SqlDb', 'password'),
+                                                config.get('SqlDb', 'host'),
+                                                config.get('SqlDb', 'name'), init,
+                                                _open_spool( config, spool_name, 'sqldb'))
+    elif config.has_section('database'):
+        # Note: the database section is deprecated.  SFAClient logs a warning
+        # about it, so we don't bother here.
+        sinks['sqldb'] = SFAMySqlDb.SFAMySqlDb( config.get('database', 'db_user'),
+                                                config.get('database', 'db_password'),
+                                                config.get('database', 'db_host'),
+                                                config.get('database', 'db_name'), init,
+                                                _open_spool( config, spool_name, 'sqldb'))
+
+    if config.has_section('TSDb'):
+        # Optional settings for the requests sent to InfluxDB
+        tsdb_options = { }
+        if config.has_option('TSDb', 'gzip'):
+            tsdb_options['gzip'] = config.getboolean('TSDb', 'gzip')
+        if config.has_option('TSDb', 'max_points'):
+            tsdb_options['max_points'] = config.getint('TSDb', 'max_points')
+        if config.has_option('TSDb', 'precision'):
+            tsdb_options['precision'] = config.get('TSDb', 'precision')
+        if config.has_option('TSDb', 'histogram_schema'):
+            tsdb_options['histogram_schema'] = config.get('TSDb', 'histogram_schema')
+        sinks['tsdb'] = SFAInfluxDb.SFAInfluxDb( config.get('TSDb', 'user'),
+                                                 config.get('TSDb', 'password'),
+                                                 config.get('TSDb', 'host'),
+                                                 config.get('TSDb', 'name'), init,
+                                                 spool = _open_spool( config, spool_name, 'tsdb'),
+                                                 **tsdb_options)
+    return sinks
+
+
+def _open_spool( config, spool_name, sink_name):
+    '''
+    Returns the SFASpool for one sink (or None if spooling isn't configured)
+    '''
+    if spool_name is None or not config.has_option('spool', 'directory'):
+        return None
+
+    def get_option( name):
+        if config.has_option('spool', name):
+            return config.getfloat('spool', name)
+        return float( SPOOL_DEFAULTS[name])
+
+    directory = os.path.join( config.get('spool', 'directory'), spool_name, sink_name)
+    return SFASpool( directory,
+                     int( get_option( 'max_mb') * 1024 * 1024),
+                     int( get_option( 'segment_mb') * 1024 * 1024),
+                     int( get_option( 'replay_records')),
+                     get_option( 'retry_interval'))
+
+
+def writer_mode( config):
+    '''
+    Returns the mode setting from the config file's writer section ('local'
+    if it's not set)
+    '''
+    if not config.has_option('writer', 'mode'):
+        return 'local'
+    mode = config.get('writer', 'mode')
+    if mode not in WRITER_MODES:
+        raise ValueError( "Invalid mode '%s' in the writer section.  Must be one of: %s"% \
+                          (mode, ", ".join(WRITER_MODES)))
+    return mode
+
+
+def open_metrics( config):
+    '''
+    Returns a tuple of an SFAMetrics object and the number of fast polls
+    between publishing its timings, based on the config file's metrics
+    section.  (The metrics are disabled if there's no such section.  The
+    default publishing rate is the medium poll rate.)
+    '''
+    enabled = config.has_option('metrics', 'enabled') and \
+              config.getboolean('metrics', 'enabled')
+    if config.has_option('metrics', 'publish_multiple'):
+        publish_multiple = config.getint('metrics', 'publish_multiple')
+    else:
+        publish_multiple = config.getint('polling', 'med_poll_multiple')
+    if publish_multiple < 1:
+        raise ValueError( "publish_multiple in the metrics section must be at "
+                          "least 1 (got %d)"%publish_multiple)
+    return (SFAMetrics( enabled), publish_multiple)
+
+
+def execute_batch( sinks, batch, metrics = None):
+    '''
+    Executes all the write operations in the batch, in order.  sinks is a
+    dictionary mapping the sink names to the actual database objects.  If
+    metrics (an SFAMetrics object) is given, each operation is timed as
+    the phase 'write.<sink name>.<method name>'.
+    '''
+    for (sink_name, method_name, args) in batch:
+        if metrics is None:
+            getattr( sinks[sink_name], method_name)( *args)
+        else:
+            with metrics.timer( 'write.%s.%s'%(sink_name, method_name)):
+                getattr( sinks[sink_name], method_name)( *args)
+
+
+def metrics_batch( metrics, sink_names, host_name, update_time):
+    '''
+    Returns a batch of write operations that publishes the summary of an
+    SFAMetrics object (see SFAMetrics.summarize()) to each of the named
+    sinks.  Returns an empty list if nothing's been recorded.
+    '''
+    rows = [ (host_name, update_time) + summary for summary in metrics.summarize() ]
+    batch = [ ]
+    if not rows:
+        return batch
+    if 'sqldb' in sink_names:
+        batch.append( ('sqldb', 'update_internal_metrics_table_multi', (rows,)))
+    if 'tsdb' in sink_names:
+        batch.append( ('tsdb', 'update_internal_metrics_multi', (rows,)))
+        batch.append( ('tsdb', 'flush_to_db', ()))
+    return batch
+
+
+def merge_batches( batches):
+    '''
+    Combines several batches (normally from different controllers for the
+    same poll) into one.  Operations on methods whose names end in '_multi'
+    take a list of rows as their last argument.  If the other arguments
+    match, the rows are all concatenated into a single operation.  The
+    'flush_to_db' operations are dropped and a single flush for each sink
+    that needs one is put at the very end.  Anything else is kept as is.
+    '''
+    merged = [ ]
+    multi_ops = { }  # maps (sink, method, leading args) to the merged op's row list
+    flush_sinks = [ ]
+    for batch in batches:
+        for (sink_name, method_name, args) in batch:
+            if method_name == 'flush_to_db':
+                if sink_name not in flush_sinks:
+                    flush_sinks.append( sink_name)
+            elif method_name.endswith( '_multi'):
+                key = (sink_name, method_name, args[:-1])
+                if key in multi_ops:
+                    multi_ops[key].extend( args[-1])
+                else:
+                    rows = list( args[-1])
+                    multi_ops[key] = rows
+                    merged.append( (sink_name, method_name, args[:-1] + (rows,)))
+            else:
+                merged.append( (sink_name, method_name, args))
+
+    for sink_name in flush_sinks:
+        merged.append( (sink_name, 'flush_to_db', ()))
+    return merged
+
+
+class SFABackgroundWriter( threading.Thread):
+    '''
+    A thread that executes batches of write operations that are handed to
+    it through a bounded queue.
+
+    If the queue is full when a new batch is submitted, what happens depends
+    on the overflow policy:
+      block       : wait until there's room (ie: behave like the old, serial code)
+      drop_oldest : throw away the oldest queued batch to make room
+      drop_newest : throw away the new batch
+
+    Any exception thrown while executing a batch stops the thread.  The
+    exception is then re-raised from the next call to submit(), so the
+    owner sees it just as if it had made the database calls itself.
+    '''
+
+    def __init__(self, sinks, queue_size, overflow_policy, name, metrics = None):
+        '''
+        sinks is a dictionary mapping the sink names to the database objects.
+        Once the thread is started, only it should use those objects.
+        metrics is an optional SFAMetrics object for timing the writes.
+        '''
+        threading.Thread.__init__(self, name=name)
+        self.daemon = True
+
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError( "Invalid overflow policy '%s'.  Must be one of: %s"% \
+                              (overflow_policy, ", ".join(OVERFLOW_POLICIES)))
+
+        self.logger = logging.getLogger( 'DDNTool_SFABackgroundWriter')
+        self._sinks = sinks
+        self._queue = Queue.Queue( queue_size)
+        self._overflow_policy = overflow_policy
+        self._metrics = metrics
+        self._exc_info = None   # sys.exc_info() for the exception that stopped the thread
+
+        # Counters (see stats())
+        self._max_queue_depth = 0
+        self._batches_written = 0
+        self._batches_dropped = 0
+
+    def submit(self, batch):
+        '''
+        Queue a batch of write operations.  Returns True if the batch was
+        queued, False if it was dropped.
+        '''
+        self._check_error()
+
+        if self._overflow_policy == 'block':
+            while True:
+                try:
+                    self._queue.put( batch, True, 1.0)
+                    break
+                except Queue.Full:
+                    # Make sure we're not waiting on a thread that's died
+                    self._check_error()
+        elif self._overflow_policy == 'drop_newest':
+            try:
+                self._queue.put_nowait( batch)
+            except Queue.Full:
+                self._batches_dropped += 1
+                self.logger.warning( "Write queue full.  Dropping newest batch.")
+                return False
+        else:  # drop_oldest
+            while True:
+                try:
+                    self._queue.put_nowait( batch)
+                    break
+                except Queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self._queue.task_done()
+                        self._batches_dropped += 1
+                        self.logger.warning( "Write queue full.  Dropping oldest batch.")
+                    except Queue.Empty:
+                        pass  # writer thread just emptied a slot - try again
+
+        self._max_queue_depth = max( self._max_queue_depth, self._queue.qsize())
+        return True
+
+    def _check_error(self):
+        '''
+        Re-raises the exception that stopped the writer thread (if any),
+        with the thread's traceback
+        '''
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+
+    def stop(self):
+        '''
+        Finish writing whatever's in the queue, then stop the thread.
+        (Blocks until the thread exits.)
+        '''
+        if self.is_alive():
+            self._queue.put( None)  # None is the signal to exit
+            self.join()
+
+    def stats(self):
+        '''
+        Returns a dictionary of the writer's counters: the current queue
+        depth, the largest queue depth seen, and the number of batches that
+        have been written and dropped.
+        '''
+        return { 'queue_depth' : self._queue.qsize(),
+                 'max_queue_depth' : self._max_queue_depth,
+                 'batches_written' : self._batches_written,
+                 'batches_dropped' : self._batches_dropped }
+
+    def run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    break
+                execute_batch( self._sinks, batch, self._metrics)
+                self._batches_written += 1
+            except Exception, e:
+                self.logger.exception( "Background writer caught %s exception."% \
+                                       type(e).__name__)
+                self._exc_info = sys.exc_info()
+                break
+            finally:
+                self._queue.task_done()
+
+
+class SFACentralWriter(object):
+    '''
+    Receives the batches of write operations from all the controllers'
+    processes through a multiprocessing.Queue.  Each item on the queue is a
+    tuple of (host name, update time, batch).  A None on the queue tells
+    the writer to finish up and exit.
+
+    Batches are grouped by their update time.  As soon as we've got one
+    from every host for a given update time (or a batch for a later update
+    time shows up, or we've waited max_wait seconds without getting
+    anything), the group is merged with merge_batches() and written.  A
+    write that fails is logged and skipped (see _execute()).
+
+    If metrics (an SFAMetrics object) is given, the writes are timed and
+    the timings are published (under the host name 'central_writer') every
+    metrics_multiple groups.
+    '''
+
+    def __init__(self, sinks, write_queue, num_hosts, max_wait,
+                 metrics = None, metrics_multiple = 0):
+        self.logger = logging.getLogger( 'DDNTool_SFACentralWriter')
+        self._sinks = sinks
+        self._queue = write_queue
+        self._num_hosts = num_hosts
+        self._max_wait = max_wait
+        self._metrics = metrics
+        self._metrics_multiple = metrics_multiple
+        self._ticks_written = 0
+
+        # Maps each update time to the list of batches for it
+        self._pending = { }
+
+    def run(self):
+        '''
+        Loops until a None is pulled off the queue.
+        '''
+        while True:
+            try:
+                item = self._queue.get( True, self._max_wait)
+            except Queue.Empty:
+                # Nothing's arrived for a while, so we're not going to
+                # get anything else for whatever is pending.
+                self._write_older_than( None)
+                continue
+
+            if item is None:
+                break
+
+            (host, update_time, batch) = item
+            self._pending.setdefault( update_time, []).append( batch)
+
+            # Anything older than this update time isn't going to get any
+            # more batches (or if it does, they'll just get written alone)
+            self._write_older_than( update_time)
+            if len(self._pending[update_time]) >= self._num_hosts:
+                self._write_tick( update_time)
+
+        self.logger.debug( "Central writer exiting.  Writing anything still pending.")
+        self._write_older_than( None)
+
+    def _write_older_than(self, update_time):
+        '''
+        Write all the pending groups whose update time is less than
+        update_time.  (If update_time is None, write them all.)
+        '''
+        for pending_time in sorted( self._pending.keys()):
+            if update_time is not None and pending_time >= update_time:
+                break
+            self._write_tick( pending_time)
+
+    def _write_tick(self, update_time):
+        batches = self._pending.pop( update_time)
+        self.logger.debug( "Writing %d batches for update time %d"% \
+                           (len(batches), update_time))
+        self._execute( merge_batches( batches))
+
+        self._ticks_written += 1
+        if self._metrics and self._metrics_multiple and \
+           self._ticks_written % self._metrics_multiple == 0:
+            self._execute( metrics_batch( self._metrics, self._sinks.keys(),
+                                          'central_writer', update_time))
+
+    def _execute(self, batch):
+        '''
+        Executes the batch like execute_batch(), except that an operation
+        that fails is logged and skipped.  The merged batch holds every
+        controller's writes, so one bad row (or one database that's down)
+        mustn't stop the rest of them - or take the writer process down and
+        lose everything else that's pending.
+        '''
+        failures = { }  # maps the sink name to the number of failed operations
+        for operation in batch:
+            try:
+                execute_batch( self._sinks, [ operation ], self._metrics)
+            except Exception, e:
+                (sink_name, method_name, unused_args) = operation
+                if sink_name not in failures:
+                    self.logger.exception( "%s.%s() failed with %s exception.  "
+                                           "Skipping it."%(sink_name, method_name,
+                                                           type(e).__name__))
+                failures[sink_name] = failures.get( sink_name, 0) + 1
+
+        for (sink_name, count) in failures.items():
+            if count > 1:
+                self.logger.error( "%d writes to %s failed in this batch"% \
+                                   (count, sink_name))
@@ -0,0 +1,172 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import ConfigParser
+import os
+import tempfile
+import unittest
+from SFAClientUtils import SFAClient
+from SFAClientUtils.SFADeltaFilter import SFADeltaFilter, open_delta_filter
+from SFACapture_Test import RecordingSink
+
+
+def make_rows( update_time, values):
+    '''
+    One row per LUN (numbered from 0) in the multi-row method layout
+    '''
+    return [ ('sfa1', update_time, lun_num, value, 0)
+             for (lun_num, value) in enumerate( values) ]
+
+
+class DroppingWriter(object):
+    '''
+    Stands in for an SFABackgroundWriter whose queue is always full
+    '''
+    def __init__(self, policy):
+        self._policy = policy
+        self._dropped = 0
+
+    def submit(self, batch):
+        self._dropped += 1
+        return self._policy == 'drop_oldest'  # drop_oldest queues the new one
+
+    def stats(self):
+        return { 'batches_dropped' : self._dropped }
+
+    def stop(self):
+        pass
+
+
+class SFADeltaFilter_Test( unittest.TestCase):
+
+    def testUnchangedRowsSkipped(self):
+        delta_filter = SFADeltaFilter( 10)
+        delta_filter.next_tick()
+        rows = make_rows( 100, [ 1.0, 2.0, 3.0 ])
+        self.assertEqual( delta_filter.filter( 'lun', rows), rows)
+
+        # Only LUN 1 has changed (the update time doesn't count)
+        delta_filter.next_tick()
+        rows = make_rows( 102, [ 1.0, 5.0, 3.0 ])
+        self.assertEqual( delta_filter.filter( 'lun', rows), [ rows[1] ])
+
+        # A new LUN is always written
+        delta_filter.next_tick()
+        rows = make_rows( 104, [ 1.0, 5.0, 3.0, 4.0 ])
+        self.assertEqual( delta_filter.filter( 'lun', rows), [ rows[3] ])
+        self.assertEqual( delta_filter.stats(), { 'rows_written' : 5,
+                                                  'rows_skipped' : 5 })
+
+    def testTablesAreSeparate(self):
+        delta_filter = SFADeltaFilter( 10)
+        delta_filter.next_tick()
+        rows = make_rows( 100, [ 1.0 ])
+        delta_filter.filter( 'lun', rows)
+        self.assertEqual( delta_filter.filter( 'raw_lun', rows), rows)
+        delta_filter.next_tick()
+        self.assertEqual( delta_filter.filter( 'lun', rows), [ ])
+
+    def testHeartbeat(self):
+        delta_filter = SFADeltaFilter( 3)
+        written = [ ]
+        for tick in range( 10):
+            delta_filter.next_tick()
+            rows = make_rows( 100 + tick, [ 0.0 ])
+            if delta_filter.filter( 'lun', rows):
+                written.append( tick)
+        self.assertEqual( written, [ 0, 3, 6, 9 ])
+
+        # A change restarts the count
+        delta_filter.next_tick()
+        self.assertEqual( len( delta_filter.filter( 'lun', make_rows( 110, [ 1.0 ]))), 1)
+        delta_filter.next_tick()
+        self.assertEqual( delta_filter.filter( 'lun', make_rows( 111, [ 1.0 ])), [ ])
+
+    def testReset(self):
+        delta_filter = SFADeltaFilter( 10)
+        rows = make_rows( 100, [ 1.0, 2.0 ])
+        delta_filter.next_tick()
+        delta_filter.filter( 'lun', rows)
+        delta_filter.reset()
+        delta_filter.next_tick()
+        self.assertEqual( delta_filter.filter( 'lun', rows), rows)
+
+    def testOpen(self):
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'polling')
+        config.set( 'polling', 'med_poll_multiple', '15')
+        self.assertEqual( open_delta_filter( config), None)
+        config.add_section( 'writer')
+        config.set( 'writer', 'skip_unchanged', 'true')
+        self.assertEqual( open_delta_filter( config)._heartbeat_multiple, 15)
+        config.set( 'writer', 'heartbeat_multiple', '5')
+        self.assertEqual( open_delta_filter( config)._heartbeat_multiple, 5)
+        self.assertRaises( ValueError, SFADeltaFilter, 0)
+
+    # A dropped batch may have held changed values, so the client has to
+    # write everything again the next time
+    def testClientResetsOnDroppedBatch(self):
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'TSDb')
+        config.add_section( 'polling')
+        config.set( 'polling', 'fast_poll_interval', '2')
+        config.set( 'polling', 'med_poll_multiple', '100')
+        config.set( 'polling', 'slow_poll_multiple', '100')
+        config.add_section( 'ddn_hardware')
+        config.set( 'ddn_hardware', 'sfa_user', 'user')
+        config.set( 'ddn_hardware', 'sfa_password', 'password')
+        config.set( 'ddn_hardware', 'api', 'simulator')
+        config.add_section( 'simulator')
+        config.set( 'simulator', 'luns', '4')
+        config.set( 'simulator', 'idle_luns', '4')
+        config.set( 'simulator', 'latency_ms', '0')
+        config.add_section( 'writer')
+        config.set( 'writer', 'skip_unchanged', 'true')
+        (fd, conf_file) = tempfile.mkstemp( suffix = '.conf')
+        try:
+            conf = os.fdopen( fd, 'w')
+            config.write( conf)
+            conf.close()
+            sink = RecordingSink()
+            client = SFAClient.SFAClient( 'sim1', conf_file, None, None,
+                                          sinks = { 'tsdb' : sink })
+        finally:
+            os.remove( conf_file)
+        self.assertTrue( client.prepare())
+
+        def lun_rows_written( tick):
+            del sink.writes[:]
+            client.poll_once( tick, 1000 + 2 * tick)
+            return sum( [ len( args[0]) for (name, args) in sink.writes
+                          if name == 'update_lun_series_multi' ])
+
+        self.assertEqual( lun_rows_written( 1), 4)
+        self.assertEqual( lun_rows_written( 2), 0)  # all idle
+        for policy in [ 'drop_newest', 'drop_oldest' ]:
+            client._writer = DroppingWriter( policy)
+            client.poll_once( 3, 1006)
+            client._writer = None
+            self.assertEqual( lun_rows_written( 4), 4)
+            self.assertEqual( lun_rows_written( 5), 0)
+        client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import unittest
+import zlib
+from SFAClientUtils.SFAInfluxDb import SFAInfluxDb
+
+
+class FakeInfluxClient(object):
+    '''
+    Stand-in for the InfluxDBClient object.  Records the data it's sent.
+    '''
+    def __init__(self):
+        self.requests = []
+
+    def request(self, url, method = 'GET', params = None, data = None,
+                expected_response_code = 200, headers = None):
+        if headers and headers.get( 'Content-Encoding') == 'gzip':
+            data = zlib.decompress( data, 16 + zlib.MAX_WBITS)
+        self.requests.append( (url, params, str(data)))
+
+
+class SFAInfluxDb_Test( unittest.TestCase):
+
+    def setUp(self):
+        # Note: creating the client doesn't actually contact the server
+        self._db = SFAInfluxDb( 'user', 'password', 'localhost', 'test_db')
+        self._db._dbcon = FakeInfluxClient()
+
+    def testLunSeries(self):
+        self._db.update_lun_series_multi( [
+            ('sfa host,1', 1458000000, 3, 4096, 1024, 3072, 0, 10L, 4, 6, 0, 0),
+            ('sfa host,1', 1458000000, 4, 1.5, 0, 0, 0, 0, 0, 0, 0, 2) ])
+        self._db.flush_to_db()
+        self.assertEqual( len(self._db._dbcon.requests), 1)
+        (url, params, data) = self._db._dbcon.requests[0]
+        self.assertEqual( url, 'write')
+        self.assertEqual( params['db'], 'test_db')
+        self.assertEqual( data,
+            'lun_data,lun_num=3,sfa_host=sfa\\ host\\,1 transfer_bytes=4096i,'
+            'read_bytes=1024i,write_bytes=3072i,forwarded_bytes=0i,total_iops=10i,'
+            'read_iops=4i,write_iops=6i,forwarded_iops=0i,pool_state=0i 1458000000000000000\n'
+            'lun_data,lun_num=4,sfa_host=sfa\\ host\\,1 transfer_bytes=1.5,'
+            'read_bytes=0i,write_bytes=0i,forwarded_bytes=0i,total_iops=0i,'
+            'read_iops=0i,write_iops=0i,forwarded_iops=0i,pool_state=2i 1458000000000000000\n')
+
+        # Nothing's queued, so this shouldn't send anything
+        self._db.flush_to_db()
+        self.assertEqual( len(self._db._dbcon.requests), 1)
+
+    def testRequestSizeSeries(self):
+        self._db.update_lun_request_size_series_multi( False,
+                [ ('host1', 100, 7, range(12)) ])
+        self._db.update_lun_request_latency_series( 'host1', 100, 7, True, range(12))
+        self._db.flush_to_db()
+        lines = self._db._dbcon.requests[0][2].splitlines()
+        self.assertEqual( len(lines), 24)
+        self.assertEqual( lines[0],
+            'write_request_sizes,bucket=<\\=4KiB,lun_num=7,sfa_host=host1 value=0i 100000000000')
+        self.assertEqual( lines[23],
+            'read_request_latencies,bucket=>16s,lun_num=7,sfa_host=host1 value=11i 100000000000')
+        self.assertRaises( RuntimeError, self._db.update_lun_request_size_series,
+                           'host1', 100, 7, True, range(11))
+
+    def testChunkedGzipRequests(self):
+        db = SFAInfluxDb( 'user', 'password', 'localhost', 'test_db',
+                          gzip = True, max_points = 5, precision = 's')
+        db._dbcon = FakeInfluxClient()
+        db.update_lun_request_size_series_multi( True, [ ('host1', 100, 7, range(12)) ])
+        db.flush_to_db()
+        requests = db._dbcon.requests
+        self.assertEqual( [ len(r[2].splitlines()) for r in requests ], [5, 5, 2])
+        self.assertEqual( requests[0][1]['precision'], 's')
+        self.assertEqual( requests[0][2].splitlines()[0],
+            'read_request_sizes,bucket=<\\=4KiB,lun_num=7,sfa_host=host1 value=0i 100')
+        self.assertEqual( ''.join( [ r[2] for r in requests ]).count( '\n'), 12)
+        self.assertRaises( ValueError, SFAInfluxDb, 'user', 'password',
+                           'localhost', 'test_db', precision = 'us')
+
+    def testWideHistograms(self):
+        db = SFAInfluxDb( 'user', 'password', 'localhost', 'test_db',
+                          precision = 's', histogram_schema = 'wide')
+        db._dbcon = FakeInfluxClient()
+        db.update_lun_request_latency_series_multi( False,
+                [ ('host1', 100, 7, range(12)), ('host1', 100, 8, [0] * 12) ])
+        db.flush_to_db()
+        lines = db._dbcon.requests[0][2].splitlines()
+        self.assertEqual( len(lines), 2)
+        self.assertEqual( lines[0],
+            'write_request_latencies,lun_num=7,sfa_host=host1 le_16ms=0i,le_32ms=1i,'
+            'le_64ms=2i,le_128ms=3i,le_256ms=4i,le_512ms=5i,le_1s=6i,le_2s=7i,'
+            'le_4s=8i,le_8s=9i,le_16s=10i,gt_16s=11i 100')
+
+    def testInternalMetrics(self):
+        db = SFAInfluxDb( 'user', 'password', 'localhost', 'test_db', precision = 's')
+        db._dbcon = FakeInfluxClient()
+        db.update_internal_metrics_multi(
+                [ ('host1', 100, 'getAll.SFAStoragePool', 3, 0.75, 0.5, 0.125, 0.5) ])
+        db.flush_to_db()
+        self.assertEqual( db._dbcon.requests[0][2],
+            'ddntool_internal,phase=getAll.SFAStoragePool,sfa_host=host1 count=3i,'
+            'sum=0.75,max=0.5,p50=0.125,p99=0.5 100\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import ConfigParser
+import unittest
+from SFAClientUtils import SFAWriter
+from SFAClientUtils.SFAMetrics import SFAMetrics, percentile
+
+
+class SFAMetrics_Test( unittest.TestCase):
+
+    def testPercentile(self):
+        values = range(1, 101)
+        self.assertEqual( percentile( values, 0.50), 50)
+        self.assertEqual( percentile( values, 0.99), 99)
+        self.assertEqual( percentile( values, 1.0), 100)
+        self.assertEqual( percentile( [7], 0.99), 7)
+        self.assertRaises( ValueError, percentile, [], 0.5)
+
+    def testSummarize(self):
+        metrics = SFAMetrics()
+        for value in [ 0.3, 0.1, 0.2 ]:
+            metrics.add( 'write.tsdb.flush_to_db', value)
+        with metrics.timer( 'fast_poll'):
+            pass
+        summary = metrics.summarize()
+        self.assertEqual( [ s[0] for s in summary ],
+                          [ 'fast_poll', 'write.tsdb.flush_to_db' ])
+        (phase, count, total, maximum, p50, p99) = summary[1]
+        self.assertEqual( count, 3)
+        self.assertAlmostEqual( total, 0.6)
+        self.assertEqual( (maximum, p50, p99), (0.3, 0.2, 0.3))
+        self.assertEqual( summary[0][1], 1)
+
+        # summarize() starts over
+        self.assertEqual( metrics.summarize(), [])
+
+    def testDisabled(self):
+        metrics = SFAMetrics( False)
+        metrics.add( 'fast_poll', 1.0)
+        with metrics.timer( 'fast_poll'):
+            pass
+        self.assertEqual( metrics.summarize(), [])
+
+    def testOpenMetrics(self):
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'polling')
+        config.set( 'polling', 'med_poll_multiple', '15')
+        (metrics, publish_multiple) = SFAWriter.open_metrics( config)
+        self.assertFalse( metrics.enabled)
+        self.assertEqual( publish_multiple, 15)
+
+        config.add_section( 'metrics')
+        config.set( 'metrics', 'enabled', 'true')
+        config.set( 'metrics', 'publish_multiple', '0')
+        self.assertRaises( ValueError, SFAWriter.open_metrics, config)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,332 @@
+#!/usr/bin/python
+
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Microbenchmarks for the code that runs once per sample or once per LUN:
+    timeseries.*    : SFATimeSeries.append() and average() for several
+                      values of max_size
+    influx.*        : queuing a poll's worth of request size and latency
+                      points in SFAInfluxDb and encoding them in
+                      flush_to_db() (sent to a fake client)
+    mysql.*         : building the multi-row SQL statements and one poll's
+                      worth of SFAMySqlDb writes (to a fake connection)
+    bracket.*       : bracket_aware_split() and bracket_expand() on host
+                      lists of 10,000 entries
+
+Each benchmark is timed with the best of several repeats (which is far less
+noisy than the average) and reported in microseconds per operation.
+
+To catch regressions, save a baseline once:
+    SFAMicro_Bench.py --save baseline.json
+and compare later runs against it:
+    SFAMicro_Bench.py --baseline baseline.json
+The comparison shows the change for each benchmark as a percentage and the
+exit status is 1 if anything got slower than --threshold percent.  (Only
+compare runs from the same machine and Python version.)
+
+The influx and mysql benchmarks need the influxdb and mysql.connector
+packages.  They're skipped if those aren't installed.
+'''
+
+import argparse
+import json
+import platform
+import re
+import sys
+
+from SFAClientUtils import SFATimeSeries
+from SFAClientUtils.SFAScheduler import monotonic
+from bracket_expand import bracket_aware_split, bracket_expand
+
+BENCH_HOST_NAME = 'bench-sfa-host'
+
+# Parameters for the individual benchmarks
+TIMESERIES_MAX_SIZES = [ 10, 100, 1000, 10000 ]
+TIMESERIES_SPAN = 60        # seconds (a span that's registered with the series)
+TIMESERIES_INTERVAL = 2.0   # seconds between samples
+NUM_LUNS = 100              # LUNs per poll for the influx & mysql benchmarks
+NUM_HOSTS = 10000           # entries in the bracket benchmark host lists
+
+NUM_BUCKETS = 12
+
+
+class FakeClock(object):
+    '''
+    The clock for the SFATimeSeries objects.  Every call moves it forward
+    TIMESERIES_INTERVAL seconds, so the appended samples are spaced like a
+    real fast poll instead of a few microseconds apart.
+    '''
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        self.now += TIMESERIES_INTERVAL
+        return self.now
+
+
+class NullInfluxClient(object):
+    '''
+    Stands in for the InfluxDBClient object.  Throws the requests away.
+    '''
+    def request(self, url, method = 'GET', params = None, data = None,
+                expected_response_code = 200, headers = None):
+        pass
+
+
+def _filled_series( max_size):
+    series = SFATimeSeries.SFATimeSeries( max_size, [TIMESERIES_SPAN], FakeClock().time)
+    for i in range( max_size):
+        series.append( float( i * 1000))
+    return series
+
+
+def bench_timeseries_append( max_size):
+    series = _filled_series( max_size)
+    values = [ 0.0 ]
+    def op():
+        values[0] += 1000.0
+        series.append( values[0])
+    return op
+
+
+def bench_timeseries_average( max_size, span):
+    series = _filled_series( max_size)
+    return lambda: series.average( span)
+
+
+def _bucket_rows( update_time):
+    return [ (BENCH_HOST_NAME, update_time, lun_num,
+              [ 1000 * lun_num + i for i in range( NUM_BUCKETS) ])
+             for lun_num in range( NUM_LUNS) ]
+
+
+def bench_influx_requests( histogram_schema):
+    '''
+    One op is a poll's worth of read & write request size & latency data
+    for NUM_LUNS LUNs, plus flush_to_db()
+    '''
+    from SFAClientUtils.SFAInfluxDb import SFAInfluxDb
+    db = SFAInfluxDb( None, None, None, None, precision = 's',
+                      histogram_schema = histogram_schema)
+    db._dbcon = NullInfluxClient()
+    update_time = [ 1000000 ]
+    def op():
+        update_time[0] += 2
+        rows = _bucket_rows( update_time[0])
+        db.update_lun_request_size_series_multi( True, rows)
+        db.update_lun_request_size_series_multi( False, rows)
+        db.update_lun_request_latency_series_multi( True, rows)
+        db.update_lun_request_latency_series_multi( False, rows)
+        db.flush_to_db()
+    return op
+
+
+def bench_mysql_query():
+    '''
+    One op is building (not executing) the multi-row LUN table statement
+    for NUM_LUNS rows, without the statement cache
+    '''
+    from SFAClientUtils import SFAMySqlDb
+    return lambda: SFAMySqlDb._multi_row_query( SFAMySqlDb.LUN_TABLE_INSERT_PREFIX,
+                                                SFAMySqlDb.LUN_TABLE_INSERT_ROW,
+                                                SFAMySqlDb.LUN_TABLE_INSERT_SUFFIX,
+                                                NUM_LUNS)
+
+
+def bench_mysql_tick():
+    '''
+    One op is a poll's worth of SFAMySqlDb writes for NUM_LUNS LUNs (see
+    SFAMySqlDb_Bench.current_tick())
+    '''
+    import SFAMySqlDb_Bench
+    db = SFAMySqlDb_Bench.open_fake_db()
+    update_time = [ 1000000 ]
+    def op():
+        update_time[0] += 2
+        SFAMySqlDb_Bench.current_tick( db, update_time[0], NUM_LUNS)
+    return op
+
+
+def _host_list():
+    '''
+    A comma separated list of NUM_HOSTS host names: 9,000 plain names and
+    1,000 more in 10 bracket expressions
+    '''
+    names = [ 'oss%05d'%i for i in range( NUM_HOSTS - 1000) ]
+    names.extend( [ 'rack%d-sfa[1-100]'%i for i in range( 10) ])
+    return ','.join( names)
+
+
+def bench_bracket_split():
+    host_list = _host_list()
+    return lambda: bracket_aware_split( host_list)
+
+
+def bench_bracket_expand( hosts):
+    return lambda: bracket_expand( list( hosts))
+
+
+# Every benchmark: (name, function that sets it up and returns the function
+# to time).  The setup is only done if the benchmark is selected.
+BENCHMARKS = [ ]
+for _max_size in TIMESERIES_MAX_SIZES:
+    BENCHMARKS.append( ('timeseries.append[max_size=%d]'%_max_size,
+                        lambda m=_max_size: bench_timeseries_append( m)))
+for _max_size in TIMESERIES_MAX_SIZES:
+    BENCHMARKS.append( ('timeseries.average[max_size=%d]'%_max_size,
+                        lambda m=_max_size: bench_timeseries_average( m, TIMESERIES_SPAN)))
+    BENCHMARKS.append( ('timeseries.average_unregistered[max_size=%d]'%_max_size,
+                        lambda m=_max_size: bench_timeseries_average( m, TIMESERIES_SPAN / 2)))
+BENCHMARKS.extend( [
+    ('influx.request_series_tagged[luns=%d]'%NUM_LUNS, lambda: bench_influx_requests( 'tagged')),
+    ('influx.request_series_wide[luns=%d]'%NUM_LUNS, lambda: bench_influx_requests( 'wide')),
+    ('mysql.multi_row_query[rows=%d]'%NUM_LUNS, bench_mysql_query),
+    ('mysql.tick[luns=%d]'%NUM_LUNS, bench_mysql_tick),
+    ('bracket.split[hosts=%d]'%NUM_HOSTS, bench_bracket_split),
+    ('bracket.expand_range[hosts=%d]'%NUM_HOSTS,
+        lambda: bench_bracket_expand( [ 'oss[1-%d]'%NUM_HOSTS ])),
+    ('bracket.expand_nested[hosts=%d]'%NUM_HOSTS,
+        lambda: bench_bracket_expand( [ 'rack[1-100]-sfa[1-100]' ])),
+    ('bracket.expand_mixed[hosts=%d]'%NUM_HOSTS,
+        lambda: bench_bracket_expand( bracket_aware_split( _host_list()))),
+])
+
+
+def time_op( op, repeat, min_time):
+    '''
+    Returns the time (in seconds) for one call to op: the best of 'repeat'
+    runs, where each run makes enough calls to take at least min_time
+    seconds
+    '''
+    op()  # warm up
+    number = 1
+    while True:
+        start = monotonic()
+        for unused_i in xrange( number):
+            op()
+        elapsed = monotonic() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+
+    best = elapsed
+    for unused_i in range( repeat - 1):
+        start = monotonic()
+        for unused_i in xrange( number):
+            op()
+        best = min( best, monotonic() - start)
+    return best / number
+
+
+def run_benchmarks( pattern, repeat, min_time):
+    '''
+    Runs every benchmark whose name matches the pattern (a regular
+    expression) and returns a dictionary mapping the names to the
+    microseconds per operation
+    '''
+    results = { }
+    for (name, setup) in BENCHMARKS:
+        if pattern and not re.search( pattern, name):
+            continue
+        try:
+            op = setup()
+        except ImportError, e:
+            sys.stderr.write( "Skipping %s: %s\n"%(name, e))
+            continue
+        results[name] = time_op( op, repeat, min_time) * 1e6
+    return results
+
+
+def compare( results, baseline, threshold):
+    '''
+    Prints the results next to the baseline values and returns the names of
+    the benchmarks that are more than threshold percent slower
+    '''
+    regressions = [ ]
+    print "%-50s %12s %12s %8s"%("benchmark", "usec/op", "baseline", "change")
+    for name in sorted( results):
+        if name not in baseline:
+            print "%-50s %12.3f %12s %8s"%(name, results[name], "-", "-")
+            continue
+        change = (results[name] - baseline[name]) / baseline[name] * 100.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append( name)
+        print "%-50s %12.3f %12.3f %+7.1f%%%s"%(name, results[name], baseline[name],
+                                                change, flag)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Microbenchmarks for the per-sample and per-LUN code")
+    parser.add_argument( '-k', '--filter',
+                         help="Only run the benchmarks whose names match this regular expression")
+    parser.add_argument( '-r', '--repeat', type=int, default=5,
+                         help="Number of timed runs of each benchmark (the best one counts)")
+    parser.add_argument( '--min-time', type=float, default=0.1,
+                         help="Minimum length (in seconds) of each timed run")
+    parser.add_argument( '--save', metavar='FILE',
+                         help="Save the results as a baseline file")
+    parser.add_argument( '--baseline', metavar='FILE',
+                         help="Compare the results against this baseline file")
+    parser.add_argument( '--threshold', type=float, default=10.0,
+                         help="Percent slowdown (compared to the baseline) that "
+                              "counts as a regression (default: 10)")
+    args = parser.parse_args()
+
+    results = run_benchmarks( args.filter, args.repeat, args.min_time)
+
+    regressions = [ ]
+    if args.baseline:
+        baseline_file = open( args.baseline)
+        try:
+            baseline = json.load( baseline_file)
+        finally:
+            baseline_file.close()
+        if baseline.get( 'python') != platform.python_version():
+            sys.stderr.write( "Warning: the baseline is from Python %s\n"% \
+                              baseline.get( 'python'))
+        regressions = compare( results, baseline['results'], args.threshold)
+    else:
+        print "%-50s %12s"%("benchmark", "usec/op")
+        for name in sorted( results):
+            print "%-50s %12.3f"%(name, results[name])
+
+    if args.save:
+        save_file = open( args.save, 'w')
+        try:
+            json.dump( { 'python' : platform.python_version(),
+                         'results' : results }, save_file, indent=2, sort_keys=True)
+        finally:
+            save_file.close()
+
+    if regressions:
+        print
+        print "%d benchmark(s) slower than the baseline by more than %.1f%%"% \
+              (len(regressions), args.threshold)
+        sys.exit( 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/python
+
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Microbenchmark for the SQL output path.  Compares the old way of writing
+one tick's worth of LUN data (one statement per LUN per table, built by
+string concatenation with every parameter converted by str()) against the
+current SFAMySqlDb code (a few multi-row prepared statements per table
+with native parameter types).
+
+By default, the statements are sent to a fake connection that discards
+them, so the numbers only show the client side CPU cost.  If a database
+host is given, both paths are run against a real server.  Note that this
+*will* overwrite rows in the LunInfo, LunInfoRaw and request size/latency
+tables of that database (for a fake host name), so don't point it at a
+production database.
+'''
+
+import argparse
+import time
+
+import mysql.connector
+from SFAClientUtils import SFAMySqlDb
+from SFAClientUtils.SFAMySqlDb import TABLE_NAMES
+
+BENCH_HOST_NAME = 'bench-sfa-host'
+
+
+class FakeCursor(object):
+    '''
+    Stand-in for a mysql.connector cursor.  Throws away everything it's
+    given (unless its connection is recording).
+    '''
+    def __init__(self, connection):
+        self._connection = connection
+
+    def execute(self, query, params = None):
+        if self._connection.executed is not None:
+            self._connection.executed.append( (query, params))
+
+    def fetchall(self):
+        return [ ]
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    '''
+    Stand-in for a mysql.connector connection.  If record is True, every
+    statement executed on its cursors is appended to its executed list as a
+    (query, params) tuple.  (The tests use this.)
+    '''
+    def __init__(self, record = False):
+        self.executed = None
+        if record:
+            self.executed = [ ]
+
+    def cursor(self, prepared = False):
+        return FakeCursor( self)
+
+
+def open_fake_db( connection = None):
+    '''
+    Returns an SFAMySqlDb object that's connected to a FakeConnection (or
+    the given connection)
+    '''
+    if connection is None:
+        connection = FakeConnection()
+    # Swap out the connect() function so SFAMySqlDb gets a fake connection
+    real_connect = mysql.connector.connect
+    mysql.connector.connect = lambda **kwargs: connection
+    try:
+        return SFAMySqlDb.SFAMySqlDb( None, None, None, None)
+    finally:
+        mysql.connector.connect = real_connect
+
+
+def legacy_tick( dbcon, update_time, num_luns):
+    '''
+    Writes one tick's worth of data the way SFAMySqlDb used to: every row is
+    a separate statement with its own cursor and every value is converted
+    to a string.
+    '''
+    for lun_num in range(num_luns):
+        insert_query = "INSERT INTO " + TABLE_NAMES['LUN_TABLE_NAME'] +                 \
+                "(Hostname, LastUpdate, Disk_Num, Transfer_BW, Read_BW, Write_BW, "     \
+                "Read_IOPS, Write_IOPS, Forwarded_BW, Forwarded_IOPS, Pool_State) "     \
+                "VALUES( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s) "   \
+                "ON DUPLICATE KEY UPDATE LastUpdate=VALUES(LastUpdate), "               \
+                "Transfer_BW=VALUES(Transfer_BW), Read_BW=VALUES(Read_BW), "            \
+                "Write_BW=VALUES(Write_BW), Read_IOPS=VALUES(Read_IOPS), "              \
+                "Write_IOPS=VALUES(Write_IOPS), Forwarded_BW=VALUES(Forwarded_BW), "    \
+                "Forwarded_IOPS=VALUES(Forwarded_IOPS), Pool_State=VALUES(Pool_State);"
+        row = _lun_row( update_time, lun_num)
+        cursor = dbcon.cursor()
+        cursor.execute( insert_query, tuple( [ str(v) for v in row ]))
+        cursor.close()
+
+        insert_query = "INSERT INTO " + TABLE_NAMES['RAW_LUN_TABLE_NAME'] +   \
+                "(Hostname, LastUpdate, Disk_Num, Transfer_Bytes, "           \
+                "Read_Bytes, Write_Bytes, Forwarded_bytes, "                  \
+                "Total_IOs, Read_IOs, Write_IOs, Forwarded_IOs, Pool_State) " \
+                "VALUES( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, " \
+                "%s, %s, %s) "                                                \
+                "ON DUPLICATE KEY UPDATE LastUpdate=VALUES(LastUpdate), "     \
+                "Transfer_Bytes=VALUES(Transfer_Bytes), "                     \
+                "Read_Bytes=VALUES(Read_Bytes), "                             \
+                "Write_Bytes=VALUES(Write_Bytes), "                           \
+                "Forwarded_Bytes=VALUES(Forwarded_Bytes), "                   \
+                "Total_IOs=VALUES(Total_IOs), Read_IOs=VALUES(Read_IOs), "    \
+                "Write_IOs=VALUES(Write_IOs), "                               \
+                "Forwarded_IOs=VALUES(Forwarded_IOs), "                       \
+                "Pool_State=VALUES(Pool_State);"
+        row = _raw_lun_row( update_time, lun_num)
+        cursor = dbcon.cursor()
+        cursor.execute( insert_query, tuple( [ str(v) for v in row ]))
+        cursor.close()
+
+        for table in [ "LUN_READ_REQUEST_SIZE_TABLE_NAME",
+                       "LUN_WRITE_REQUEST_SIZE_TABLE_NAME",
+                       "LUN_READ_REQUEST_LATENCY_TABLE_NAME",
+                       "LUN_WRITE_REQUEST_LATENCY_TABLE_NAME" ]:
+            buckets = _buckets( lun_num)
+            replace_query = "REPLACE INTO " + TABLE_NAMES[table]
+            replace_query += " VALUES( %s, FROM_UNIXTIME(%s), %s"
+            for unused_i in range(len(buckets)):
+                replace_query += ", %s"
+            replace_query += ");"
+            values = (BENCH_HOST_NAME, str(update_time), str(lun_num))
+            for b in buckets:
+                values += (str(b), )
+            cursor = dbcon.cursor()
+            cursor.execute( replace_query, values)
+            cursor.close()
+
+
+def current_tick( db, update_time, num_luns):
+    '''
+    Writes one tick's worth of data with the current SFAMySqlDb code.
+    '''
+    lun_rows = [ _lun_row( update_time, lun_num) for lun_num in range(num_luns) ]
+    raw_rows = [ _raw_lun_row( update_time, lun_num) for lun_num in range(num_luns) ]
+    bucket_rows = [ (BENCH_HOST_NAME, update_time, lun_num, _buckets( lun_num))
+                    for lun_num in range(num_luns) ]
+    db.update_lun_table_multi( lun_rows)
+    db.update_raw_lun_table_multi( raw_rows)
+    db.update_lun_request_size_table_multi( True, bucket_rows)
+    db.update_lun_request_size_table_multi( False, bucket_rows)
+    db.update_lun_request_latency_table_multi( True, bucket_rows)
+    db.update_lun_request_latency_table_multi( False, bucket_rows)
+
+
+def _lun_row( update_time, lun_num):
+    return (BENCH_HOST_NAME, update_time, lun_num, 1234567.8, 617283.9,
+            617283.9, 150.5, 150.5, 0.0, 0.0, 0)
+
+def _raw_lun_row( update_time, lun_num):
+    return (BENCH_HOST_NAME, update_time, lun_num, 98765432100L, 49382716050L,
+            49382716050L, 0L, 1234567L, 617283L, 617284L, 0L, 0)
+
+def _buckets( lun_num):
+    return [ 1000 * lun_num + i for i in range(12) ]
+
+
+def time_ticks( func, db, num_luns, num_ticks):
+    '''
+    Returns the average wall clock time (in seconds) of one call to func
+    '''
+    func( db, 1, num_luns)   # warm up (and prepare the statements)
+    start = time.time()
+    for tick in range(num_ticks):
+        func( db, 2 + tick, num_luns)
+    return (time.time() - start) / num_ticks
+
+
+def main():
+    parser = argparse.ArgumentParser( description="Compare the old and new SQL output paths")
+    parser.add_argument( '-l', '--luns', type=int, nargs='+', default=[10, 100, 500],
+                         help="Number of LUNs per tick (may be repeated)")
+    parser.add_argument( '-t', '--ticks', type=int, default=50,
+                         help="Number of ticks to time for each LUN count")
+    parser.add_argument( '--host', help="Database host.  (Default is to use a fake connection)")
+    parser.add_argument( '--name', help="Database name")
+    parser.add_argument( '--user', help="Database user")
+    parser.add_argument( '--password', default='', help="Database password")
+    args = parser.parse_args()
+
+    if args.host:
+        db = SFAMySqlDb.SFAMySqlDb( args.user, args.password, args.host, args.name)
+        legacy_con = mysql.connector.connect( user = args.user, password = args.password,
+                                              host = args.host, database = args.name)
+    else:
+        db = open_fake_db()
+        legacy_con = FakeConnection()
+
+    print "%8s %14s %14s %8s"%("LUNs", "old (ms/tick)", "new (ms/tick)", "speedup")
+    for num_luns in args.luns:
+        old = time_ticks( legacy_tick, legacy_con, num_luns, args.ticks)
+        new = time_ticks( current_tick, db, num_luns, args.ticks)
+        print "%8d %14.3f %14.3f %7.1fx"%(num_luns, old * 1000, new * 1000, old / new)
+
+
+if __name__ == '__main__':
+    main()
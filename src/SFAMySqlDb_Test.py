@@ -0,0 +1,179 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import shutil
+import tempfile
+import unittest
+import mysql.connector
+import SFAMySqlDb_Bench
+from SFAClientUtils import SFAMySqlDb
+from SFAClientUtils.SFASpool import SFASpool
+
+
+def lun_row( lun_num):
+    return ('sfa1', 1000, lun_num, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 0)
+
+def raw_lun_row( lun_num):
+    return ('sfa1', 1000, lun_num, 10L, 20L, 30L, 40L, 5L, 6L, 7L, 8L, 0)
+
+
+def open_recording_db():
+    '''
+    Returns an SFAMySqlDb object and the FakeConnection that's recording
+    its statements (with the statements made while connecting removed)
+    '''
+    connection = SFAMySqlDb_Bench.FakeConnection( record = True)
+    db = SFAMySqlDb_Bench.open_fake_db( connection)
+    del connection.executed[:]
+    return (db, connection)
+
+
+class SFAMySqlDb_Test( unittest.TestCase):
+
+    def testChunkSizes(self):
+        self.assertEqual( SFAMySqlDb._chunk_sizes( 0, 100), [ ])
+        self.assertEqual( SFAMySqlDb._chunk_sizes( 100, 5957), [ 64, 32, 4 ])
+        self.assertEqual( SFAMySqlDb._chunk_sizes( 10000, 5957), [ 4096, 4096, 1024, 512,
+                                                                   256, 16 ])
+        self.assertEqual( SFAMySqlDb._chunk_sizes( 7, 3), [ 2, 2, 2, 1 ])
+
+    def testLunTableStatement(self):
+        (db, connection) = open_recording_db()
+        db.update_lun_table_multi( [ lun_row( 0), lun_row( 5) ])
+        self.assertEqual( connection.executed, [
+            ("INSERT INTO LunInfo(Hostname, LastUpdate, Disk_Num, Transfer_BW, "
+             "Read_BW, Write_BW, Read_IOPS, Write_IOPS, Forwarded_BW, "
+             "Forwarded_IOPS, Pool_State) VALUES "
+             "( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s), "
+             "( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s)" +
+             SFAMySqlDb.LUN_TABLE_INSERT_SUFFIX,
+             lun_row( 0) + lun_row( 5)) ])
+        # The values are bound in their own types, not converted to strings
+        self.assertEqual( type( connection.executed[0][1][3]), float)
+
+    def testRawLunTableStatement(self):
+        (db, connection) = open_recording_db()
+        db.update_raw_lun_table( *raw_lun_row( 3))
+        self.assertEqual( connection.executed, [
+            ("INSERT INTO LunInfoRaw(Hostname, LastUpdate, Disk_Num, "
+             "Transfer_Bytes, Read_Bytes, Write_Bytes, Forwarded_bytes, "
+             "Total_IOs, Read_IOs, Write_IOs, Forwarded_IOs, Pool_State) VALUES "
+             "( %s, FROM_UNIXTIME(%s), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)" +
+             SFAMySqlDb.RAW_LUN_TABLE_INSERT_SUFFIX,
+             raw_lun_row( 3)) ])
+
+    def testBucketTableStatement(self):
+        (db, connection) = open_recording_db()
+        buckets = range( 100, 112)
+        db.update_lun_request_size_table_multi( False, [ ('sfa1', 1000, 7, buckets) ])
+        self.assertEqual( connection.executed, [
+            ("REPLACE INTO LunWriteRequestSizes VALUES "
+             "( %s, FROM_UNIXTIME(%s), %s" + ", %s" * 12 + ");",
+             ('sfa1', 1000, 7) + tuple( buckets)) ])
+
+        self.assertRaises( RuntimeError, db.update_lun_request_latency_table_multi,
+                           True, [ ('sfa1', 1000, 7, range( 11)) ])
+
+    # Big writes are split so that no statement has more than
+    # MAX_PLACEHOLDERS placeholders (11 for each LUN table row)
+    def testPlaceholderLimit(self):
+        (db, connection) = open_recording_db()
+        rows = [ lun_row( i) for i in range( 10) ]
+        real_max = SFAMySqlDb.MAX_PLACEHOLDERS
+        SFAMySqlDb.MAX_PLACEHOLDERS = 50
+        try:
+            db.update_lun_table_multi( rows)
+        finally:
+            SFAMySqlDb.MAX_PLACEHOLDERS = real_max
+        self.assertEqual( [ len( params) / 11 for (query, params) in connection.executed ],
+                          [ 4, 4, 2 ])
+        values = [ ]
+        for (query, params) in connection.executed:
+            self.assertEqual( query.count( '%s'), len( params))
+            values.extend( params)
+        self.assertEqual( tuple( values), sum( rows, ()))
+
+        # And with the real limit
+        del connection.executed[:]
+        db.update_lun_table_multi( [ lun_row( i) for i in range( 10000) ])
+        self.assertEqual( sum( [ len( params) for (query, params) in connection.executed ]),
+                          10000 * 11)
+        for (query, params) in connection.executed:
+            self.assertTrue( query.count( '%s') <= SFAMySqlDb.MAX_PLACEHOLDERS)
+
+    # The number of rows changes every poll when unchanged rows are skipped.
+    # That mustn't leave a new statement and prepared cursor behind each
+    # time.
+    def testVaryingRowCounts(self):
+        db = SFAMySqlDb_Bench.open_fake_db()
+        for num_rows in range( 1, 2001):
+            db.update_lun_table_multi( [ lun_row( i) for i in range( num_rows) ])
+        self.assertTrue( len( db._query_cache) <= 11)
+        self.assertTrue( len( db._prepared) <= 11)
+
+    # Databases initialized before the internal metrics table existed get
+    # it when we connect
+    def testInternalMetricsTableCreated(self):
+        connection = SFAMySqlDb_Bench.FakeConnection( record = True)
+        db = SFAMySqlDb_Bench.open_fake_db( connection)
+        self.assertTrue( connection.executed[0][0].startswith(
+                "CREATE TABLE IF NOT EXISTS DDNToolInternal "))
+        db.update_internal_metrics_table_multi( [ ('sfa1', 1000, 'iteration',
+                                                   1, 0.5, 0.5, 0.5, 0.5) ])
+        self.assertEqual( len( connection.executed), 2)
+
+    # If the table can't be created, the metrics are quietly dropped
+    def testInternalMetricsTableNotAllowed(self):
+        class NoCreateCursor( SFAMySqlDb_Bench.FakeCursor):
+            def execute(self, query, params = None):
+                if query.startswith( "CREATE"):
+                    raise mysql.connector.Error( "access denied")
+                SFAMySqlDb_Bench.FakeCursor.execute( self, query, params)
+        connection = SFAMySqlDb_Bench.FakeConnection( record = True)
+        connection.cursor = lambda prepared = False: NoCreateCursor( connection)
+        db = SFAMySqlDb_Bench.open_fake_db( connection)
+        db.update_internal_metrics_table_multi( [ ('sfa1', 1000, 'iteration',
+                                                   1, 0.5, 0.5, 0.5, 0.5) ])
+        db.update_lun_table_multi( [ lun_row( 0) ])
+        self.assertEqual( len( connection.executed), 1)  # just the LUN row
+
+    # Initializing the database with a spool configured used to leave the
+    # spool without anything to send the writes with
+    def testSpoolWithInit(self):
+        spool_dir = tempfile.mkdtemp()
+        try:
+            spool = SFASpool( spool_dir, 1000000, 100000, 100, 0)
+            connection = SFAMySqlDb_Bench.FakeConnection( record = True)
+            real_connect = mysql.connector.connect
+            mysql.connector.connect = lambda **kwargs: connection
+            try:
+                db = SFAMySqlDb.SFAMySqlDb( None, None, None, None, init = True,
+                                            spool = spool)
+            finally:
+                mysql.connector.connect = real_connect
+            del connection.executed[:]
+            db.update_lun_table_multi( [ lun_row( 0) ])
+            self.assertEqual( len( connection.executed), 1)
+            self.assertFalse( spool.has_records())
+        finally:
+            shutil.rmtree( spool_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import glob
+import os
+import pstats
+import shutil
+import signal
+import tempfile
+import unittest
+from SFAClientUtils import SFAProfiler
+
+
+def busy_work():
+    return sum( [ i * i for i in range(1000) ])
+
+
+class SFAProfiler_Test( unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._profiler = SFAProfiler.SFAProfiler( self._dir, 'host1', 2, 10)
+
+    def tearDown(self):
+        self._profiler.close()
+        signal.signal( signal.SIGUSR1, signal.SIG_DFL)
+        shutil.rmtree( self._dir)
+
+    def run_ticks(self, num_ticks):
+        for unused_i in range(num_ticks):
+            self._profiler.begin_tick()
+            busy_work()
+            self._profiler.end_tick()
+
+    def testNothingUntilRequested(self):
+        self.run_ticks( 3)
+        self.assertEqual( os.listdir( self._dir), [])
+
+    def testSignal(self):
+        SFAProfiler.install_signal_handler()
+        os.kill( os.getpid(), signal.SIGUSR1)
+        self.run_ticks( 5)  # only the first 2 are profiled
+        pstats_files = glob.glob( os.path.join( self._dir, 'host1-%d-*.pstats'%os.getpid()))
+        self.assertEqual( len(pstats_files), 1)
+        stats = pstats.Stats( pstats_files[0])
+        calls = [ count for ((unused_file, unused_line, func), (count, unused_nc, unused_tt,
+                                                              unused_ct, unused_callers))
+                  in stats.stats.items() if func == 'busy_work' ]
+        self.assertEqual( calls, [2])
+        mem_files = glob.glob( os.path.join( self._dir, '*.mem.txt'))
+        self.assertEqual( len(mem_files), 1)
+        # A header and at most 'top' entries
+        lines = open( mem_files[0]).read().splitlines()
+        self.assertTrue( 1 < len(lines) <= 11)
+
+    def testSecondRequestStopsEarly(self):
+        self._profiler.request()
+        self.run_ticks( 1)
+        self._profiler.request()
+        self.run_ticks( 1)
+        self.assertEqual( len( glob.glob( os.path.join( self._dir, '*.pstats'))), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/python
+
+# Created on Oct 18, 2026
+#
+# @author: carlosthomaz
+#
+# Copyright 2026 UT Battelle, LLC
+#
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+#
+# This file is part of DDNTool_v2.
+#
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+#
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+'''
+Replays capture files (recorded by DDNTool with a capture section in its
+config file - see SFAClientUtils/SFACapture.py) through the normal
+SFAClient code: the time series, the averages and the writes to the SQL
+and time-series databases in the config file.  That lets us reproduce the
+load from real controllers, profile it and test the database code without
+any DDN hardware.
+
+One SFAClient is created for each capture file and they're all stepped
+together, one fast poll at a time.  The pace comes from the recorded
+times: --speed 10 replays ten times faster than the data was recorded
+and --speed 0 goes as fast as possible.  The LastUpdate times written to
+the databases are the recorded times (or, with --now, shifted so that the
+replay starts at the current time).
+
+All the config file settings are used, except that the writer mode is
+always local and nothing is captured.  SIGUSR1 profiles the replay, just
+like DDNTool (if the config file has a profiling section).
+
+Example:
+    SFAReplay_Driver.py ddntool.conf /var/tmp/ddntool_capture --speed 20
+'''
+
+import argparse
+import ConfigParser
+import glob
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from SFAClientUtils import SFAClient
+from SFAClientUtils import SFAProfiler
+from SFAClientUtils.SFACapture import CAPTURE_SUFFIX
+
+
+def write_replay_config( conf_file, capture_dir):
+    '''
+    Copies the config file with the changes needed for a replay and returns
+    the name of the copy
+    '''
+    config = ConfigParser.ConfigParser()
+    if not config.read( conf_file):
+        raise RuntimeError( "Can't read config file '%s'"%conf_file)
+    config.set( 'ddn_hardware', 'api', 'replay')
+    if not config.has_section( 'replay'):
+        config.add_section( 'replay')
+    config.set( 'replay', 'directory', capture_dir)
+    config.remove_section( 'capture')
+    if not config.has_section( 'writer'):
+        config.add_section( 'writer')
+    config.set( 'writer', 'mode', 'local')
+
+    (fd, replay_conf) = tempfile.mkstemp( prefix = 'ddntool_replay', suffix = '.conf')
+    conf = os.fdopen( fd, 'w')
+    try:
+        config.write( conf)
+    finally:
+        conf.close()
+    return replay_conf
+
+
+def replay( clients, speed, time_offset, max_ticks):
+    '''
+    Steps the clients (a list of (host name, SFAClient) tuples) through
+    their capture files.  Each one is removed from the list (and closed)
+    when its file ends.  Returns the number of
+    fast polls replayed.
+    '''
+    logger = logging.getLogger( 'DDNTool_replay')
+    first_time = None
+    start = time.time()
+    tick = 0
+    while max_ticks == 0 or tick < max_ticks:
+        # The clients' next samples should all be from about the same time.
+        # The earliest one sets the pace.
+        sample_times = [ ]
+        for (host, client) in list( clients):
+            sample_time = client.next_sample_time()
+            if sample_time is None:
+                logger.info( "Capture file for %s has ended"%host)
+                client.close()
+                clients.remove( (host, client))
+            else:
+                sample_times.append( sample_time)
+        if not clients:
+            break
+        sample_time = min( sample_times)
+        if first_time is None:
+            first_time = sample_time
+        if speed > 0:
+            delay = start + (sample_time - first_time) / speed - time.time()
+            if delay > 0:
+                time.sleep( delay)
+
+        update_time = int( sample_time + time_offset)
+        for (host, client) in clients:
+            client.poll_once( tick, update_time)
+        tick += 1
+    return tick
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Replay DDNTool capture files through SFAClient and the databases")
+    parser.add_argument( 'conf_file', help="DDNTool config file (for the database "
+                                           "and polling settings)")
+    parser.add_argument( 'capture_dir', help="Directory holding the capture files")
+    parser.add_argument( '--hosts', help="Comma separated list of hosts to replay "
+                                         "(default: every capture file in the directory)")
+    parser.add_argument( '-s', '--speed', type=float, default=10.0,
+                         help="Multiple of the recorded speed to replay at.  "
+                              "0 means as fast as possible (default: 10)")
+    parser.add_argument( '--now', action='store_true',
+                         help="Shift the update times so the replay starts now")
+    parser.add_argument( '-t', '--ticks', type=int, default=0,
+                         help="Stop after this many fast polls (default: all of them)")
+    parser.add_argument( '-v', '--verbose', action='store_true',
+                         help="Log at the debug level")
+    args = parser.parse_args()
+
+    logging.basicConfig( level=logging.DEBUG if args.verbose else logging.INFO,
+                         format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+
+    if args.hosts:
+        hosts = args.hosts.split( ',')
+    else:
+        hosts = sorted( [ os.path.basename( path)[:-len(CAPTURE_SUFFIX)] for path in
+                          glob.glob( os.path.join( args.capture_dir, '*' + CAPTURE_SUFFIX)) ])
+    if not hosts:
+        sys.exit( "No capture files in %s"%args.capture_dir)
+
+    replay_conf = write_replay_config( args.conf_file, args.capture_dir)
+    try:
+        clients = [ ]
+        for host in hosts:
+            client = SFAClient.SFAClient( host, replay_conf, None, None,
+                                          shared_process = True)
+            if client.prepare():
+                clients.append( (host, client))
+    finally:
+        os.remove( replay_conf)
+    if not clients:
+        sys.exit( "Nothing to replay")
+
+    time_offset = 0
+    if args.now:
+        first_times = [ client.next_sample_time() for (host, client) in clients ]
+        first_times = [ t for t in first_times if t is not None ]
+        if first_times:
+            time_offset = time.time() - min( first_times)
+
+    SFAProfiler.install_signal_handler()
+    num_clients = len(clients)
+    start = time.time()
+    ticks = replay( clients, args.speed, time_offset, args.ticks)
+    elapsed = time.time() - start
+    for (host, client) in clients:
+        client.close()
+    logging.info( "Replayed %d fast polls from %d controller(s) in %.1f seconds"% \
+                  (ticks, num_clients, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import unittest
+from SFAClientUtils import SFAScheduler as SFASchedulerModule
+from SFAClientUtils.SFAScheduler import SFAScheduler
+
+
+class FakeClock(object):
+    '''
+    A clock that only moves when something sleeps (or a test advances it)
+    '''
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append( seconds)
+        self.now += seconds
+
+
+class SFAScheduler_Test( unittest.TestCase):
+
+    def testMonotonicClock(self):
+        t1 = SFASchedulerModule.monotonic()
+        t2 = SFASchedulerModule.monotonic()
+        self.assertTrue( t2 >= t1)
+
+    def testNoDrift(self):
+        clock = FakeClock()
+        scheduler = SFAScheduler( 2.0, clock.clock, clock.sleep)
+        scheduler.start()
+        wakeups = []
+        for work_time in [ 0.5, 1.9, 0.0, 1.2 ]:
+            scheduler.wait()
+            wakeups.append( clock.now)
+            clock.now += work_time
+        self.assertEqual( wakeups, [ 1002.0, 1004.0, 1006.0, 1008.0 ])
+        self.assertEqual( len(clock.sleeps), 4)  # one sleep per tick
+        self.assertEqual( scheduler.stats()['skipped_ticks'], 0)
+
+    def testSkippedTicks(self):
+        clock = FakeClock()
+        scheduler = SFAScheduler( 2.0, clock.clock, clock.sleep)
+        scheduler.start()
+        scheduler.wait()
+        clock.now += 5.0    # misses the ticks at 1004 & 1006
+        scheduler.wait()
+        self.assertEqual( clock.now, 1008.0)
+        stats = scheduler.stats()
+        self.assertEqual( stats['skipped_ticks'], 2)
+        self.assertEqual( stats['ticks'], 2)
+
+    def testTimeToNextTick(self):
+        clock = FakeClock()
+        scheduler = SFAScheduler( 2.0, clock.clock, clock.sleep)
+        scheduler.start()
+        scheduler.wait()
+        clock.now += 0.5
+        self.assertEqual( scheduler.time_to_next_tick(), 1.5)
+        clock.now += 3.0    # overran the next tick
+        self.assertEqual( scheduler.time_to_next_tick(), 0.0)
+
+    def testWaitForOffset(self):
+        clock = FakeClock()
+        scheduler = SFAScheduler( 2.0, clock.clock, clock.sleep)
+        scheduler.start()
+        scheduler.wait()
+        scheduler.wait_for_offset( 0.5)
+        self.assertEqual( clock.now, 1002.5)
+        scheduler.wait_for_offset( 0.25)    # already passed
+        self.assertEqual( clock.now, 1002.5)
+        scheduler.wait_for_offset( 1.5)
+        self.assertEqual( clock.now, 1003.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import ConfigParser
+import time
+import unittest
+from SFAClientUtils import SFASimulator
+from SFAClientUtils.SFAClock import SFAVirtualClock
+
+
+class SFASimulator_Test( unittest.TestCase):
+
+    def setUp(self):
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'simulator')
+        config.set( 'simulator', 'luns', '4')
+        config.set( 'simulator', 'latency_ms', '0')
+        config.set( 'simulator', 'degraded_pools', '1')
+        SFASimulator.configure( config)
+        self._context = SFASimulator.APIConnect( 'https://sim1', ('user', 'password'))
+
+    def tearDown(self):
+        SFASimulator.configure( ConfigParser.ConfigParser())
+
+    def testCountersIncrease(self):
+        first = SFASimulator.SFAVirtualDiskStatistics.getAll( context=self._context)
+        time.sleep( 0.05)
+        second = SFASimulator.SFAVirtualDiskStatistics.getAll()  # default context
+        self.assertEqual( len(first), 4)
+        for (old, new) in zip( first, second):
+            self.assertEqual( old.Index, new.Index)
+            self.assertTrue( sum( new.TotalIOs) > sum( old.TotalIOs))
+            self.assertEqual( sum( new.TotalIOs), sum( new.ReadIOs) + sum( new.WriteIOs))
+            self.assertTrue( sum( new.KBytesRead) >= sum( old.KBytesRead))
+            self.assertEqual( sum( new.ReadIOSizeBuckets), sum( new.ReadIOs))
+            self.assertEqual( sum( new.WriteIOLatencyBuckets), sum( new.WriteIOs))
+            self.assertIn( 0, new.ReadIOs)  # only one controller owns the LUN
+            self.assertEqual( len(new.IOSizeIndexLabels), 12)
+
+    def testTopology(self):
+        presentations = SFASimulator.SFAPresentation.getAll( context=self._context)
+        disks = SFASimulator.SFAVirtualDisk.getAll( context=self._context)
+        pools = SFASimulator.SFAStoragePool.getAll( context=self._context)
+        self.assertEqual( [ p.VirtualDiskIndex for p in presentations ], range(4))
+        self.assertEqual( [ d.PoolIndex for d in disks ], range(4))
+        self.assertEqual( [ p.PoolState for p in pools ],
+                          [ SFASimulator.POOL_STATE_DEGRADED ] +
+                          [ SFASimulator.POOL_STATE_NORMAL ] * 3)
+        self.assertEqual( SFASimulator.SFAController.getAll()[0].FWRelease,
+                          SFASimulator.FW_RELEASE)
+
+    def testFailureInjection(self):
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'simulator')
+        config.set( 'simulator', 'latency_ms', '0')
+        config.set( 'simulator', 'failure_rate', '1.0')
+        SFASimulator.configure( config)
+        context = SFASimulator.APIConnect( 'https://sim2', ('user', 'password'))
+        self.assertRaises( SFASimulator.CIMError,
+                           SFASimulator.SFAStoragePool.getAll, context)
+
+    def testIdleLunsVirtualClock(self):
+        config = ConfigParser.ConfigParser()
+        config.add_section( 'simulator')
+        config.set( 'simulator', 'luns', '4')
+        config.set( 'simulator', 'idle_luns', '1')
+        clock = SFAVirtualClock( 1000.0)
+        SFASimulator.configure( config, clock)
+        context = SFASimulator.APIConnect( 'https://sim3', ('user', 'password'))
+        clock.sleep( 2.0)
+        first = SFASimulator.SFAVirtualDiskStatistics.getAll( context)
+        clock.sleep( 2.0)
+        second = SFASimulator.SFAVirtualDiskStatistics.getAll( context)
+        self.assertEqual( sum( second[0].TotalIOs), 0)
+        for (old, new) in zip( first[1:], second[1:]):
+            self.assertTrue( sum( new.TotalIOs) > sum( old.TotalIOs))
+
+if __name__ == '__main__':
+    unittest.main()
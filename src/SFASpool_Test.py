@@ -0,0 +1,122 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import shutil
+import tempfile
+import unittest
+from SFAClientUtils.SFASpool import SFASpool
+
+
+class DatabaseDown(Exception):
+    pass
+
+
+class FakeDatabase(object):
+    '''
+    Records what it's sent, or raises DatabaseDown if it's been told to
+    '''
+    def __init__(self):
+        self.written = []
+        self.down = False
+
+    def send(self, item):
+        if self.down:
+            raise DatabaseDown( "no route to host")
+        if item.startswith( 'bad'):
+            raise ValueError( "the database rejected %s"%item)
+        self.written.append( item)
+
+
+class SFASpool_Test( unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._db = FakeDatabase()
+
+    def tearDown(self):
+        shutil.rmtree( self._dir)
+
+    def new_spool(self, max_bytes = 1000000, segment_bytes = 100, replay_records = 2):
+        spool = SFASpool( self._dir, max_bytes, segment_bytes, replay_records, 0)
+        spool.attach( self._db.send, (DatabaseDown,))
+        return spool
+
+    def testSpoolAndReplay(self):
+        spool = self.new_spool()
+        spool.write( 'rec0')
+        self._db.down = True
+        for i in range(1, 21):
+            spool.write( 'rec%d'%i)
+        self.assertTrue( spool.has_records())
+        self.assertEqual( self._db.written, [ 'rec0' ])
+
+        # Two spooled records are replayed for every new write (which goes
+        # on the end of the spool so that everything stays in order)
+        self._db.down = False
+        spool.write( 'rec21')
+        self.assertEqual( self._db.written, [ 'rec0', 'rec1', 'rec2' ])
+        for i in range(22, 60):
+            spool.write( 'rec%d'%i)
+        self.assertFalse( spool.has_records())
+        self.assertEqual( self._db.written, [ 'rec%d'%i for i in range(60) ])
+
+    def testSpoolSurvivesRestart(self):
+        spool = self.new_spool()
+        self._db.down = True
+        for i in range(10):
+            spool.write( 'rec%d'%i)
+        spool = None
+
+        self._db.down = False
+        spool = self.new_spool( replay_records = 100)
+        self.assertTrue( spool.has_records())
+        spool.write( 'rec10')
+        self.assertEqual( self._db.written, [ 'rec%d'%i for i in range(11) ])
+
+    def testOldestDataEvicted(self):
+        spool = self.new_spool( max_bytes = 300, segment_bytes = 50)
+        self._db.down = True
+        for i in range(100):
+            spool.write( 'record number %d'%i)
+        self._db.down = False
+        for i in range(50):
+            spool.write( 'x')
+        self.assertFalse( spool.has_records())
+        self.assertTrue( len(self._db.written) < 150)
+        self.assertEqual( self._db.written[-51:], [ 'record number 99' ] + [ 'x' ] * 50)
+
+    # A spooled record that the database rejects (for a reason other than
+    # being down) is skipped, not retried forever
+    def testPoisonedRecordSkipped(self):
+        spool = self.new_spool( replay_records = 100)
+        self._db.down = True
+        for item in [ 'rec0', 'bad1', 'rec2' ]:
+            spool.write( item)
+        self._db.down = False
+        spool.write( 'rec3')
+        self.assertFalse( spool.has_records())
+        self.assertEqual( self._db.written, [ 'rec0', 'rec2', 'rec3' ])
+        self.assertEqual( spool._records_dropped, 1)
+
+        # When it's not spooled, the caller still gets the error
+        self.assertRaises( ValueError, spool.write, 'bad4')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import unittest
+from SFAClientUtils.SFATimeSeries import SFATimeSeries
+from SFAClientUtils.SFATimeSeriesMatrix import SFATimeSeriesMatrix
+from SFAClientUtils.SFATimeSeries import EmptyTimeSeriesException
+
+METRICS = [ 'reads', 'writes' ]
+LUNS = [ 0, 3, 7 ]   # deliberately not sequential
+
+class SFATimeSeriesMatrix_Test( unittest.TestCase):
+
+    def build_matrix(self, max_size, num_samples):
+        # Each LUN's reads increase by (lun + 1) per second and writes by
+        # twice that.  Timestamps are faked so the test doesn't have to sleep.
+        matrix = SFATimeSeriesMatrix( METRICS, LUNS, max_size)
+        for sample in range(num_samples):
+            rows = { 'reads'  : [ (lun + 1) * sample for lun in LUNS ],
+                     'writes' : [ 2 * (lun + 1) * sample for lun in LUNS ] }
+            matrix.append( rows)
+            matrix._times[matrix._position( matrix.size() - 1)] = 500.0 + sample
+        return matrix
+
+    def testAppend(self):
+        matrix = self.build_matrix( 5, 12)
+        self.assertEqual( matrix.size(), 5)
+        rows, timestamp = matrix.get(0)
+        self.assertEqual( timestamp, 507.0)
+        self.assertEqual( rows['reads'], [7.0, 28.0, 56.0])
+        self.assertEqual( list(matrix.latest( 'writes')), [22.0, 88.0, 176.0])
+        self.assertEqual( matrix.columns(), LUNS)
+        self.assertEqual( matrix.column_index[7], 2)
+
+    def testAverage(self):
+        matrix = self.build_matrix( 10, 25)
+        averages, span = matrix.average( 4)
+        self.assertEqual( span, 4)
+        self.assertEqual( averages['reads'], [1.0, 4.0, 8.0])
+        self.assertEqual( averages['writes'], [2.0, 8.0, 16.0])
+
+    # verify the matrix gives the same answers as individual SFATimeSeries
+    def testMatchesTimeSeries(self):
+        matrix = self.build_matrix( 10, 25)
+        series = SFATimeSeries( 10)
+        for sample in range(25):
+            series.append( 4 * sample)
+            series._times[series._position( series.size() - 1)] = 500.0 + sample
+        for span in [0.0001, 1, 3.4, 3.6, 9, 100]:
+            self.assertEqual( matrix.average( span)[0]['reads'][1],
+                              series.average( span)[0])
+
+    # timestamps passed to append() (as a replay does) instead of hacked in
+    def testExplicitTimestamps(self):
+        matrix = SFATimeSeriesMatrix( METRICS, LUNS, 10, [4])
+        for sample in range(25):
+            matrix.append( { 'reads'  : [ (lun + 1) * sample for lun in LUNS ],
+                             'writes' : [ 0, 0, 0 ] }, 500.0 + 2 * sample)
+        self.assertEqual( matrix.get(-1)[1], 548.0)
+        averages, span = matrix.average( 4)
+        self.assertEqual( span, 4)
+        self.assertEqual( averages['reads'], [0.5, 2.0, 4.0])
+
+    def testEmptyAverage(self):
+        matrix = SFATimeSeriesMatrix( METRICS, LUNS, 10)
+        self.assertRaises( EmptyTimeSeriesException, matrix.average, 1)
+        self.assertEqual( list(matrix.latest( 'reads')), [0.0, 0.0, 0.0])
+        matrix.append( { 'reads' : [1, 2, 3], 'writes' : [4, 5, 6] })
+        self.assertRaises( EmptyTimeSeriesException, matrix.average, 1)
+
+    def testBadRow(self):
+        matrix = SFATimeSeriesMatrix( METRICS, LUNS, 10)
+        self.assertRaises( ValueError, matrix.append,
+                           { 'reads' : [1, 2], 'writes' : [4, 5, 6] })
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,9 +18,9 @@
 # WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
 # A PARTICULAR PURPOSE.
 
+import random
 import unittest
-import time
-import SFAClientUtils
+from SFAClientUtils.SFAClock import SFAVirtualClock
 from SFAClientUtils.SFATimeSeries import SFATimeSeries
 from SFAClientUtils.SFATimeSeries import EmptyTimeSeriesException
 
@@ -40,22 +40,22 @@ class SFATimeSeries_Test( unittest.TestCase):
     
     def generate_time_series(self):
         # Build up a time series that we can mess with...
-        print
-        print "Generating time series data.  This will take approximately %d seconds."%SERIES_LENGTH
-        self._series = SFATimeSeries()
+        # The series runs on a virtual clock, so this doesn't take SERIES_LENGTH
+        # seconds of real time.  The gaps between the items are jittered a bit
+        # (like real polling would be).
+        clock = SFAVirtualClock( 1000.0)
+        rng = random.Random( 1)
+        self._series = SFATimeSeries( clock = clock.time)
         approx_inter_item_time = SERIES_LENGTH / SERIES_SIZE
-        start_time = time.time()
+        start_time = clock.time()
         append_val = 1
         self._series.append( append_val)
-        while time.time() < (start_time + SERIES_LENGTH):
+        while clock.time() < (start_time + SERIES_LENGTH):
             last_append_time = self._series.get( self._series.size()-1)[1]
-            while time.time() < (last_append_time + approx_inter_item_time):
-                time.sleep( approx_inter_item_time / 100)
+            clock.sleep( approx_inter_item_time * rng.uniform( 1.0, 1.1))
             
-            append_val += SERIES_RATE * (time.time() - last_append_time)     
+            append_val += SERIES_RATE * (clock.time() - last_append_time)     
             self._series.append( append_val)
-                
-        print "Time series generated."
 
     def testAppend(self):
         SERIES_SIZE=500     # Number of values to append to the series
@@ -130,21 +130,81 @@ class SFATimeSeries_Test( unittest.TestCase):
     # average calculation.  This originally resulted in a divide-by-zero error.
     def testShortTimeSpanAverage(self):
         # build up a small time series
-        local_series = SFATimeSeries()
+        clock = SFAVirtualClock()
+        local_series = SFATimeSeries( clock = clock.time)
         local_series.append(1)
-        time.sleep(0.1)
+        clock.sleep(0.1)
         local_series.append(2)
-        time.sleep(0.1)
+        clock.sleep(0.1)
         local_series.append(3)
         
         result = local_series.average(0.0001)
         # If this doesn't divide by zero, the test passes
+
+    # verify average() raises an exception (instead of dividing by zero)
+    # when the samples were all taken at the same (virtual) time
+    def testZeroSpanAverage(self):
+        clock = SFAVirtualClock()
+        local_series = SFATimeSeries( clock = clock.time)
+        local_series.append(1)
+        local_series.append(2)
+        self.assertRaises( EmptyTimeSeriesException, local_series.average, 60)
+        clock.sleep(2)
+        local_series.append(3)
+        self.assertEqual( local_series.average(60), (1.0, 2.0))
+
+    # verify get() and average() still work after the circular buffer has
+    # wrapped around (possibly several times)
+    def testWrapAround(self):
+        SERIES_SIZE=7
+        local_series = SFATimeSeries(SERIES_SIZE)
+        for value in range(25):
+            local_series.append( value)
+            # Fake the timestamps so the series has a 1 value/sec rate
+            pos = local_series._position( local_series.size() - 1)
+            local_series._times[pos] = 1000.0 + value
+
+        self.assertEqual(local_series.size(), SERIES_SIZE)
+        for i in range(SERIES_SIZE):
+            self.assertEqual(local_series.get(i), (25 - SERIES_SIZE + i, 1000.0 + 25 - SERIES_SIZE + i))
+        self.assertEqual(local_series.get(-1)[0], 24)
+        self.assertRaises( IndexError, local_series.get, SERIES_SIZE)
+
+        for span in range(1, SERIES_SIZE):
+            result = local_series.average( span)
+            self.assertEqual(result, (1.0, span))
+        # Spans longer than the series get clamped to the oldest value
+        self.assertEqual(local_series.average( 100), (1.0, SERIES_SIZE - 1))
+
         
         
         
         
         
-        
+    # verify averages over registered spans match the binary search results
+    def testRegisteredSpans(self):
+        SPANS = [ 1, 2.5, 4 ]
+        clock = SFAVirtualClock( 1000.0)
+        anchored = SFATimeSeries( 6, SPANS, clock.time)
+        searched = SFATimeSeries( 6, clock = clock.time)
+        value = 0
+        # irregular gaps between appends to exercise the 'closest item' logic
+        for gap in [ 0.5, 1.0, 0.7, 1.3, 0.2, 2.0, 0.9, 1.1, 0.5, 1.5, 0.5, 0.6 ]:
+            clock.sleep( gap)
+            value += gap * 3
+            anchored.append( value)
+            searched.append( value)
+            if anchored.size() < 2:
+                continue
+            for span in SPANS:
+                self.assertEqual( anchored.average( span), searched.average( span))
+                self.assertEqual( anchored._first_index( span),
+                                  searched._first_index( span))
+
+        anchored.flush()
+        self.assertEqual( anchored.size(), 0)
+        self.assertRaises( EmptyTimeSeriesException, anchored.average, 1)
+
     # verify the average() function doesn't blow up when the series is empty
     #def testEmptyAverage(self):
     #    local_series = SFATimeSeries()
@@ -0,0 +1,181 @@
+# Created on Oct 18, 2026
+# 
+# @author: carlosthomaz
+# 
+# Copyright 2026 UT Battelle, LLC
+# 
+# This work was supported by the Oak Ridge Leadership Computing Facility at
+# the Oak Ridge National Laboratory, which is managed by UT Battelle, LLC for
+# the U.S. DOE (under the contract No. DE-AC05-00OR22725).
+# 
+# This file is part of DDNTool_v2.
+# 
+# DDNTool_v2 is free software: you can redistribute it and/or modify it under
+# the terms of the UT-Battelle Permissive Open Source License.  (See the
+# License.pdf file for details.)
+# 
+# DDNTool_v2 is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE.
+
+import ConfigParser
+import Queue
+import sys
+import threading
+import traceback
+import unittest
+from SFAClientUtils import SFAWriter
+from SFAClientUtils.SFAMetrics import SFAMetrics
+
+
+class FakeSink(object):
+    '''
+    Records the values it's asked to write.  Optionally blocks on an event
+    before each write so the tests can fill up the writer's queue.  The
+    started event is set as soon as a write begins.
+    '''
+    def __init__(self, gate = None):
+        self.written = []
+        self.gate = gate
+        self.started = threading.Event()
+
+    def write(self, value):
+        self.started.set()
+        if self.gate:
+            self.gate.wait()
+        self.written.append( value)
+
+    def fail(self):
+        raise RuntimeError( "Database went away")
+
+
+class SFAWriter_Test( unittest.TestCase):
+
+    def testExecuteBatch(self):
+        sink = FakeSink()
+        SFAWriter.execute_batch( { 'db' : sink },
+                                 [ ('db', 'write', (1,)), ('db', 'write', (2,)) ])
+        self.assertEqual( sink.written, [1, 2])
+
+    def run_overflow(self, policy):
+        # The writer thread takes batch 0 and then stalls on the gate, so
+        # batches 1 & 2 fill the queue and 3 & 4 overflow
+        gate = threading.Event()
+        sink = FakeSink( gate)
+        writer = SFAWriter.SFABackgroundWriter( { 'db' : sink }, 2, policy, 'test')
+        writer.start()
+        writer.submit( [ ('db', 'write', (0,)) ])
+        sink.started.wait( 10.0)  # wait for the thread to pick up batch 0
+        self.assertTrue( sink.started.is_set())
+        results = [ writer.submit( [ ('db', 'write', (i,)) ]) for i in range(1, 5) ]
+        gate.set()
+        writer.stop()
+        return (results, sink.written, writer.stats())
+
+    def testDropOldest(self):
+        results, written, stats = self.run_overflow( 'drop_oldest')
+        self.assertEqual( results, [True] * 4)
+        self.assertEqual( written, [0, 3, 4])
+        self.assertEqual( stats['batches_dropped'], 2)
+        self.assertEqual( stats['batches_written'], 3)
+        self.assertEqual( stats['max_queue_depth'], 2)
+
+    def testDropNewest(self):
+        results, written, stats = self.run_overflow( 'drop_newest')
+        self.assertEqual( results, [True, True, False, False])
+        self.assertEqual( written, [0, 1, 2])
+        self.assertEqual( stats['batches_dropped'], 2)
+
+    def testErrorIsReraised(self):
+        sink = FakeSink()
+        writer = SFAWriter.SFABackgroundWriter( { 'db' : sink }, 2, 'block', 'test')
+        writer.start()
+        writer.submit( [ ('db', 'fail', ()) ])
+        writer.join()
+        self.assertRaises( RuntimeError, writer.submit, [ ('db', 'write', (1,)) ])
+        # The traceback is the writer thread's, so it shows where it failed
+        try:
+            writer.submit( [ ('db', 'write', (1,)) ])
+        except RuntimeError:
+            functions = [ frame[2] for frame in traceback.extract_tb( sys.exc_info()[2]) ]
+        self.assertTrue( 'fail' in functions)
+
+    def testWriterMode(self):
+        config = ConfigParser.ConfigParser()
+        self.assertEqual( SFAWriter.writer_mode( config), 'local')
+        config.add_section( 'writer')
+        config.set( 'writer', 'mode', 'central')
+        self.assertEqual( SFAWriter.writer_mode( config), 'central')
+        config.set( 'writer', 'mode', 'centrall')
+        self.assertRaises( ValueError, SFAWriter.writer_mode, config)
+
+    def testBadPolicy(self):
+        self.assertRaises( ValueError, SFAWriter.SFABackgroundWriter, {}, 2, 'bogus', 'test')
+
+    def testMergeBatches(self):
+        batch1 = [ ('db', 'update_multi', (True, [ 'a1', 'a2' ])),
+                   ('db', 'update_multi', (False, [ 'b1' ])),
+                   ('db', 'write', (1,)),
+                   ('db', 'flush_to_db', ()) ]
+        batch2 = [ ('db', 'update_multi', (True, [ 'a3' ])),
+                   ('db', 'write', (2,)),
+                   ('db', 'flush_to_db', ()) ]
+        merged = SFAWriter.merge_batches( [ batch1, batch2 ])
+        self.assertEqual( merged, [ ('db', 'update_multi', (True, [ 'a1', 'a2', 'a3' ])),
+                                    ('db', 'update_multi', (False, [ 'b1' ])),
+                                    ('db', 'write', (1,)),
+                                    ('db', 'write', (2,)),
+                                    ('db', 'flush_to_db', ()) ])
+        # The original batches must not be modified
+        self.assertEqual( batch1[0][2][1], [ 'a1', 'a2' ])
+
+    def testCentralWriter(self):
+        sink = FakeSink()
+        write_queue = Queue.Queue()
+        # Two hosts: update time 1 is complete, update time 2 is only
+        # written when update time 3 shows up and 3 is written on exit
+        for item in [ ('h1', 1, [ ('db', 'write', ('h1-1',)) ]),
+                      ('h2', 1, [ ('db', 'write', ('h2-1',)) ]),
+                      ('h1', 2, [ ('db', 'write', ('h1-2',)) ]),
+                      ('h2', 3, [ ('db', 'write', ('h2-3',)) ]),
+                      None ]:
+            write_queue.put( item)
+        SFAWriter.SFACentralWriter( { 'db' : sink }, write_queue, 2, 1.0).run()
+        self.assertEqual( sink.written, [ 'h1-1', 'h2-1', 'h1-2', 'h2-3' ])
+
+    # One failing write (or a whole database being down) mustn't stop the
+    # central writer from writing everything else
+    def testCentralWriterSurvivesErrors(self):
+        sink = FakeSink()
+        down_sink = FakeSink()
+        down_sink.write = down_sink.fail
+        write_queue = Queue.Queue()
+        for item in [ ('h1', 1, [ ('db', 'fail', ()), ('db', 'write', ('h1-1',)),
+                                  ('down', 'write', ('h1-1',)) ]),
+                      ('h2', 1, [ ('db', 'write', ('h2-1',)),
+                                  ('down', 'write', ('h2-1',)) ]),
+                      ('h1', 2, [ ('db', 'write', ('h1-2',)),
+                                  ('down', 'write', ('h1-2',)) ]),
+                      ('h2', 2, [ ('db', 'write', ('h2-2',)) ]),
+                      None ]:
+            write_queue.put( item)
+        SFAWriter.SFACentralWriter( { 'db' : sink, 'down' : down_sink },
+                                    write_queue, 2, 1.0).run()
+        self.assertEqual( sink.written, [ 'h1-1', 'h2-1', 'h1-2', 'h2-2' ])
+
+    def testMetricsBatch(self):
+        metrics = SFAMetrics()
+        SFAWriter.execute_batch( { 'db' : FakeSink() }, [ ('db', 'write', (1,)) ], metrics)
+        batch = SFAWriter.metrics_batch( metrics, [ 'sqldb', 'tsdb' ], 'host1', 100)
+        self.assertEqual( [ (op[0], op[1]) for op in batch ],
+                          [ ('sqldb', 'update_internal_metrics_table_multi'),
+                            ('tsdb', 'update_internal_metrics_multi'),
+                            ('tsdb', 'flush_to_db') ])
+        rows = batch[0][2][0]
+        self.assertEqual( len(rows), 1)
+        self.assertEqual( rows[0][:4], ('host1', 100, 'write.db.write', 1))
+        # Nothing new has been timed
+        self.assertEqual( SFAWriter.metrics_batch( metrics, [ 'tsdb' ], 'host1', 101), [])
+
+if __name__ == '__main__':
+    unittest.main()